@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# abi log decoding throughput benchmark
+
+import sys
+import time
+
+from moralis_streams_client.abi import AbiDecoder, EventDecoder, event_topic
+from moralis_streams_client.payload import decode
+
+LOGS = 10_000
+
+TRANSFER = dict(
+    type="event",
+    name="Transfer",
+    inputs=[
+        dict(name="from", type="address", indexed=True),
+        dict(name="to", type="address", indexed=True),
+        dict(name="value", type="uint256", indexed=False),
+    ],
+)
+
+MEMO = dict(
+    type="event",
+    name="Memo",
+    inputs=[
+        dict(name="sender", type="address", indexed=True),
+        dict(name="amount", type="uint256", indexed=False),
+        dict(name="text", type="string", indexed=False),
+    ],
+)
+
+
+def _word(value):
+    return format(value, "064x")
+
+
+def _payload(count, item, data):
+    # one topic per indexed argument after topic0
+    indexed = sum(1 for i in item["inputs"] if i.get("indexed"))
+    topics = dict(topic0=event_topic(item))
+    for number in range(1, indexed + 1):
+        topics[f"topic{number}"] = "0x" + _word(0x11 * number)
+    logs = [
+        dict(topics, logIndex=str(i), transactionHash="0x", data=data)
+        for i in range(count)
+    ]
+    return decode(dict(logs=logs, abi=[item]))
+
+
+def _rate(name, count, run):
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<36} {count / elapsed:12,.0f} logs/s")
+
+
+def main(count):
+    transfers = _payload(count, TRANSFER, "0x" + _word(10**18))
+    decoder = AbiDecoder()
+    decoder.decode_payload(transfers)
+
+    def per_log():
+        for log in transfers.logs:
+            decoder.decode_log(log)
+
+    _rate("Transfer, per log", count, per_log)
+    _rate(
+        "Transfer, batch", count, lambda: decoder.decode_logs(transfers.logs)
+    )
+
+    try:
+        from eth_abi import encode
+    except ImportError:
+        print("eth_abi not installed; skipping eth_abi decoding")
+        return
+
+    memo = _payload(
+        count, MEMO, "0x" + encode(["uint256", "string"], [1, "memo"]).hex()
+    )
+    decoder.add([MEMO])
+    _rate(
+        "Memo (eth_abi), batch", count, lambda: decoder.decode_logs(memo.logs)
+    )
+
+    # the same Transfer logs forced through eth_abi for comparison
+    generic = EventDecoder(TRANSFER)
+    generic.data_converters = None
+    decoder.decoders[generic.key] = generic
+    _rate(
+        "Transfer (eth_abi), batch",
+        count,
+        lambda: decoder.decode_logs(transfers.logs),
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else LOGS)
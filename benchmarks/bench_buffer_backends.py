@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# event buffer backend ingest benchmark
+
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+from moralis_streams_client.event_queue import EventQueue
+from moralis_streams_client.event_record import EventRecord
+from moralis_streams_client.event_store import EventStore
+from moralis_streams_client.sqlite_store import SQLiteEventStore
+
+COUNT = 100_000
+BATCH_SIZES = [1, 100, 1000]
+
+
+def _event(count):
+    return EventRecord.from_body(
+        id=uuid4(),
+        path="contract/event",
+        method="POST",
+        headers={},
+        body=dict(
+            streamId=f"stream-{count % 4}",
+            tag="bench",
+            chainId="0x1",
+            block=dict(number=str(count), hash="0x00", timestamp="0"),
+            confirmed=bool(count % 2),
+            logs=[],
+        ),
+    )
+
+
+async def ingest(name, store, events):
+    queue = EventQueue(store)
+    queue.relay_url = None
+    queue.buffer_enabled = True
+    start = time.perf_counter()
+    for event in events:
+        await queue.append(event)
+    await queue.page(limit=1)
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    result, _ = await queue.page(filters=dict(stream_id="stream-1"))
+    query = time.perf_counter() - start
+    print(
+        f"{name:<20} ingest {len(events) / elapsed:10,.0f}/s"
+        f"  query {len(result):,} by streamId {query * 1000:8.1f}ms"
+    )
+
+
+def main(count):
+    events = [_event(i) for i in range(count)]
+    asyncio.run(ingest("memory", EventStore(), events))
+    for batch_size in BATCH_SIZES:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = SQLiteEventStore(Path(tmpdir) / "bench.db", batch_size)
+            asyncio.run(ingest(f"sqlite batch={batch_size}", store, events))
+            store.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else COUNT)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# compressed event buffer memory and CPU benchmark
+#
+# python -m benchmarks.bench_compression [COUNT [SIZE]]
+#
+# Buffers COUNT synthetic moralis payloads of about SIZE bytes with each
+# codec and reports memory per event, ingest time and /events time.
+
+import sys
+import time
+import tracemalloc
+from uuid import uuid4
+
+from moralis_streams_client.compression import (
+    NONE,
+    ZLIB,
+    ZSTD,
+    load_codec,
+    train_dictionary,
+)
+from moralis_streams_client.event_record import EventRecord, serialize_list
+from moralis_streams_client.event_store import EventStore
+from moralis_streams_client.loadgen import synthetic_payload
+
+COUNT = 1000
+SIZE = 20_000
+SAMPLES = 100
+# serialized bytes per synthetic log, with a transaction per four logs
+LOG_SIZE = 750
+HEADERS = {
+    "host": "webhook.example.com",
+    "content-type": "application/json",
+    "x-signature": "0x" + "ab" * 32,
+}
+
+
+def _events(count, size):
+    """return count events of about size bytes with distinct contents"""
+    logs = max(1, size // LOG_SIZE)
+    return [
+        EventRecord.from_body(
+            uuid4(),
+            "contract/event",
+            "POST",
+            HEADERS,
+            synthetic_payload(number, logs=logs, txs=logs // 4),
+        )
+        for number in range(count)
+    ]
+
+
+def _codecs(samples):
+    yield NONE, None
+    yield ZLIB, load_codec(ZLIB)
+    yield "zlib-1", load_codec(ZLIB, level=1)
+    yield "zlib+dict", load_codec(
+        ZLIB, dictionary=train_dictionary(ZLIB, samples)
+    )
+    try:
+        yield ZSTD, load_codec(ZSTD)
+    except ImportError:
+        print("zstd: zstandard is not installed", file=sys.stderr)
+        return
+    yield "zstd+dict", load_codec(
+        ZSTD, dictionary=train_dictionary(ZSTD, samples)
+    )
+
+
+def measure(codec, events):
+    """return (bytes, append seconds, read seconds) per buffered event"""
+    store = EventStore(codec)
+    tracemalloc.start()
+    start_snapshot = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    for e in events:
+        # as at ingest: each record keeps its own copy of the request body
+        store.append(
+            EventRecord(
+                e.id,
+                e.path,
+                e.method,
+                e.raw_headers,
+                bytes(memoryview(e.raw)),
+                fields=e.fields,
+            )
+        )
+    ingest = time.perf_counter() - start
+    end_snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    used = sum(
+        s.size_diff
+        for s in end_snapshot.compare_to(start_snapshot, "filename")
+    )
+    start = time.perf_counter()
+    serialize_list(store.values())
+    read = time.perf_counter() - start
+    return used / len(store), ingest / len(store), read / len(store)
+
+
+def main(count=COUNT, size=SIZE):
+    events = _events(count, size)
+    samples = [e.raw for e in _events(SAMPLES, size)]
+    raw = sum(len(e.raw) for e in events) / count
+    print(f"{count:,} events of {raw:,.0f} bytes")
+    print(
+        f"{'codec':<10} {'bytes/event':>12} {'ratio':>6} "
+        f"{'append':>10} {'/events':>10}"
+    )
+    for name, codec in _codecs(samples):
+        used, ingest, read = measure(codec, events)
+        print(
+            f"{name:<10} {used:12,.0f} {raw / used:6.1f} "
+            f"{ingest * 1e6:8.1f}us {read * 1e6:8.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
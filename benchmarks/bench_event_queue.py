@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# event queue benchmarks
+
+import asyncio
+import random
+import sys
+import time
+from uuid import uuid4
+
+from moralis_streams_client.event_queue import EventQueue
+from moralis_streams_client.event_record import EventRecord
+
+SIZES = [10_000, 100_000, 1_000_000]
+LOOKUPS = 1000
+
+
+def _event(count):
+    return EventRecord.from_body(
+        id=uuid4(),
+        path="contract/event",
+        method="POST",
+        headers={},
+        body=dict(count=count),
+    )
+
+
+def _rate(count, elapsed):
+    return f"{count / elapsed:12,.0f}/s"
+
+
+async def bench(size):
+    queue = EventQueue()
+    queue.relay_url = None
+    queue.buffer_enabled = True
+    events = [_event(i) for i in range(size)]
+
+    start = time.perf_counter()
+    for event in events:
+        await queue.append(event)
+    append = time.perf_counter() - start
+
+    sample = random.sample(events, LOOKUPS)
+
+    start = time.perf_counter()
+    for event in sample:
+        await queue.lookup(event.id, delete=False)
+    lookup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    listed = await queue.list()
+    listing = time.perf_counter() - start
+    assert len(listed) == size
+
+    start = time.perf_counter()
+    for event in sample:
+        await queue.lookup(event.id, delete=True)
+    delete = time.perf_counter() - start
+
+    print(
+        f"{size:>10,}  append {_rate(size, append)}"
+        f"  lookup {_rate(LOOKUPS, lookup)}"
+        f"  delete {_rate(LOOKUPS, delete)}"
+        f"  list {listing * 1000:8.1f}ms"
+    )
+
+
+def main(sizes):
+    for size in sizes:
+        asyncio.run(bench(size))
+
+
+if __name__ == "__main__":
+    main([int(s) for s in sys.argv[1:]] or SIZES)
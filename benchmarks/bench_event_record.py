@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# event record memory and serialization benchmark
+
+import sys
+import time
+import tracemalloc
+from uuid import uuid4
+
+import orjson
+
+from moralis_streams_client.app import Event, EventsResponse
+from moralis_streams_client.event_record import EventRecord, serialize_list
+from moralis_streams_client.event_store import event_fields
+
+from .bench_ingest import _payload
+
+COUNT = 1000
+SIZE = 20_000
+HEADERS = {
+    "host": "webhook.example.com",
+    "content-type": "application/json",
+    "x-signature": "0x" + "ab" * 32,
+}
+
+
+def _measure(build):
+    tracemalloc.start()
+    start = tracemalloc.take_snapshot()
+    events = build()
+    end = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    used = sum(s.size_diff for s in end.compare_to(start, "filename"))
+    return events, used / len(events)
+
+
+def main(count, size):
+    raw = orjson.dumps(_payload(size))
+
+    def build_models():
+        return [
+            Event(
+                id=uuid4(),
+                path="contract/event",
+                method="POST",
+                headers=dict(HEADERS),
+                body=orjson.loads(raw),
+            )
+            for _ in range(count)
+        ]
+
+    def build_records():
+        # as at ingest: each record keeps its own copy of the request body
+        return [
+            EventRecord(
+                uuid4(),
+                "contract/event",
+                "POST",
+                HEADERS,
+                bytes(memoryview(raw)),
+                fields=event_fields(orjson.loads(raw)),
+            )
+            for _ in range(count)
+        ]
+
+    models, model_bytes = _measure(build_models)
+    records, record_bytes = _measure(build_records)
+
+    start = time.perf_counter()
+    EventsResponse(result=models).json()
+    model_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    serialize_list(records)
+    record_time = time.perf_counter() - start
+
+    print(f"{count:,} events of {len(raw):,} bytes")
+    print(
+        f"pydantic Event  {model_bytes:12,.0f} bytes/event"
+        f"  /events serialize {model_time * 1000:8.1f}ms"
+    )
+    print(
+        f"EventRecord     {record_bytes:12,.0f} bytes/event"
+        f"  /events serialize {record_time * 1000:8.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*args) if args else main(COUNT, SIZE)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# webhook ingest request benchmark
+
+import asyncio
+import json
+import sys
+import time
+
+from httpx import AsyncClient
+
+from moralis_streams_client.app import app, get_event_list
+from moralis_streams_client.signature import Signature
+
+SIZES = [10_000, 1_000_000, 5_000_000]
+REQUESTS = 20
+
+
+def _payload(size):
+    log = dict(
+        logIndex="0x1",
+        transactionHash="0x" + "ab" * 32,
+        address="0x" + "cd" * 20,
+        data="0x" + "00" * 64,
+        topic0="0x" + "ef" * 32,
+        topic1="0x" + "01" * 32,
+        topic2="0x" + "02" * 32,
+        topic3=None,
+    )
+    count = max(1, size // len(json.dumps(log)))
+    return dict(
+        streamId="bench",
+        tag="bench",
+        chainId="0x1",
+        confirmed=False,
+        retries=0,
+        block=dict(number="1", hash="0x" + "aa" * 32, timestamp="0"),
+        logs=[log] * count,
+    )
+
+
+async def bench(size):
+    signature = Signature()
+    payload = _payload(size)
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    headers = signature.headers(body)
+    headers["content-type"] = "application/json"
+    events = await get_event_list()
+    events.buffer_enabled = False
+    events.relay_url = None
+    async with AsyncClient(app=app, base_url="http://bench") as client:
+        for handler in app.router.on_startup:
+            await handler()
+        cpu = time.process_time()
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            response = await client.post(
+                "/contract/event", content=body, headers=headers
+            )
+            assert response.status_code == 200, response.text
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu
+    print(
+        f"{len(body):>12,} bytes  {elapsed / REQUESTS * 1000:8.2f}ms/request"
+        f"  cpu {cpu / REQUESTS * 1000:8.2f}ms/request"
+    )
+
+
+def main(sizes):
+    for size in sizes:
+        asyncio.run(bench(size))
+
+
+if __name__ == "__main__":
+    main([int(s) for s in sys.argv[1:]] or SIZES)
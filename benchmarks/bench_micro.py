@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# hot path micro-benchmark suite
+#
+# python -m benchmarks.bench_micro [-k PATTERN] [-o RESULTS] [-c BASELINE]
+#
+# Each case reports the best time per operation over several rounds.
+# Results are written as JSON with the commit they were measured on, and
+# a previous results file can be compared against the current run.
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from fnmatch import fnmatch
+from types import SimpleNamespace
+from uuid import uuid4
+
+from moralis_streams_client.api import MoralisStreamsApi
+from moralis_streams_client.app import EventsResponse
+from moralis_streams_client.auth import SignatureMiddleware
+from moralis_streams_client.event_queue import EventQueue
+from moralis_streams_client.event_record import EventRecord
+from moralis_streams_client.signature import Signature
+
+from .bench_ingest import _payload
+
+PAYLOAD_SIZES = [1_000, 100_000, 1_000_000]
+BUFFER_SIZES = [1_000, 10_000, 100_000]
+PAGE_COUNTS = [1, 10]
+PAGE_ROWS = 100
+ROUNDS = 5
+ROUND_TIME = 0.1
+REGRESSION = 1.2
+
+CASES = {}
+
+
+def case(name):
+    """register a case; the decorated function returns the operation
+
+    The operation is a callable or coroutine function taking no
+    arguments; setup happens in the case function and is not timed.
+    """
+
+    def register(factory):
+        CASES[name] = factory
+        return factory
+
+    return register
+
+
+def _body(size):
+    return json.dumps(_payload(size), separators=(",", ":")).encode()
+
+
+def _event(count):
+    return EventRecord.from_body(
+        id=uuid4(),
+        path="contract/event",
+        method="POST",
+        headers={"content-type": "application/json"},
+        body=dict(streamId="bench", tag="bench", chainId="0x1", count=count),
+    )
+
+
+for _size in PAYLOAD_SIZES:
+
+    @case(f"signature.calculate/{_size}")
+    def _calculate(size=_size):
+        signature = Signature(key="bench")
+        body = _body(size)
+        return lambda: signature.calculate(body)
+
+    @case(f"signature.validate/{_size}")
+    def _validate(size=_size):
+        signature = Signature(key="bench")
+        body = _body(size)
+        digest = signature.calculate(body)
+        return lambda: signature.validate(digest, body)
+
+    @case(f"signature.middleware/{_size}")
+    def _middleware(size=_size):
+        """SignatureMiddleware from scope to the wrapped app"""
+        signature = Signature(key="bench")
+        body = _body(size)
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"x-signature", signature.calculate(body).encode()),
+        ]
+        state = SimpleNamespace(signature=signature)
+
+        async def endpoint(scope, receive, send):
+            message = await receive()
+            assert message["body"] is body
+
+        middleware = SignatureMiddleware(endpoint)
+
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            raise AssertionError(message)
+
+        async def operation():
+            scope = dict(
+                type="http",
+                method="POST",
+                path="/contract/event",
+                headers=headers,
+                app=SimpleNamespace(state=state),
+            )
+            await middleware(scope, receive, send)
+
+        return operation
+
+
+def _queue(size):
+    queue = EventQueue()
+    queue.relay_url = None
+    queue.buffer_enabled = True
+    events = [_event(i) for i in range(size)]
+
+    async def fill():
+        for event in events:
+            await queue.append(event)
+
+    asyncio.run(fill())
+    return queue, events
+
+
+for _size in BUFFER_SIZES:
+
+    @case(f"event_queue.append/{_size}")
+    def _append(size=_size):
+        """append to a buffer holding size events"""
+        queue, _ = _queue(size)
+        count = 0
+
+        async def operation():
+            nonlocal count
+            count += 1
+            await queue.append(_event(count))
+
+        return operation
+
+    @case(f"event_queue.list/{_size}")
+    def _list(size=_size):
+        queue, _ = _queue(size)
+        return queue.list
+
+    @case(f"event_queue.lookup/{_size}")
+    def _lookup(size=_size):
+        queue, events = _queue(size)
+        ids = [event.id for event in events[:: max(1, size // 1000)]]
+        position = 0
+
+        async def operation():
+            nonlocal position
+            position = (position + 1) % len(ids)
+            await queue.lookup(ids[position], delete=False)
+
+        return operation
+
+
+@case("vbasemodel.dict/100")
+def _model_dict():
+    """EventsResponse.dict() for 100 events"""
+    events = [
+        dict(
+            id=event.id,
+            path=event.path,
+            method=event.method,
+            headers=event.headers,
+            body=event.body,
+        )
+        for event in map(_event, range(100))
+    ]
+    response = EventsResponse(result=events)
+    return response.dict
+
+
+class PaginatedStub:
+    """local HTTP server returning total rows in cursor linked pages"""
+
+    def __init__(self, total):
+        self.total = total
+        self.server = None
+
+    def page(self, cursor):
+        offset = int(cursor or 0)
+        rows = [
+            dict(id=str(i), status="active")
+            for i in range(offset, min(offset + PAGE_ROWS, self.total))
+        ]
+        ret = dict(total=self.total, result=rows)
+        if offset + PAGE_ROWS < self.total:
+            ret["cursor"] = str(offset + PAGE_ROWS)
+        return json.dumps(ret).encode()
+
+    async def handle(self, reader, writer):
+        while True:
+            try:
+                request = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError:
+                break
+            target = request.split(b" ", 2)[1].decode()
+            _, _, query = target.partition("?")
+            params = dict(p.split("=", 1) for p in query.split("&") if p)
+            body = self.page(params.get("cursor"))
+            writer.write(
+                b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\n"
+                b"content-length: %d\r\n\r\n%s" % (len(body), body)
+            )
+            await writer.drain()
+        writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/"
+
+
+for _pages in PAGE_COUNTS:
+
+    @case(f"api.get_paginated/{_pages}")
+    def _paginated(pages=_pages):
+        """_get_paginated fetching pages of PAGE_ROWS rows from a stub"""
+        stub = PaginatedStub(pages * PAGE_ROWS)
+        api = None
+
+        async def operation():
+            nonlocal api
+            if api is None:
+                url = await stub.start()
+                api = MoralisStreamsApi(api_key="bench", url=url)
+                api.row_limit = PAGE_ROWS
+            results = await api._get_paginated("streams/evm", {})
+            assert len(results) == stub.total
+
+        return operation
+
+
+def _time(operation, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        operation()
+    return time.perf_counter() - start
+
+
+async def _time_async(operation, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        await operation()
+    return time.perf_counter() - start
+
+
+def measure(operation):
+    """return the best seconds per operation over ROUNDS rounds
+
+    The number of calls per round is calibrated so that a round takes
+    at least ROUND_TIME.
+    """
+    if asyncio.iscoroutinefunction(operation):
+        loop = asyncio.new_event_loop()
+
+        def timer(number):
+            return loop.run_until_complete(_time_async(operation, number))
+
+    else:
+        loop = None
+
+        def timer(number):
+            return _time(operation, number)
+
+    try:
+        number = 1
+        while (elapsed := timer(number)) < ROUND_TIME:
+            number *= 2 if elapsed * 10 > ROUND_TIME else 10
+        best = elapsed / number
+        for _ in range(ROUNDS - 1):
+            best = min(best, timer(number) / number)
+    finally:
+        if loop is not None:
+            loop.close()
+    return best
+
+
+def _commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _format(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e3), ("us", 1e6)):
+        if seconds * scale >= 1:
+            return f"{seconds * scale:8.2f}{unit}"
+    return f"{seconds * 1e9:8.2f}ns"
+
+
+def run(pattern="*", baseline=None):
+    results = {}
+    width = max(map(len, CASES))
+    for name, factory in CASES.items():
+        if not fnmatch(name, pattern):
+            continue
+        results[name] = measure(factory())
+        line = f"{name:<{width}}  {_format(results[name])}"
+        base = (baseline or {}).get(name)
+        if base:
+            ratio = results[name] / base
+            flag = "  REGRESSION" if ratio > REGRESSION else ""
+            line += f"  {_format(base)}  {ratio:6.2f}x{flag}"
+        print(line, flush=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="hot path benchmarks")
+    parser.add_argument("-k", "--pattern", default="*", help="case glob")
+    parser.add_argument("-o", "--output", help="write results JSON")
+    parser.add_argument(
+        "-c", "--compare", help="compare with a previous results JSON"
+    )
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as ifp:
+            baseline = json.load(ifp)["results"]
+
+    results = run(args.pattern, baseline)
+
+    if args.output:
+        with open(args.output, "w") as ofp:
+            json.dump(
+                dict(
+                    commit=_commit(),
+                    date=datetime.now(timezone.utc).isoformat(
+                        timespec="seconds"
+                    ),
+                    python=platform.python_version(),
+                    machine=platform.machine(),
+                    results=results,
+                ),
+                ofp,
+                indent=2,
+            )
+            ofp.write("\n")
+
+    if baseline and any(
+        results[name] / baseline[name] > REGRESSION
+        for name in results
+        if baseline.get(name)
+    ):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
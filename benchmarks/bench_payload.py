@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# webhook payload decoding benchmark
+
+import sys
+import time
+import tracemalloc
+
+import orjson
+
+from moralis_streams_client.models.model import IWebhookUnParsed
+from moralis_streams_client.payload import decode
+
+LOGS = 1000
+ROUNDS = 50
+
+
+def _payload(count):
+    log = dict(
+        transactionHash="0x" + "ab" * 32,
+        address="0x" + "cd" * 20,
+        data="0x" + "00" * 64,
+        topic0="0x" + "ef" * 32,
+        topic1="0x" + "01" * 32,
+        topic2="0x" + "02" * 32,
+        topic3="0x" + "03" * 32,
+    )
+    return dict(
+        block=dict(number="1000000", hash="0x" + "aa" * 32, timestamp="0"),
+        chainId="0x1",
+        logs=[dict(log, logIndex=str(i)) for i in range(count)],
+        txs=[],
+        txsInternal=[],
+        abi=[],
+        retries=0,
+        confirmed=False,
+        tag="bench",
+        streamId="bench",
+    )
+
+
+def _bench(name, raw, parse):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        parse(raw)
+    elapsed = (time.perf_counter() - start) / ROUNDS
+    tracemalloc.start()
+    result = parse(raw)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    print(f"{name:<24} {elapsed * 1000:8.2f}ms  {size:>12,} bytes")
+
+
+def main(count):
+    raw = orjson.dumps(_payload(count))
+    print(f"{count:,} logs, {len(raw):,} bytes")
+    _bench("orjson.loads", raw, orjson.loads)
+    _bench(
+        "IWebhookUnParsed",
+        raw,
+        lambda raw: IWebhookUnParsed.parse_obj(orjson.loads(raw)),
+    )
+    _bench("payload.decode", raw, decode)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else LOGS)
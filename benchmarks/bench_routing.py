@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# routing table match cost benchmark
+
+import sys
+import time
+from uuid import uuid4
+
+from moralis_streams_client.event_record import EventRecord
+from moralis_streams_client.routing import RoutingTable
+
+RULES = [10, 1_000, 100_000]
+MATCHES = 100_000
+
+
+def _routes(count):
+    # rules spread over streamId, tag + chainId and topic0 matches
+    routes = []
+    for i in range(count):
+        if i % 3 == 0:
+            match = dict(streamId=f"stream-{i}")
+        elif i % 3 == 1:
+            match = dict(tag=f"tag-{i}", chainId=i)
+        else:
+            match = dict(topic0="0x" + format(i, "064x"))
+        routes.append(
+            dict(name=f"route-{i}", url="http://target", match=match)
+        )
+    return routes
+
+
+def _event(i):
+    return EventRecord.from_body(
+        uuid4(),
+        "contract/event",
+        "POST",
+        {},
+        dict(
+            streamId=f"stream-{i}",
+            tag="tag-1",
+            chainId="0x1",
+            logs=[dict(topic0="0x" + format(2, "064x"))],
+        ),
+    )
+
+
+def main(sizes):
+    events = [_event(i) for i in range(100)]
+    for count in sizes:
+        start = time.perf_counter()
+        table = RoutingTable(_routes(count))
+        compile_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(MATCHES):
+            table.match(events[i % 100])
+        elapsed = time.perf_counter() - start
+        print(
+            f"{count:>8,} rules  compile {compile_time * 1000:9.1f}ms"
+            f"  match {elapsed / MATCHES * 1e6:6.2f}us/event"
+        )
+
+
+if __name__ == "__main__":
+    main([int(s) for s in sys.argv[1:]] or RULES)
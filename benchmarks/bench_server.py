@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# webhook server loop and http implementation benchmark
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from importlib.util import find_spec
+
+from moralis_streams_client.signature import Signature
+
+from .bench_ingest import _payload
+
+PORT = 8095
+SIZES = [1_000, 10_000]
+REQUESTS = 2000
+CONCURRENCY = 32
+LOOPS = ["asyncio", "uvloop"]
+HTTPS = ["h11", "httptools"]
+START_TIMEOUT = 15
+
+
+def _available(name):
+    return name in ("asyncio", "h11") or find_spec(name) is not None
+
+
+def _start(loop, http):
+    env = os.environ.copy()
+    env["WEBHOOK_TUNNEL"] = "0"
+    env["WEBHOOK_BUFFER_ENABLE"] = "0"
+    env["WEBHOOK_LOG_LEVEL"] = "WARNING"
+    cmd = [sys.executable, "-m", "moralis_streams_client.server"]
+    cmd += ["--port", str(PORT), "--loop", loop, "--http", http]
+    return subprocess.Popen(
+        cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def _request(body, headers):
+    lines = [
+        "POST /contract/event HTTP/1.1",
+        f"host: 127.0.0.1:{PORT}",
+        f"content-length: {len(body)}",
+    ]
+    lines += [f"{key}: {value}" for key, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+
+
+async def _connect():
+    timeout = time.monotonic() + START_TIMEOUT
+    while True:
+        try:
+            return await asyncio.open_connection("127.0.0.1", PORT)
+        except OSError:
+            if time.monotonic() > timeout:
+                raise TimeoutError("server did not start")
+            await asyncio.sleep(0.1)
+
+
+async def _response(reader):
+    status = await reader.readline()
+    length = 0
+    while (line := await reader.readline()) != b"\r\n":
+        key, _, value = line.partition(b":")
+        if key.lower() == b"content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status.split()[1])
+
+
+async def _load(request):
+    """send requests over keep-alive connections; return latencies"""
+    latencies = []
+    remaining = REQUESTS
+
+    async def worker():
+        nonlocal remaining
+        reader, writer = await _connect()
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            writer.write(request)
+            status = await _response(reader)
+            latencies.append(time.perf_counter() - start)
+            assert status == 200, status
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(CONCURRENCY)])
+    return latencies, time.perf_counter() - start
+
+
+async def bench(loop, http, sizes):
+    signature = Signature()
+    proc = _start(loop, http)
+    try:
+        for size in sizes:
+            body = json.dumps(_payload(size), separators=(",", ":")).encode()
+            headers = signature.headers(body)
+            headers["content-type"] = "application/json"
+            latencies, elapsed = await _load(_request(body, headers))
+            latencies.sort()
+            p50 = latencies[len(latencies) // 2]
+            p99 = latencies[int(len(latencies) * 0.99)]
+            print(
+                f"{loop:>8} {http:>10} {len(body):>8,} bytes"
+                f"  {len(latencies) / elapsed:8.0f} req/s"
+                f"  p50 {p50 * 1000:7.2f}ms  p99 {p99 * 1000:7.2f}ms"
+            )
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main(sizes):
+    print(f"{REQUESTS} requests, {CONCURRENCY} concurrent connections")
+    for loop in LOOPS:
+        for http in HTTPS:
+            if _available(loop) and _available(http):
+                asyncio.run(bench(loop, http, sizes))
+            else:
+                print(f"{loop:>8} {http:>10} not installed")
+
+
+if __name__ == "__main__":
+    main([int(s) for s in sys.argv[1:]] or SIZES)
@@ -0,0 +1,12 @@
+# bench - hot path micro-benchmarks
+
+bench_results = benchmarks/results
+bench_baseline ?= $(bench_results)/baseline.json
+
+### run the micro-benchmarks; record results for the current commit
+bench:
+	python -m benchmarks.bench_micro -o $(bench_results)/$(shell git rev-parse --short HEAD).json
+
+### run the micro-benchmarks; compare with bench_baseline, fail on regression
+bench-compare:
+	python -m benchmarks.bench_micro -c $(bench_baseline)
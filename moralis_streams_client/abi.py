@@ -0,0 +1,234 @@
+# event log decoding from contract ABIs
+
+import logging
+import re
+from collections import OrderedDict
+from functools import lru_cache
+
+import orjson
+from eth_hash.auto import keccak
+
+from . import settings
+
+try:
+    from eth_abi import decode as abi_decode
+except ImportError:
+    abi_decode = None
+
+logger = logging.getLogger(__name__)
+debug = logger.debug
+warning = logger.warning
+logger.setLevel(settings.LOG_LEVEL)
+
+# bounds of the compiled ABI and fallback decoder caches
+MAX_ABIS = 256
+MAX_DECODERS = 4096
+
+STATIC_TYPE = re.compile(r"^(uint|int)(\d*)$|^address$|^bool$|^bytes(\d+)$")
+
+
+def canonical_type(item):
+    """return the canonical ABI type of an input, expanding tuples"""
+    _type = item["type"]
+    if _type.startswith("tuple"):
+        components = ",".join(map(canonical_type, item["components"]))
+        return f"({components}){_type[5:]}"
+    return _type
+
+
+def event_signature(item):
+    types = ",".join(map(canonical_type, item.get("inputs", ())))
+    return f"{item['name']}({types})"
+
+
+def event_topic(item):
+    """return the topic0 hex string of an ABI event item"""
+    return "0x" + keccak(event_signature(item).encode()).hex()
+
+
+def _uint(word):
+    return int(word, 16)
+
+
+def _int(word):
+    value = int(word, 16)
+    return value - (1 << 256) if value >> 255 else value
+
+
+def _address(word):
+    return "0x" + word[24:]
+
+
+def _bool(word):
+    return int(word, 16) != 0
+
+
+def _bytes(size):
+    def convert(word):
+        return bytes.fromhex(word[: size * 2])
+
+    return convert
+
+
+def word_converter(_type):
+    """return a converter for a 64 digit hex word of a static type
+
+    returns None for types that are not single-word static types
+    """
+    match = STATIC_TYPE.match(_type)
+    if match is None:
+        return None
+    if match.group(1) == "uint":
+        return _uint
+    if match.group(1) == "int":
+        return _int
+    if _type == "address":
+        return _address
+    if _type == "bool":
+        return _bool
+    return _bytes(int(match.group(3)))
+
+
+class EventDecoder:
+    """decoder for the logs of one ABI event
+
+    Indexed arguments of static types are decoded from their topics;
+    indexed dynamic arguments are hashed by the EVM, so the topic hex
+    string is returned.  When every non-indexed argument is a static
+    elementary type the data words are converted directly, otherwise the
+    data is decoded with eth_abi.
+    """
+
+    def __init__(self, item):
+        self.name = item["name"]
+        self.signature = event_signature(item)
+        self.topic = event_topic(item)
+        self.indexed = []
+        self.data_names = []
+        self.data_types = []
+        for index, _input in enumerate(item.get("inputs", ())):
+            name = _input.get("name") or f"arg{index}"
+            _type = canonical_type(_input)
+            if _input.get("indexed"):
+                self.indexed.append((name, word_converter(_type)))
+            else:
+                self.data_names.append(name)
+                self.data_types.append(_type)
+        # events differing only in indexed arguments share topic0
+        self.key = (self.topic, len(self.indexed))
+        converters = [word_converter(_type) for _type in self.data_types]
+        if None in converters:
+            self.data_converters = None
+        else:
+            self.data_converters = list(zip(self.data_names, converters))
+
+    def decode_data(self, data):
+        if self.data_converters is not None:
+            args = {}
+            offset = 2
+            for name, convert in self.data_converters:
+                args[name] = convert(data[offset : offset + 64])
+                offset += 64
+            return args
+        if abi_decode is None:
+            raise RuntimeError(f"eth_abi is required to decode {self.name}")
+        values = abi_decode(self.data_types, bytes.fromhex(data[2:]))
+        return dict(zip(self.data_names, values))
+
+    def decode(self, topics, data):
+        """return the event arguments of a log as a dict"""
+        args = {}
+        for (name, convert), topic in zip(self.indexed, topics[1:]):
+            args[name] = topic if convert is None else convert(topic[2:])
+        args.update(self.decode_data(data))
+        return args
+
+
+class AbiDecoder:
+    """cache of event decoders keyed by topic0 and indexed argument count
+
+    Events with the same signature but different indexed arguments, such
+    as the ERC-20 and ERC-721 Transfer, share topic0 and are told apart
+    by the number of topics of a log.  The decoders of the most recent
+    max_abis ABIs are kept, recognized by their serialized form, and a
+    payload is decoded with its own ABI first.  Decoders of every ABI
+    added also form a fallback index of at most max_decoders entries, the
+    most recently added winning, for logs the payload ABI does not cover.
+    """
+
+    def __init__(self, abi=None, max_abis=MAX_ABIS, max_decoders=MAX_DECODERS):
+        self.max_abis = max_abis
+        self.max_decoders = max_decoders
+        self.abis = OrderedDict()
+        self.decoders = OrderedDict()
+        if abi:
+            self.add(abi)
+
+    def add(self, abi):
+        """return the decoders of an ABI, compiling them on first use"""
+        key = orjson.dumps(abi)
+        decoders = self.abis.get(key)
+        if decoders is not None:
+            self.abis.move_to_end(key)
+            return decoders
+        decoders = {}
+        for item in abi:
+            if item.get("type") == "event" and not item.get("anonymous"):
+                decoder = EventDecoder(item)
+                decoders[decoder.key] = decoder
+                debug(f"decoder {decoder.key} {decoder.signature}")
+        self.abis[key] = decoders
+        if len(self.abis) > self.max_abis:
+            self.abis.popitem(last=False)
+        for decoder_key, decoder in decoders.items():
+            self.decoders[decoder_key] = decoder
+            self.decoders.move_to_end(decoder_key)
+        while len(self.decoders) > self.max_decoders:
+            self.decoders.popitem(last=False)
+        return decoders
+
+    def decode_log(self, log):
+        """decode a single payload Log; returns True if it was decoded"""
+        return self.decode_logs((log,)) == 1
+
+    def decode_logs(self, logs, decoders=None):
+        """decode a batch of logs, such as all the logs of one block
+
+        The event name and decoded arguments are attached to each payload
+        Log as event and args.  decoders, such as those of the payload
+        ABI, are tried before the cache.  Logs are grouped by topic0 and
+        topic count so each decoder is looked up once; returns the number
+        of logs decoded.
+        """
+        groups = {}
+        for log in logs:
+            if log.topics:
+                # decoders are keyed by lowercase topic0, as routes are
+                key = (log.topics[0].lower(), len(log.topics) - 1)
+                groups.setdefault(key, []).append(log)
+        decoded = 0
+        for key, group in groups.items():
+            decoder = (decoders or {}).get(key) or self.decoders.get(key)
+            if decoder is None:
+                continue
+            decode = decoder.decode
+            for log in group:
+                try:
+                    log.args = decode(log.topics, log.data)
+                except Exception as exc:
+                    warning(f"{decoder.signature}: log {log.log_index}: {exc}")
+                    continue
+                log.event = decoder.name
+                decoded += 1
+        return decoded
+
+    def decode_payload(self, payload):
+        """decode the logs of a payload, preferring its own ABI"""
+        decoders = self.add(payload.abi) if payload.abi else None
+        return self.decode_logs(payload.logs, decoders)
+
+
+@lru_cache(maxsize=None)
+def shared_decoder():
+    """return the AbiDecoder shared by EventRecord.payload"""
+    return AbiDecoder()
@@ -0,0 +1,175 @@
+# admission control for event deliveries
+
+import time
+
+from httpx import codes
+from starlette.responses import JSONResponse
+
+from . import settings
+from .metrics import REGISTRY, REQUESTS_REJECTED, Callback, Counter
+
+INFLIGHT = "inflight"
+RELAY = "relay"
+BUFFER = "buffer"
+
+# the buffer depth is a COUNT(*) with the sqlite backend
+DEPTH_INTERVAL = 0.5
+
+ADMISSION_REJECTED = REGISTRY.register(
+    Counter(
+        "webhook_admission_rejected_total",
+        "Event deliveries rejected by admission control",
+        ["cause"],
+    )
+)
+
+
+class Watermark:
+    """high and low watermarks with hysteresis
+
+    Shedding starts when a value reaches high and continues until it
+    falls below low, so admission does not flap around one threshold.
+    A high of None never sheds.
+    """
+
+    def __init__(self, high, low_ratio):
+        self.high = high
+        self.low = None if high is None else int(high * low_ratio)
+        self.shedding = False
+
+    def check(self, value):
+        if self.high is not None:
+            limit = self.low if self.shedding else self.high
+            self.shedding = value >= limit
+        return self.shedding
+
+
+class AdmissionMiddleware:
+    """reject event deliveries while the server is overloaded
+
+    Deliveries to paths are admitted while the number of deliveries in
+    progress, the relay requests in progress and the buffered event count
+    are all below their high watermarks.  Otherwise the request is
+    answered before its body is read: 429 when too many deliveries are
+    in progress, 503 when the relay backlog or the buffer is saturated,
+    both with Retry-After so the sender retries later.
+
+    Args:
+      app (ASGI application): ASGI application
+      events (EventQueue): queue providing relaying and the buffer
+      paths: paths subject to admission control
+      max_inflight, relay_high, buffer_high: high watermarks, None for
+        no limit
+      low_ratio: low watermark as a fraction of high
+      retry_after: Retry-After seconds
+    """
+
+    def __init__(
+        self,
+        app,
+        events,
+        paths=("/contract/event",),
+        max_inflight=None,
+        relay_high=None,
+        buffer_high=None,
+        low_ratio=None,
+        retry_after=None,
+    ):
+        self.app = app
+        self.events = events
+        self.paths = set(paths)
+        low_ratio = low_ratio or settings.ADMISSION_LOW_RATIO
+        self.limits = {
+            INFLIGHT: Watermark(max_inflight, low_ratio),
+            RELAY: Watermark(relay_high, low_ratio),
+            BUFFER: Watermark(buffer_high, low_ratio),
+        }
+        self.retry_after = retry_after or settings.ADMISSION_RETRY_AFTER
+        self.inflight = 0
+        self.depth = 0
+        self.depth_time = None
+
+        REGISTRY.register(
+            Callback(
+                "webhook_ingest_inflight",
+                "Event deliveries in progress",
+                "gauge",
+                lambda: self.inflight,
+            )
+        )
+        REGISTRY.register(
+            Callback(
+                "webhook_relay_backlog",
+                "Relay requests in progress",
+                "gauge",
+                lambda: self.events.relaying,
+            )
+        )
+        REGISTRY.register(
+            Callback(
+                "webhook_admission_shedding",
+                "1 while admission control rejects deliveries",
+                "gauge",
+                lambda: {
+                    (cause,): int(limit.shedding)
+                    for cause, limit in self.limits.items()
+                },
+                ["cause"],
+            )
+        )
+
+    def buffer_depth(self):
+        now = time.monotonic()
+        if self.depth_time is None or now - self.depth_time > DEPTH_INTERVAL:
+            self.depth = len(self.events.events)
+            self.depth_time = now
+        return self.depth
+
+    def overloaded(self):
+        """return the cause of the first exceeded limit, or None"""
+        # every limit is checked to keep each hysteresis state current
+        shedding = [
+            cause
+            for cause, value in (
+                (INFLIGHT, lambda: self.inflight),
+                (RELAY, lambda: self.events.relaying),
+                (BUFFER, self.buffer_depth),
+            )
+            if self.limits[cause].high is not None
+            and self.limits[cause].check(value())
+        ]
+        return shedding[0] if shedding else None
+
+    async def reject(self, scope, receive, send, cause):
+        REQUESTS_REJECTED.inc("overload")
+        ADMISSION_REJECTED.inc(cause)
+        if cause == INFLIGHT:
+            status_code = codes.TOO_MANY_REQUESTS
+        else:
+            status_code = codes.SERVICE_UNAVAILABLE
+        response = JSONResponse(
+            {"detail": f"server overloaded ({cause}); retry later"},
+            status_code=status_code,
+            headers={"Retry-After": str(self.retry_after)},
+        )
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in self.paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        cause = self.overloaded()
+        if cause is not None:
+            await self.reject(scope, receive, send, cause)
+            return
+
+        self.inflight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.inflight -= 1
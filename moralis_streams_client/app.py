@@ -1,9 +1,11 @@
 # webserver subprocess
 
+import asyncio
 import logging
 import os
 import signal
 import sys
+import time
 from copy import copy
 from json.decoder import JSONDecodeError
 from pprint import pformat
@@ -19,17 +21,35 @@ from fastapi import (
     FastAPI,
     Header,
     HTTPException,
+    Query,
     Request,
     Response,
 )
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from starlette.middleware import Middleware
 
 from . import settings
+from .admission import AdmissionMiddleware
+from .auth import NONE, SignatureMiddleware
 from .content_size_limit import ContentSizeLimitMiddleware
-from .event_queue import EventQueue
+from .dedupe import DROP, DUPLICATE_HEADER
+from .defaults import CURSOR_HEADER, NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE
+from .event_queue import EventQueue, create_store
+from .event_record import EventRecord, serialize_list
+from .event_store import event_fields
+from .keccak import check_backend
+from .logconfig import configure_logging
+from .metrics import (
+    CONTENT_TYPE,
+    EVENTS_ACCEPTED,
+    INGEST_SECONDS,
+    REGISTRY,
+    REQUESTS_REJECTED,
+    Callback,
+)
 from .signature import Signature
-from .validate import validate_signature
+from .validate import get_json_body
 
 logger = logging.getLogger(__name__)
 
@@ -47,26 +67,17 @@ app = FastAPI(
         Middleware(
             ContentSizeLimitMiddleware,
             max_content_size=settings.MAX_CONTENT_SIZE,
-        )
+        ),
+        Middleware(
+            SignatureMiddleware,
+            policies={path: NONE for path in settings.AUTH_PUBLIC_PATHS},
+        ),
     ],
-    dependencies=[Depends(validate_signature)],
 )
 
 # models
 
 
-class EventQueueFactory:
-    events = EventQueue()
-
-    @classmethod
-    async def get_events(self):
-        return self.events
-
-
-async def get_event_list():
-    return await EventQueueFactory.get_events()
-
-
 def orjson_dumps(v, *, default):
     def _decoder(obj):
         if isinstance(obj, httpx.URL):
@@ -101,6 +112,30 @@ class RelayResponse(VBaseModel):
     result: Relay
 
 
+class RelayRoute(VBaseModel):
+    name: str = Field(..., description="route name")
+    url: str = Field(..., description="relay target url")
+    header: Optional[str] = Field(None, description="header label for key")
+    key: Optional[str] = Field(
+        None, description="relay target api authentication key"
+    )
+    match: Dict[str, Union[str, int, List[Union[str, int]]]] = Field(
+        {},
+        description="streamId, tag, chainId and topic0 values to match",
+    )
+    max_connections: Optional[int] = Field(
+        None, description="connection pool size"
+    )
+
+
+class RelayRouteStatus(RelayRoute):
+    metrics: Dict = Field(..., description="delivery counters")
+
+
+class RoutesResponse(VBaseModel):
+    result: List[RelayRouteStatus]
+
+
 class Event(VBaseModel):
     id: UUID = Field(..., description="event id")
     path: str = Field(..., descripton="endpoint path")
@@ -120,6 +155,19 @@ class EventsResponse(VBaseModel):
     result: List[Event]
 
 
+class DeleteRequest(VBaseModel):
+    ids: List[UUID] = Field(..., description="event ids to delete")
+
+
+class DeleteResult(VBaseModel):
+    deleted: List[UUID] = Field(..., description="deleted event ids")
+    missing: List[UUID] = Field(..., description="event ids not found")
+
+
+class DeleteResponse(VBaseModel):
+    result: DeleteResult
+
+
 class MessageResponse(VBaseModel):
     result: Union[str, None]
 
@@ -132,9 +180,88 @@ class EnableRequest(VBaseModel):
     enable: bool
 
 
+class EventQueueFactory:
+    events = EventQueue(create_store(), shared=settings.WORKERS > 1)
+
+    @classmethod
+    async def get_events(self):
+        return self.events
+
+
+# outermost, so overloaded deliveries are rejected before the body is read
+app.add_middleware(
+    AdmissionMiddleware,
+    events=EventQueueFactory.events,
+    max_inflight=settings.ADMISSION_MAX_INFLIGHT or None,
+    relay_high=settings.ADMISSION_RELAY_HIGH or None,
+    buffer_high=settings.ADMISSION_BUFFER_HIGH or None,
+)
+
+
+def _dedupe_checks():
+    dedupe = EventQueueFactory.events.dedupe
+    return {("unique",): dedupe.accepted, ("duplicate",): dedupe.duplicates}
+
+
+def _dedupe_actions():
+    dedupe = EventQueueFactory.events.dedupe
+    return {("dropped",): dedupe.dropped, ("tagged",): dedupe.tagged}
+
+
+# metrics read from the event queue when /metrics is scraped
+REGISTRY.register(
+    Callback(
+        "webhook_buffer_events",
+        "Events in the buffer",
+        "gauge",
+        lambda: len(EventQueueFactory.events.events),
+    )
+)
+REGISTRY.register(
+    Callback(
+        "webhook_buffer_bytes",
+        "Size of buffered event bodies and headers",
+        "gauge",
+        lambda: EventQueueFactory.events.events.nbytes(),
+    )
+)
+REGISTRY.register(
+    Callback(
+        "webhook_dedupe_checks_total",
+        "Deliveries checked for duplicates",
+        "counter",
+        _dedupe_checks,
+        ["result"],
+    )
+)
+REGISTRY.register(
+    Callback(
+        "webhook_dedupe_actions_total",
+        "Duplicate deliveries dropped or tagged",
+        "counter",
+        _dedupe_actions,
+        ["action"],
+    )
+)
+
+
+async def get_event_list():
+    return await EventQueueFactory.get_events()
+
+
 # helper functions
 
 
+async def get_event_body(body=Depends(get_json_body)):
+    if not isinstance(body, dict):
+        REQUESTS_REJECTED.inc("invalid")
+        raise HTTPException(
+            detail="event body must be a JSON object",
+            status_code=httpx.codes.UNPROCESSABLE_ENTITY,
+        )
+    return body
+
+
 def header_key(key):
     return "-".join([k.capitalize() for k in key.split("-")])
 
@@ -147,19 +274,30 @@ def obscure_key(key):
 
 @app.on_event("startup")
 async def startup_event():
+    if settings.WORKERS > 1:
+        # worker processes do not inherit the server logging setup
+        configure_logging()
     info(f"{__name__} startup")
     app.state.signature = Signature()
+    check_backend(app.state.signature.backend)
     if not hasattr(app.state, "config"):
         app.state.config = {}
     if not hasattr(app.state, "tunnel_url"):
-        app.state.tunnel_url = None
+        # server workers are passed the tunnel url in the environment
+        app.state.tunnel_url = settings.TUNNEL_URL
     debug(f"{app.state.config=}")
     debug(f"{app.state.tunnel_url=}")
+    events = await get_event_list()
+    recovered = await events.start()
+    if recovered:
+        info(f"recovered {recovered} events from event log")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     info(f"{__name__} shutdown")
+    events = await get_event_list()
+    await events.aclose()
 
 
 @app.get("/hello", response_model=MessageResponse)
@@ -187,55 +325,195 @@ async def get_buffer(events: EventQueue = Depends(get_event_list)):
     return BoolResponse(result=events.buffer_enabled)
 
 
+def relay_response(events):
+    config = events.get_config()
+    return RelayResponse(
+        result=Relay(
+            url=config["relay_url"],
+            header=config["relay_header"],
+            key=obscure_key(config["relay_key"]),
+        )
+    )
+
+
 @app.post("/relay", response_model=RelayResponse)
 async def post_relay(
     request: Relay, events: EventQueue = Depends(get_event_list)
 ):
-    events.relay_url = request.url
-    events.relay_header = request.header
-    events.relay_key = request.key
-
-    return RelayResponse(
-        result=Relay(
-            url=events.relay_url,
-            header=events.relay_header,
-            key=obscure_key(events.relay_key),
-        )
+    events.set_config(
+        relay_url=request.url,
+        relay_header=request.header,
+        relay_key=request.key,
     )
+    return relay_response(events)
 
 
 @app.get("/relay", response_model=RelayResponse)
 async def get_relay(events: EventQueue = Depends(get_event_list)):
-    return RelayResponse(
-        result=Relay(
-            url=events.relay_url,
-            header=events.relay_header,
-            key=obscure_key(events.relay_key),
-        )
+    return relay_response(events)
+
+
+def routes_response(events):
+    router = events.get_router(events.get_config())
+    return RoutesResponse(
+        result=[
+            RelayRouteStatus(
+                **dict(route.dict(), key=obscure_key(route.key)),
+                metrics=route.metrics(),
+            )
+            for route in router.routes
+        ]
     )
 
 
+@app.post("/routes", response_model=RoutesResponse)
+async def post_routes(
+    routes: List[RelayRoute], events: EventQueue = Depends(get_event_list)
+):
+    try:
+        events.set_routes([route.dict() for route in routes])
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=httpx.codes.UNPROCESSABLE_ENTITY, detail=str(exc)
+        )
+    return routes_response(events)
+
+
+@app.get("/routes", response_model=RoutesResponse)
+async def get_routes(events: EventQueue = Depends(get_event_list)):
+    return routes_response(events)
+
+
 @app.post("/contract/event", response_model=EventResponse)
 async def post_contract_event(
-    event: Dict, request: Request, events: EventQueue = Depends(get_event_list)
+    request: Request,
+    event: Dict = Depends(get_event_body),
+    events: EventQueue = Depends(get_event_list),
 ):
+    start = time.perf_counter()
     baselen = len(str(request.base_url))
     debug(f"/contract/event {request}")
 
-    event = Event(
-        id=str(uuid4()),
-        path=str(request.url)[baselen:],
-        method=request.method,
-        headers=dict(request.headers),
-        body=event,
+    event_id = uuid4()
+    headers = dict(request.headers)
+    digest = headers.get(request.app.state.signature.header.lower())
+    original = events.dedupe.check(event, digest, event_id)
+    if original is not None:
+        if events.dedupe.mode == DROP:
+            events.dedupe.dropped += 1
+            INGEST_SECONDS.observe(time.perf_counter() - start)
+            return EventResponse(result=str(original))
+        events.dedupe.tagged += 1
+        headers[DUPLICATE_HEADER] = str(original)
+
+    record = EventRecord(
+        event_id,
+        str(request.url)[baselen:],
+        request.method,
+        headers,
+        await request.body(),
+        fields=event_fields(event),
     )
-    event_id = await events.append(event)
+    try:
+        event_id = await events.append(record)
+    except BaseException:
+        # the delivery was not stored; let the retry through
+        if original is None:
+            events.dedupe.forget(event, digest, event_id)
+        raise
+    EVENTS_ACCEPTED.inc()
+    INGEST_SECONDS.observe(time.perf_counter() - start)
     return EventResponse(result=str(event_id))
 
 
+@app.get("/metrics")
+async def get_metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/dedupe", response_model=EventResponse)
+async def get_dedupe(events: EventQueue = Depends(get_event_list)):
+    return EventResponse(result=events.dedupe.stats())
+
+
+def json_response(content: bytes, status_code=200, headers=None):
+    return Response(
+        content,
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+
+
+async def ndjson_lines(events):
+    async for event in events:
+        yield event.serialize() + b"\n"
+
+
 @app.get("/events", response_model=EventsResponse)
-async def get_events(events: EventQueue = Depends(get_event_list)):
-    return EventsResponse(result=await events.list())
+async def get_events(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, description="page size"),
+    after: Optional[int] = Query(None, ge=0, description="page cursor"),
+    stream_id: Optional[str] = Query(None, alias="streamId"),
+    tag: Optional[str] = Query(None),
+    chain_id: Optional[str] = Query(None, alias="chainId"),
+    from_block: Optional[int] = Query(None, alias="fromBlock"),
+    to_block: Optional[int] = Query(None, alias="toBlock"),
+    confirmed: Optional[bool] = Query(None),
+    events: EventQueue = Depends(get_event_list),
+):
+    filters = dict(
+        stream_id=stream_id,
+        tag=tag,
+        chain_id=chain_id,
+        from_block=from_block,
+        to_block=to_block,
+        confirmed=confirmed,
+    )
+    filters = {k: v for k, v in filters.items() if v is not None}
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return StreamingResponse(
+            ndjson_lines(events.stream(after, limit, filters)),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+    result, cursor = await events.page(after, limit, filters)
+    headers = {}
+    if cursor is not None:
+        headers[CURSOR_HEADER] = str(cursor)
+    return json_response(
+        b'{"result":' + serialize_list(result) + b"}", headers=headers
+    )
+
+
+async def sse_messages(events, subscription):
+    try:
+        while not subscription.overflow:
+            try:
+                data = await subscription.get(settings.SUBSCRIBER_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            yield b"data: " + data + b"\n\n"
+        yield b"event: overflow\ndata: subscriber queue full\n\n"
+    finally:
+        events.unsubscribe(subscription)
+
+
+@app.get("/subscribe")
+async def get_subscribe(events: EventQueue = Depends(get_event_list)):
+    if settings.WORKERS > 1:
+        # a worker only publishes the events it accepted itself
+        raise HTTPException(
+            status_code=httpx.codes.NOT_IMPLEMENTED,
+            detail="/subscribe is not supported with multiple workers",
+        )
+    subscription = events.subscribe()
+    return StreamingResponse(
+        sse_messages(events, subscription),
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache"},
+    )
 
 
 @app.get("/clear", response_model=MessageResponse)
@@ -243,28 +521,41 @@ async def get_clear(events: EventQueue = Depends(get_event_list)):
     return MessageResponse(result=await events.clear())
 
 
+def event_response(event):
+    if event is None:
+        return json_response(
+            b'{"result":null}', status_code=httpx.codes.NOT_FOUND
+        )
+    return json_response(b'{"result":' + event.serialize() + b"}")
+
+
 @app.get("/event/{event_id}", response_model=EventResponse)
 async def get_event(
-    response: Response,
     event_id: UUID,
     events: EventQueue = Depends(get_event_list),
 ):
-    event = await events.lookup(event_id, delete=False)
-    if event is None:
-        response.status_code = httpx.codes.NOT_FOUND
-    return EventResponse(result=event)
+    return event_response(await events.lookup(event_id, delete=False))
 
 
 @app.delete("/event/{event_id}", response_model=EventResponse)
 async def delete_event(
-    response: Response,
     event_id: UUID,
     events: EventQueue = Depends(get_event_list),
 ):
-    event = await events.lookup(event_id, delete=True)
-    if event is None:
-        response.status_code = httpx.codes.NOT_FOUND
-    return EventResponse(result=event)
+    return event_response(await events.lookup(event_id, delete=True))
+
+
+@app.post("/events/delete", response_model=DeleteResponse)
+async def post_events_delete(
+    request: DeleteRequest,
+    events: EventQueue = Depends(get_event_list),
+):
+    deleted = await events.delete_many(request.ids)
+    found = set(deleted)
+    missing = [i for i in dict.fromkeys(request.ids) if i not in found]
+    return DeleteResponse(
+        result=DeleteResult(deleted=deleted, missing=missing)
+    )
 
 
 def reaper():
@@ -3,30 +3,186 @@
 import json
 import logging
 
-from fastapi import HTTPException
-from starlette.applications import Starlette
-from starlette.middleware import Middleware
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import PlainTextResponse
+from httpx import codes
+from starlette.responses import JSONResponse
 
-from .signature import Signature
+from .metrics import REQUESTS_REJECTED
 
 logger = logging.getLogger(__name__)
 debug = logger.debug
 error = logger.error
 critical = logger.critical
 
+# per-route authentication policies
+NONE = "none"
+HEADER = "header"
+BODY = "body"
 
-class SignatureValidator:
-    signature = None
+BODYLESS_METHODS = ["GET", "HEAD", "DELETE", "OPTIONS"]
 
-    def __init__(self, signature):
-        self.__class__.signature = signature
 
-    async def set_cached_receive(self, request):
-        cached = await request._receive()
+class SignatureMiddleware:
+    """ASGI middleware validating the request signature header
 
-        async def receive():
-            return cached
+    Requests are checked before routing.  The policy for each request is
+    looked up by path in policies, defaulting to HEADER for body-less
+    methods and BODY otherwise:
 
-        request._receive = receive
+      NONE: no signature required
+      HEADER: a request without a body is checked against the signature
+        of an empty body and the body is never read; a request that does
+        carry a body is checked as BODY
+      BODY: the body is read and verified; the raw bytes are hashed
+        incrementally as each chunk is received from the (size limited)
+        receive channel, then the canonical compact JSON form is tried.
+        The parsed body is stored in the request state as 'json' for the
+        handler.
+
+    The Signature instance is taken from the application state.
+    """
+
+    def __init__(self, app, policies=None):
+        self.app = app
+        self.policies = dict(policies or {})
+
+    def policy(self, scope):
+        policy = self.policies.get(scope["path"])
+        if policy is None:
+            policy = HEADER if scope["method"] in BODYLESS_METHODS else BODY
+        return policy
+
+    async def reject(
+        self, scope, receive, send, msg, status_code, reason="signature"
+    ):
+        error(f"{msg}: {scope['method']} {scope['path']}")
+        REQUESTS_REJECTED.inc(reason)
+        response = JSONResponse({"detail": msg}, status_code=status_code)
+        await response(scope, receive, send)
+
+    async def read_body(self, receive, hasher):
+        """read the body, hashing each chunk as it arrives"""
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                return None
+            chunk = message.get("body", b"")
+            hasher.update(chunk)
+            chunks.append(chunk)
+            more_body = message.get("more_body", False)
+        return b"".join(chunks)
+
+    def replay(self, body, receive):
+        sent = False
+
+        async def inner():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {
+                    "type": "http.request",
+                    "body": body,
+                    "more_body": False,
+                }
+            return await receive()
+
+        return inner
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        policy = self.policy(scope)
+        if policy == NONE:
+            await self.app(scope, receive, send)
+            return
+
+        signature = scope["app"].state.signature
+        if (
+            signature is None
+            or signature.header is None
+            or signature.key is None
+        ):
+            msg = "signature validator not configured"
+            critical(f"{msg}: {scope['path']}")
+            await self.reject(
+                scope,
+                receive,
+                send,
+                msg,
+                codes.INTERNAL_SERVER_ERROR,
+                reason="config",
+            )
+            return
+
+        header = signature.header.lower().encode()
+        request_signature = None
+        has_body = False
+        for key, value in scope["headers"]:
+            if key == header:
+                request_signature = value.decode()
+            elif key == b"content-length":
+                has_body = value != b"0"
+            elif key == b"transfer-encoding":
+                has_body = True
+
+        if request_signature is None:
+            await self.reject(
+                scope, receive, send, "missing signature", codes.BAD_REQUEST
+            )
+            return
+
+        if policy == HEADER and not has_body:
+            if signature.validate(request_signature, b""):
+                await self.app(scope, receive, send)
+            else:
+                await self.reject(
+                    scope,
+                    receive,
+                    send,
+                    "authorization failed",
+                    codes.UNAUTHORIZED,
+                )
+            return
+
+        hasher = signature.hasher()
+        body = await self.read_body(receive, hasher)
+        if body is None:
+            return
+        debug(f"validating: {scope['path']} length={len(body)}")
+
+        # senders normally sign the exact bytes they send; only fall
+        # back to canonical re-serialization when that fails
+        valid = hasher.validate(request_signature)
+        if not valid and len(body):
+            # json, not orjson: orjson turns integers above 64 bits into
+            # floats, which would change the canonical form
+            try:
+                parsed = json.loads(body)
+            except ValueError as exc:
+                await self.reject(
+                    scope,
+                    receive,
+                    send,
+                    f"invalid JSON body: {exc}",
+                    codes.BAD_REQUEST,
+                    reason="invalid",
+                )
+                return
+            scope.setdefault("state", {})["json"] = parsed
+            canonical = json.dumps(parsed, separators=(",", ":")).encode()
+            valid = signature.validate(request_signature, canonical)
+
+        if not valid:
+            await self.reject(
+                scope,
+                receive,
+                send,
+                "authorization failed",
+                codes.UNAUTHORIZED,
+            )
+            return
+
+        await self.app(scope, self.replay(body, receive), send)
@@ -0,0 +1,109 @@
+# buffered event body compression codecs
+
+import zlib
+
+NONE = "none"
+ZLIB = "zlib"
+ZSTD = "zstd"
+
+CODECS = (NONE, ZLIB, ZSTD)
+
+# zlib only uses the last 32KB of a preset dictionary
+ZLIB_DICTIONARY_SIZE = 32 * 1024
+DICTIONARY_SIZE = 64 * 1024
+
+
+class ZlibCodec:
+    """zlib compression, optionally with a preset dictionary
+
+    Compressor and decompressor objects are primed with the dictionary
+    once and copied for each body.
+    """
+
+    name = ZLIB
+
+    def __init__(self, level=6, dictionary=None):
+        self.level = level
+        self.dictionary = dictionary
+        if dictionary:
+            self._compressor = zlib.compressobj(level, zdict=dictionary)
+            self._decompressor = zlib.decompressobj(zdict=dictionary)
+
+    def compress(self, data):
+        if not self.dictionary:
+            return zlib.compress(data, self.level)
+        compressor = self._compressor.copy()
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data):
+        if not self.dictionary:
+            return zlib.decompress(data)
+        decompressor = self._decompressor.copy()
+        return decompressor.decompress(data) + decompressor.flush()
+
+
+class ZstdCodec:
+    """zstandard compression, optionally with a trained dictionary
+
+    Requires the zstandard package.
+    """
+
+    name = ZSTD
+
+    def __init__(self, level=3, dictionary=None):
+        import zstandard
+
+        self.level = level
+        self.dictionary = dictionary
+        dict_data = (
+            zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        )
+        self._compressor = zstandard.ZstdCompressor(
+            level=level, dict_data=dict_data
+        )
+        self._decompressor = zstandard.ZstdDecompressor(dict_data=dict_data)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def decompress(self, data):
+        return self._decompressor.decompress(data)
+
+
+def load_codec(name, level=None, dictionary=None):
+    """return the named codec, or None for 'none'
+
+    dictionary is the dictionary bytes, or the path of a file holding
+    them, as written by train_dictionary()
+    """
+    if name == NONE:
+        return None
+    if isinstance(dictionary, str):
+        with open(dictionary, "rb") as ifp:
+            dictionary = ifp.read()
+    kwargs = dict(dictionary=dictionary)
+    if level is not None:
+        kwargs["level"] = level
+    if name == ZLIB:
+        return ZlibCodec(**kwargs)
+    elif name == ZSTD:
+        return ZstdCodec(**kwargs)
+    raise ValueError(
+        f"unknown buffer compression {name}; expected one of {CODECS}"
+    )
+
+
+def train_dictionary(name, samples, size=DICTIONARY_SIZE):
+    """return a dictionary for codec name built from sample bodies
+
+    zstd trains a dictionary; zlib uses the most recent samples
+    concatenated, up to the 32KB it can use.
+    """
+    if name == ZSTD:
+        import zstandard
+
+        return zstandard.train_dictionary(size, list(samples)).as_bytes()
+    elif name == ZLIB:
+        size = min(size, ZLIB_DICTIONARY_SIZE)
+        return b"".join(samples)[-size:]
+    raise ValueError(f"{name} does not use a dictionary")
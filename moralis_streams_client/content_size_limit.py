@@ -1,7 +1,10 @@
 import logging
-from typing import Optional, Type
+from typing import Optional
 
 from fastapi.responses import JSONResponse
+from httpx import codes
+
+from .metrics import REQUESTS_REJECTED
 
 
 class ContentSizeLimitExceeded(Exception):
@@ -16,10 +19,15 @@ critical = logger.debug
 class ContentSizeLimitMiddleware:
     """Content size limiting middleware for ASGI applications
 
+    Requests declaring a Content-Length over the limit are rejected with
+    413 before any of the body is read.  Bodies without a declared length
+    are counted as they are received; ContentSizeLimitExceeded is raised
+    from receive() as soon as the limit is crossed and answered with 413,
+    so the remainder of the body is never read.
+
     Args:
       app (ASGI application): ASGI application
       max_content_size (optional): the maximum content size allowed in bytes, None for no limit
-      exception_cls (optional): the class of exception to raise (ContentSizeExceeded is the default)
     """
 
     def __init__(
@@ -30,31 +38,69 @@ class ContentSizeLimitMiddleware:
         self.app = app
         self.max_content_size = max_content_size
 
+    def declared_length(self, scope):
+        for key, value in scope["headers"]:
+            if key == b"content-length":
+                try:
+                    return int(value)
+                except ValueError:
+                    return None
+        return None
+
+    async def reject(self, scope, receive, send, msg):
+        critical(msg)
+        REQUESTS_REJECTED.inc("size")
+        response = JSONResponse(
+            {"detail": msg}, status_code=codes.REQUEST_ENTITY_TOO_LARGE
+        )
+        await response(scope, receive, send)
+
     def receive_wrapper(self, receive):
         received = 0
 
         async def inner():
             nonlocal received
             message = await receive()
-            if (
-                message["type"] != "http.request"
-                or self.max_content_size is None
-            ):
+            if message["type"] != "http.request":
                 return message
             body_len = len(message.get("body", b""))
             received += body_len
             if received > self.max_content_size:
-                msg = f"Maximum content size limit ({self.max_content_size}) exceeded ({received} bytes read)"
-                critical(msg)
-                return ContentSizeLimitExceeded(msg)
+                raise ContentSizeLimitExceeded(
+                    f"Maximum content size limit ({self.max_content_size}) "
+                    f"exceeded ({received} bytes read)"
+                )
             return message
 
         return inner
 
     async def __call__(self, scope, receive, send):
-        if scope["type"] != "http":
+        if scope["type"] != "http" or self.max_content_size is None:
             await self.app(scope, receive, send)
             return
 
-        wrapper = self.receive_wrapper(receive)
-        await self.app(scope, wrapper, send)
+        length = self.declared_length(scope)
+        if length is not None and length > self.max_content_size:
+            await self.reject(
+                scope,
+                receive,
+                send,
+                f"Maximum content size limit ({self.max_content_size}) "
+                f"exceeded (Content-Length {length})",
+            )
+            return
+
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, self.receive_wrapper(receive), send_wrapper)
+        except ContentSizeLimitExceeded as exc:
+            if response_started:
+                raise
+            await self.reject(scope, receive, send, str(exc))
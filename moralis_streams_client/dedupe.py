@@ -0,0 +1,97 @@
+# webhook delivery deduplication
+
+import logging
+import time
+from collections import OrderedDict
+
+from . import settings
+
+logger = logging.getLogger(__name__)
+debug = logger.debug
+logger.setLevel(settings.LOG_LEVEL)
+
+OFF = "off"
+DROP = "drop"
+TAG = "tag"
+MODE_CHOICES = [OFF, DROP, TAG]
+
+DUPLICATE_HEADER = "x-webhook-duplicate"
+
+
+def dedupe_key(body, digest):
+    """return the identity of a webhook delivery
+
+    Moralis payloads are identified by stream, block hash and confirmed
+    flag, so a retry with an incremented retries count matches the
+    original delivery.  Other payloads fall back to the signature digest.
+    """
+    block = body.get("block")
+    stream_id = body.get("streamId")
+    if isinstance(block, dict) and block.get("hash") and stream_id:
+        return (stream_id, block["hash"], bool(body.get("confirmed")))
+    return digest
+
+
+class Deduplicator:
+    """bounded, time-windowed index of recently accepted deliveries"""
+
+    def __init__(self, mode=None, window=None, max_size=None):
+        self.mode = mode or settings.DEDUPE
+        if self.mode not in MODE_CHOICES:
+            raise ValueError(f"dedupe mode must be one of {MODE_CHOICES}")
+        self.window = settings.DEDUPE_WINDOW if window is None else window
+        self.max_size = max_size or settings.DEDUPE_SIZE
+        self.index = OrderedDict()
+        self.accepted = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self.tagged = 0
+
+    def expire(self, now):
+        index = self.index
+        while index:
+            key, (timestamp, _) = next(iter(index.items()))
+            if now - timestamp <= self.window and len(index) < self.max_size:
+                break
+            index.popitem(last=False)
+
+    def check(self, body, digest, event_id):
+        """record a delivery; return the id of an earlier duplicate or None"""
+        if self.mode == OFF:
+            return None
+        now = time.monotonic()
+        self.expire(now)
+        key = dedupe_key(body, digest)
+        original = self.index.get(key)
+        if original is not None:
+            self.duplicates += 1
+            debug(f"duplicate {key=} original={original[1]}")
+            return original[1]
+        self.index[key] = (now, event_id)
+        self.accepted += 1
+        return None
+
+    def forget(self, body, digest, event_id):
+        """remove the delivery recorded for event_id
+
+        Called when an accepted delivery could not be stored, so the
+        sender's retry is not mistaken for a duplicate.
+        """
+        if self.mode == OFF:
+            return
+        key = dedupe_key(body, digest)
+        recorded = self.index.get(key)
+        if recorded is not None and recorded[1] == event_id:
+            del self.index[key]
+            self.accepted -= 1
+
+    def stats(self):
+        return dict(
+            mode=self.mode,
+            window=self.window,
+            size=len(self.index),
+            accepted=self.accepted,
+            duplicates=self.duplicates,
+            dropped=self.dropped,
+            tagged=self.tagged,
+        )
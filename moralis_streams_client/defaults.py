@@ -14,3 +14,6 @@ ERROR = "error"
 STATUS_CHOICES = [ACTIVE, PAUSED, ERROR]
 ACCESS_LOG_FORMAT = "ACCESS_LOG: %(h)s %(m)s %(U)s %(q)s %({content-type}i)s %(b)s [%(s)s %(st)s %({content-type}o)s %({headers})s %(B)s]"
 LOG_FORMAT = "%(levelname)s %(name)s.%(funcName)s: %(message)s [%(filename)s:%(lineno)s]"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CURSOR_HEADER = "X-Cursor"
+SSE_MEDIA_TYPE = "text/event-stream"
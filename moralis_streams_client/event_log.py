@@ -0,0 +1,236 @@
+# durable append-only event log
+
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+
+from . import settings
+
+logger = logging.getLogger(__name__)
+debug = logger.debug
+info = logger.info
+warning = logger.warning
+logger.setLevel(settings.LOG_LEVEL)
+
+EVENT = b"E"
+DELETE = b"D"
+CLEAR = b"C"
+
+FSYNC_ALWAYS = "always"
+FSYNC_INTERVAL = "interval"
+FSYNC_NONE = "none"
+FSYNC_CHOICES = [FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NONE]
+
+SEGMENT_SUFFIX = ".log"
+
+# record header: type, payload length, payload crc32
+HEADER = struct.Struct(">cII")
+
+
+class EventLog:
+    """segmented append-only log of accepted events
+
+    Records are written to numbered segment files in the log directory.
+    A segment is closed and a new one started once it reaches
+    segment_size bytes, and only the newest retention segments are kept.
+    Delete and clear operations are logged as records so replay
+    reproduces the buffer contents.
+
+    Every record is flushed to the kernel as it is written, so it
+    survives the server process being killed; the fsync policy only
+    decides when it is forced to disk.  With the interval policy a task
+    started by start() syncs outstanding writes every fsync_interval.
+
+    snapshot, if given, returns the serialized live events.  Before
+    retention removes segments they are written forward into a new
+    segment, so expired segments never take buffered events with them.
+    Without snapshot, events older than the retained segments are lost
+    on replay.
+    """
+
+    def __init__(
+        self,
+        path,
+        *,
+        fsync=None,
+        fsync_interval=None,
+        segment_size=None,
+        retention=None,
+        snapshot=None,
+    ):
+        self.path = Path(path)
+        self.fsync = fsync or settings.EVENT_LOG_FSYNC
+        if self.fsync not in FSYNC_CHOICES:
+            raise ValueError(f"fsync policy must be one of {FSYNC_CHOICES}")
+        self.fsync_interval = (
+            settings.EVENT_LOG_FSYNC_INTERVAL
+            if fsync_interval is None
+            else fsync_interval
+        )
+        self.segment_size = segment_size or settings.EVENT_LOG_SEGMENT_SIZE
+        self.retention = retention or settings.EVENT_LOG_RETENTION
+        self.snapshot = snapshot
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.file = None
+        self.dirty = False
+        self.compacting = False
+        # segments kept; raised by compaction to hold the live events
+        self.keep = self.retention
+        self.task = None
+        self.last_sync = time.monotonic()
+
+    def segments(self):
+        return sorted(self.path.glob("*" + SEGMENT_SUFFIX))
+
+    def _segment_name(self, number):
+        return self.path / f"{number:010d}{SEGMENT_SUFFIX}"
+
+    def _open(self):
+        segments = self.segments()
+        if segments:
+            segment = segments[-1]
+        else:
+            segment = self._segment_name(1)
+        debug(f"open {segment}")
+        self.file = open(segment, "ab")
+
+    def rotate(self):
+        """close the current segment and start a new one"""
+        segments = self.segments()
+        number = int(segments[-1].stem) + 1 if segments else 1
+        self.close()
+        self.file = open(self._segment_name(number), "ab")
+        debug(f"rotate {self.file.name}")
+        if self.compacting:
+            return
+        expired = self.segments()[: -self.keep]
+        if expired and self.snapshot is not None:
+            self.compact()
+            return
+        for segment in expired:
+            info(f"retention: removing {segment}")
+            segment.unlink()
+
+    def compact(self):
+        """rewrite the live events from the current segment on and drop
+        all older segments"""
+        first = Path(self.file.name)
+        self.compacting = True
+        try:
+            for data in self.snapshot():
+                self._write(EVENT, data)
+        finally:
+            self.compacting = False
+        self.sync()
+        for segment in self.segments():
+            if segment < first:
+                info(f"compaction: removing {segment}")
+                segment.unlink()
+        # a buffer larger than retention segments is not rewritten again
+        # until another retention segments have been written
+        self.keep = len(self.segments()) - 1 + self.retention
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+    def sync(self):
+        self.file.flush()
+        if self.fsync != FSYNC_NONE:
+            os.fsync(self.file.fileno())
+        self.dirty = False
+        self.last_sync = time.monotonic()
+
+    def start(self):
+        """start syncing outstanding writes every fsync_interval"""
+        if self.fsync == FSYNC_INTERVAL and self.task is None:
+            self.task = asyncio.get_running_loop().create_task(
+                self._sync_loop()
+            )
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.fsync_interval)
+            if self.dirty and self.file is not None:
+                self.sync()
+
+    async def aclose(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        self.close()
+
+    def _write(self, record_type, payload):
+        if self.file is None:
+            self._open()
+        self.file.write(
+            HEADER.pack(record_type, len(payload), zlib.crc32(payload))
+        )
+        self.file.write(payload)
+        # the kernel keeps flushed data if the process dies
+        self.file.flush()
+        self.dirty = True
+        if self.fsync == FSYNC_ALWAYS:
+            self.sync()
+        elif self.fsync == FSYNC_INTERVAL:
+            if time.monotonic() - self.last_sync >= self.fsync_interval:
+                self.sync()
+        if self.file.tell() >= self.segment_size:
+            self.rotate()
+
+    def append(self, data: bytes):
+        self._write(EVENT, data)
+
+    def delete(self, event_id):
+        self._write(DELETE, str(event_id).encode())
+
+    def clear(self):
+        """log a clear record and drop all older segments"""
+        self.rotate()
+        for segment in self.segments()[:-1]:
+            segment.unlink()
+        self.keep = self.retention
+        self._write(CLEAR, b"")
+
+    def _scan(self, segment):
+        """yield (type, payload) for each intact record in a segment"""
+        size = segment.stat().st_size
+        if size == 0:
+            return
+        with open(segment, "rb") as ifp:
+            with mmap.mmap(ifp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                offset = 0
+                while offset + HEADER.size <= size:
+                    record_type, length, crc = HEADER.unpack_from(mm, offset)
+                    start = offset + HEADER.size
+                    end = start + length
+                    if end > size:
+                        break
+                    payload = mm[start:end]
+                    if zlib.crc32(payload) != crc:
+                        break
+                    yield record_type, payload
+                    offset = end
+        if offset < size:
+            warning(
+                f"{segment}: discarding {size - offset} bytes of "
+                "incomplete or corrupt records"
+            )
+            os.truncate(segment, offset)
+
+    def replay(self):
+        """yield (type, payload) for every record in the log, oldest first"""
+        self.close()
+        for segment in self.segments():
+            yield from self._scan(segment)
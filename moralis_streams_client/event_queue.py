@@ -1,88 +1,319 @@
-import collections
+import asyncio
 import logging
+import time
+from uuid import UUID, uuid4
 
 import httpx
 
 from . import defaults, settings
+from .compression import load_codec
+from .dedupe import Deduplicator
+from .event_log import CLEAR, DELETE, EVENT, EventLog
+from .event_record import EventRecord
+from .event_store import EventStore
+from .metrics import RELAY_RESPONSES, RELAY_SECONDS, SUBSCRIBERS_DROPPED
+from .routing import RoutingTable, load_routes
+from .sqlite_store import SQLiteEventStore
 
 logger = logging.getLogger(__name__)
 debug = logger.debug
 logger.setLevel(settings.LOG_LEVEL)
 
+STREAM_PAGE_SIZE = 1000
+
+
+class Subscription:
+    """bounded queue of serialized events for one live subscriber"""
+
+    def __init__(self, maxsize):
+        self.queue = asyncio.Queue(maxsize)
+        self.overflow = False
+
+    def put(self, data):
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self.overflow = True
+        return not self.overflow
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+def create_store():
+    """return the event store selected by settings.BUFFER_BACKEND
+
+    with multiple server workers the sqlite store is written through so
+    every worker sees each event as soon as it is accepted; the memory
+    store compresses bodies with settings.BUFFER_COMPRESSION
+    """
+    if settings.BUFFER_BACKEND == "memory":
+        return EventStore(
+            load_codec(
+                settings.BUFFER_COMPRESSION,
+                settings.BUFFER_COMPRESSION_LEVEL,
+                settings.BUFFER_COMPRESSION_DICT,
+            )
+        )
+    elif settings.BUFFER_BACKEND == "sqlite":
+        batch_size = 1 if settings.WORKERS > 1 else None
+        return SQLiteEventStore(settings.BUFFER_DB, batch_size)
+    raise ValueError(f"unknown buffer backend: {settings.BUFFER_BACKEND}")
+
+
+def default_config():
+    """return the initial relay and buffer configuration from settings"""
+    return dict(
+        buffer_enabled=settings.BUFFER_ENABLE,
+        relay_url=settings.RELAY_URL,
+        relay_header=settings.RELAY_HEADER,
+        relay_key=str(settings.RELAY_KEY),
+        routes=(
+            load_routes(settings.ROUTES_FILE) if settings.ROUTES_FILE else []
+        ),
+        routes_version=0,
+    )
+
+
+def _config_property(key):
+    def fget(self):
+        return self.get_config()[key]
+
+    def fset(self, value):
+        self.set_config(**{key: value})
+
+    return property(fget, fset)
+
 
 class EventQueue:
-    def __init__(self):
+    """event buffer, relay and live subscriber fan-out
+
+    Events selected by the routing table are sent to each matching route;
+    other events go to the relay url if one is set.
+
+    When shared is set the relay, routing and buffer configuration is kept
+    in the store so that server workers using the same store agree on it.
+    """
+
+    buffer_enabled = _config_property("buffer_enabled")
+    relay_url = _config_property("relay_url")
+    relay_header = _config_property("relay_header")
+    relay_key = _config_property("relay_key")
+
+    def __init__(self, store=None, shared=False):
         debug("init")
-        self.events = collections.deque([])
-        self.buffer_enabled = settings.BUFFER_ENABLE
-        self.relay_url = settings.RELAY_URL
-        self.relay_header = settings.RELAY_HEADER
-        self.relay_key = str(settings.RELAY_KEY)
+        self.events = EventStore() if store is None else store
+        self.shared = shared
+        self.config = default_config()
         self.relay_id_header = settings.RELAY_ID_HEADER
+        self.router = RoutingTable()
+        self.router_version = None
+        self.subscribers = set()
+        self.relaying = 0
+        self.dedupe = Deduplicator()
+        self.log = None
+        if settings.EVENT_LOG:
+            self.log = EventLog(settings.EVENT_LOG, snapshot=self.snapshot)
+
+    def get_config(self):
+        if self.shared:
+            return dict(self.config, **self.events.load_config())
+        return self.config
+
+    def set_config(self, **values):
+        self.config.update(values)
+        if self.shared:
+            self.events.save_config(**values)
+
+    def get_router(self, config):
+        """return the routing table, recompiling it if the routes changed"""
+        if config["routes_version"] != self.router_version:
+            previous = {route.name: route for route in self.router.routes}
+            router = RoutingTable(config["routes"])
+            # unchanged routes keep their connection pools and counters
+            for position, route in enumerate(router.routes):
+                old = previous.get(route.name)
+                if old is not None and old.dict() == route.dict():
+                    router.routes[position] = old
+            kept = set(map(id, router.routes))
+            for route in previous.values():
+                if id(route) not in kept:
+                    route.retire()
+            self.router = router
+            self.router_version = config["routes_version"]
+        return self.router
+
+    def set_routes(self, routes):
+        """validate, compile and store a new routing table"""
+        router = RoutingTable(routes)
+        self.set_config(
+            routes=[route.dict() for route in router.routes],
+            routes_version=uuid4().hex,
+        )
+        return self.get_router(self.get_config())
+
+    async def start(self):
+        """recover the buffer from the event log and start syncing it"""
+        recovered = self.recover()
+        if self.log is not None:
+            self.log.start()
+        return recovered
+
+    def snapshot(self):
+        """return the event log records of the buffered events"""
+        return (event.pack() for event in self.events.values())
+
+    def recover(self):
+        """replay the event log into the buffer"""
+        if self.log is None:
+            return 0
+        for record_type, payload in self.log.replay():
+            if record_type == EVENT:
+                event = EventRecord.unpack(payload)
+                # a compaction interrupted by a crash leaves duplicates
+                if self.events.get(event.id) is None:
+                    self.events.append(event)
+            elif record_type == DELETE:
+                self.events.pop(UUID(payload.decode()))
+            elif record_type == CLEAR:
+                self.events.clear()
+        debug(f"recovered {len(self.events)} events from {self.log.path}")
+        return len(self.events)
+
+    async def aclose(self):
+        await self.router.aclose()
+        if self.log is not None:
+            await self.log.aclose()
+        self.close()
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+        if hasattr(self.events, "close"):
+            self.events.close()
+
+    def subscribe(self, maxsize=None):
+        subscription = Subscription(maxsize or settings.SUBSCRIBER_QUEUE_SIZE)
+        self.subscribers.add(subscription)
+        debug(f"subscribe: {len(self.subscribers)} subscribers")
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+        debug(f"unsubscribe: {len(self.subscribers)} subscribers")
+
+    def publish(self, event):
+        """push an accepted event to all subscribers, dropping slow ones"""
+        data = event.serialize()
+        for subscription in list(self.subscribers):
+            if not subscription.put(data):
+                logger.warning("subscriber queue full; disconnecting")
+                SUBSCRIBERS_DROPPED.inc()
+                self.unsubscribe(subscription)
 
     async def append(self, event):
         debug("append")
-        if self.relay_url:
-            _response = await self.forward(event)
-            event.relay = dict(
-                url=_response.url,
-                status_code=_response.status_code,
-                text=_response.text,
-                headers=dict(_response.headers),
-            )
+        config = self.get_config()
+        if self.subscribers:
+            self.publish(event)
+        routes = self.get_router(config).match(event)
+        if routes or config["relay_url"]:
+            self.relaying += 1
+            try:
+                event.relay = await self.relay(event, config, routes)
+            finally:
+                self.relaying -= 1
         else:
             event.relay = None
-        if self.buffer_enabled:
+        if config["buffer_enabled"]:
             self.events.append(event)
+            if self.log is not None:
+                self.log.append(event.pack())
         return event.id
 
-    async def forward(self, event):
+    async def relay(self, event, config, routes):
+        """relay to the matching routes, else to relay_url"""
+        if routes:
+            results = await self.router.dispatch(
+                event, routes, self.relay_id_header
+            )
+            return dict(routes=results)
+        _response = await self.forward(event, config)
+        return dict(
+            url=str(_response.url),
+            status_code=_response.status_code,
+            text=_response.text,
+            headers=dict(_response.headers),
+        )
+
+    async def forward(self, event, config=None):
         debug("forward")
+        config = config or self.get_config()
+        relay_url = config["relay_url"]
         headers = event.headers
-        if self.relay_header and self.relay_key:
-            headers[self.relay_header] = self.relay_key
+        if config["relay_header"] and config["relay_key"]:
+            headers[config["relay_header"]] = config["relay_key"]
         headers[self.relay_id_header] = str(event.id)
-        debug(f"post({self.relay_url} {headers} {event.body})")
-        async with httpx.AsyncClient() as client:
-            ret = await client.post(
-                self.relay_url, headers=headers, json=event.body
-            )
+        debug(f"post({relay_url} {headers} {len(event.raw)} bytes)")
+        start = time.perf_counter()
+        try:
+            async with httpx.AsyncClient() as client:
+                ret = await client.post(
+                    relay_url, headers=headers, content=event.raw
+                )
+        except httpx.HTTPError:
+            RELAY_RESPONSES.inc("relay", "error")
+            raise
+        finally:
+            RELAY_SECONDS.observe(time.perf_counter() - start, "relay")
+        RELAY_RESPONSES.inc("relay", str(ret.status_code))
         debug(f"ret={ret}")
         return ret
 
     async def list(self):
-        # create a list from the event_queue, preserving order
+        # the store preserves insertion order
         debug("list")
-        ret = []
-        tq = self.events.copy()
-        try:
-            while True:
-                ret.append(tq.popleft())
-        except IndexError:
-            pass
-        return ret
+        return self.events.values()
+
+    async def page(self, after=None, limit=None, filters=None):
+        debug(f"page {after=} {limit=} {filters=}")
+        return self.events.page(after, limit, filters)
+
+    async def stream(self, after=None, limit=None, filters=None):
+        """yield events in order, fetching one page at a time"""
+        debug(f"stream {after=} {limit=} {filters=}")
+        while limit is None or limit > 0:
+            page_size = STREAM_PAGE_SIZE
+            if limit is not None:
+                page_size = min(page_size, limit)
+                limit -= page_size
+            events, after = self.events.page(after, page_size, filters)
+            for event in events:
+                yield event
+            if after is None:
+                break
 
     async def clear(self):
         debug("clear")
         self.events.clear()
+        if self.log is not None:
+            self.log.clear()
         return "cleared"
 
+    async def delete_many(self, event_ids):
+        """delete events by id; return the ids that were deleted"""
+        debug("delete_many")
+        deleted = self.events.delete_many(event_ids)
+        if self.log is not None:
+            for event_id in deleted:
+                self.log.delete(event_id)
+        return deleted
+
     async def lookup(self, event_id, delete):
         debug("lookup")
-        tq = self.events.copy()
         if delete:
-            self.events.clear()
-        found = None
-        while True:
-            try:
-                event = tq.popleft()
-                if event.id == event_id:
-                    found = event
-                    if delete is False:
-                        break
-                elif delete is True:
-                    self.events.append(event)
-            except IndexError:
-                break
-
-        return found
+            event = self.events.pop(event_id)
+            if event is not None and self.log is not None:
+                self.log.delete(event_id)
+            return event
+        return self.events.get(event_id)
@@ -0,0 +1,253 @@
+# compact buffered event record
+
+import struct
+from uuid import UUID
+
+import orjson
+
+from . import settings
+from .event_store import event_fields
+from .payload import decode
+
+# packed record: version, metadata and headers lengths, then the
+# metadata JSON, the serialized headers and the body bytes as received
+PACK_VERSION = b"\x01"
+PACK_HEADER = struct.Struct(">cII")
+
+
+def _default(obj):
+    return str(obj)
+
+
+class EventRecord:
+    """a received webhook kept as its original body bytes
+
+    headers are held in serialized form and body is never stored
+    decoded; the headers and body properties decode on demand.
+    fields holds the indexed payload fields extracted at ingest.
+    serialize() assembles the JSON event object from the stored bytes
+    without re-encoding the body.
+    """
+
+    __slots__ = (
+        "id",
+        "path",
+        "method",
+        "raw_headers",
+        "raw",
+        "relay",
+        "fields",
+    )
+
+    def __init__(
+        self, id, path, method, headers, raw, relay=None, fields=None
+    ):
+        self.id = id
+        self.path = path
+        self.method = method
+        if isinstance(headers, dict):
+            headers = orjson.dumps(headers)
+        self.raw_headers = headers
+        self.raw = raw
+        self.relay = relay
+        self.fields = fields
+
+    @property
+    def headers(self):
+        return orjson.loads(self.raw_headers)
+
+    @property
+    def body(self):
+        return orjson.loads(self.raw)
+
+    @property
+    def payload(self):
+        """the body decoded into compact payload records
+
+        With settings.DECODE_ABI the logs are decoded with the payload ABI
+        and carry event and args.
+        """
+        payload = decode(self.raw)
+        if settings.DECODE_ABI:
+            # eth-hash is only needed when decoding is enabled
+            from .abi import shared_decoder
+
+            shared_decoder().decode_payload(payload)
+        return payload
+
+    def __eq__(self, other):
+        return isinstance(other, EventRecord) and self.id == other.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"{type(self).__name__}<{self.id} {len(self.raw)} bytes>"
+
+    def nbytes(self):
+        """return the size of the stored body and headers"""
+        return len(self.raw) + len(self.raw_headers)
+
+    def compressed(self, codec):
+        """return a copy of this record with its body compressed by codec"""
+        return CompressedEventRecord(
+            self.id,
+            self.path,
+            self.method,
+            self.raw_headers,
+            self.raw,
+            self.relay,
+            self.fields,
+            codec,
+        )
+
+    def serialize(self) -> bytes:
+        """return the event as a single line of JSON
+
+        The body bytes are inserted as received.  JSON strings cannot
+        hold raw line breaks, so any in an accepted (not compact) body
+        are whitespace and are replaced to keep NDJSON and SSE framing.
+        """
+        raw = self.raw
+        if b"\n" in raw or b"\r" in raw:
+            raw = raw.replace(b"\n", b" ").replace(b"\r", b" ")
+        return b"".join(
+            (
+                b'{"id":"',
+                str(self.id).encode(),
+                b'","path":',
+                orjson.dumps(self.path),
+                b',"method":',
+                orjson.dumps(self.method),
+                b',"headers":',
+                self.raw_headers,
+                b',"body":',
+                raw,
+                b',"relay":',
+                orjson.dumps(self.relay, default=_default),
+                b"}",
+            )
+        )
+
+    def dict(self):
+        return orjson.loads(self.serialize())
+
+    @classmethod
+    def from_body(cls, id, path, method, headers, body, relay=None):
+        """return an EventRecord for a decoded body"""
+        return cls(
+            id,
+            path,
+            method,
+            headers,
+            orjson.dumps(body),
+            relay,
+            event_fields(body),
+        )
+
+    def pack(self) -> bytes:
+        """return the record in the event log format
+
+        Unlike serialize(), the body bytes are kept as they were received,
+        so unpack() restores raw exactly.
+        """
+        meta = orjson.dumps(
+            dict(
+                id=str(self.id),
+                path=self.path,
+                method=self.method,
+                relay=self.relay,
+                fields=self.fields,
+            ),
+            default=_default,
+        )
+        return b"".join(
+            (
+                PACK_HEADER.pack(
+                    PACK_VERSION, len(meta), len(self.raw_headers)
+                ),
+                meta,
+                self.raw_headers,
+                self.raw,
+            )
+        )
+
+    @classmethod
+    def unpack(cls, data: bytes):
+        """return an EventRecord from pack() output
+
+        Event logs written before pack() hold serialize() output, which
+        is parsed instead.
+        """
+        if data[:1] == b"{":
+            return cls.parse(data)
+        _, meta_size, headers_size = PACK_HEADER.unpack_from(data)
+        headers_start = PACK_HEADER.size + meta_size
+        body_start = headers_start + headers_size
+        meta = orjson.loads(data[PACK_HEADER.size : headers_start])
+        return cls(
+            UUID(meta["id"]),
+            meta["path"],
+            meta["method"],
+            bytes(data[headers_start:body_start]),
+            bytes(data[body_start:]),
+            meta["relay"],
+            meta["fields"],
+        )
+
+    @classmethod
+    def parse(cls, data: bytes):
+        """return an EventRecord from its serialized form"""
+        obj = orjson.loads(data)
+        return cls.from_body(
+            UUID(obj["id"]),
+            obj["path"],
+            obj["method"],
+            obj["headers"],
+            obj["body"],
+            obj["relay"],
+        )
+
+
+class CompressedEventRecord(EventRecord):
+    """an EventRecord holding its body compressed by codec
+
+    raw decompresses the body on each access, so a buffered event costs
+    its compressed size until it is read.
+    """
+
+    __slots__ = ("zraw", "codec")
+
+    def __init__(
+        self,
+        id,
+        path,
+        method,
+        headers,
+        raw,
+        relay=None,
+        fields=None,
+        codec=None,
+    ):
+        self.codec = codec
+        super().__init__(id, path, method, headers, raw, relay, fields)
+
+    @property
+    def raw(self):
+        return self.codec.decompress(self.zraw)
+
+    @raw.setter
+    def raw(self, value):
+        self.zraw = self.codec.compress(value)
+
+    def nbytes(self):
+        return len(self.zraw) + len(self.raw_headers)
+
+    def compressed(self, codec):
+        if codec is self.codec:
+            return self
+        return super().compressed(codec)
+
+
+def serialize_list(records) -> bytes:
+    return b"[" + b",".join(r.serialize() for r in records) + b"]"
@@ -0,0 +1,161 @@
+# event buffer stores
+
+import sys
+from bisect import bisect_right
+
+
+def _int(value):
+    try:
+        return int(value, 0) if isinstance(value, str) else int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def body_topics(body):
+    """return the distinct lowercase topic0 values of a body's logs"""
+    logs = body.get("logs")
+    if not isinstance(logs, list):
+        return ()
+    # topics repeat across events; share one string per topic
+    return tuple(
+        {
+            sys.intern(topic.lower()): None
+            for log in logs
+            if isinstance(log, dict)
+            and isinstance(topic := log.get("topic0"), str)
+            and topic
+        }
+    )
+
+
+def event_fields(body):
+    """return the indexed fields of a moralis webhook body"""
+    block = body.get("block")
+    if isinstance(block, dict):
+        block_number = _int(block.get("number"))
+    else:
+        block_number = None
+    confirmed = body.get("confirmed")
+    return dict(
+        stream_id=body.get("streamId"),
+        tag=body.get("tag"),
+        chain_id=_int(body.get("chainId")),
+        block_number=block_number,
+        confirmed=None if confirmed is None else bool(confirmed),
+        topics=body_topics(body),
+    )
+
+
+def match(fields, filters):
+    """return True if event fields satisfy all filters"""
+    for key, value in filters.items():
+        if key == "from_block":
+            number = fields["block_number"]
+            if number is None or number < value:
+                return False
+        elif key == "to_block":
+            number = fields["block_number"]
+            if number is None or number > value:
+                return False
+        elif key == "chain_id":
+            if fields["chain_id"] != _int(value):
+                return False
+        elif fields[key] != value:
+            return False
+    return True
+
+
+class EventStore:
+    """insertion-ordered event buffer indexed by event id
+
+    Each event is assigned a monotonically increasing sequence number used
+    as the pagination cursor.  Deleted events leave a tombstone in the
+    sequence list which is compacted once half the entries are dead.
+    With a codec each event body is stored compressed and decompressed
+    when it is read.
+    """
+
+    def __init__(self, codec=None):
+        self.codec = codec
+        self.events = {}
+        self.seqs = []
+        self.ids = []
+        self.seq = 0
+        self.dead = 0
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self.events)
+
+    def nbytes(self):
+        """return the size of the buffered bodies and headers"""
+        return self.bytes
+
+    def append(self, event):
+        if self.codec is not None:
+            event = event.compressed(self.codec)
+        self.bytes += event.nbytes()
+        self.seq += 1
+        self.events[event.id] = event
+        self.seqs.append(self.seq)
+        self.ids.append(event.id)
+
+    def get(self, event_id):
+        return self.events.get(event_id)
+
+    def pop(self, event_id):
+        event = self.events.pop(event_id, None)
+        if event is not None:
+            self.bytes -= event.nbytes()
+            self.dead += 1
+            if self.dead > len(self.events):
+                self.compact()
+        return event
+
+    def delete_many(self, event_ids):
+        """delete events by id; return the ids that were deleted"""
+        return [i for i in dict.fromkeys(event_ids) if self.pop(i) is not None]
+
+    def compact(self):
+        live = [
+            (seq, event_id)
+            for seq, event_id in zip(self.seqs, self.ids)
+            if event_id in self.events
+        ]
+        self.seqs = [seq for seq, _ in live]
+        self.ids = [event_id for _, event_id in live]
+        self.dead = 0
+
+    def clear(self):
+        self.events.clear()
+        self.seqs.clear()
+        self.ids.clear()
+        self.dead = 0
+        self.bytes = 0
+
+    def values(self):
+        return list(self.events.values())
+
+    def page(self, after=None, limit=None, filters=None):
+        """return (events, cursor) for up to limit events following cursor
+
+        cursor is None when no further events remain
+        """
+        if after is None and limit is None and not filters:
+            return self.values(), None
+        index = 0 if after is None else bisect_right(self.seqs, after)
+        ret = []
+        cursor = None
+        for index in range(index, len(self.ids)):
+            event = self.events.get(self.ids[index])
+            if event is None:
+                continue
+            if filters and not match(event.fields, filters):
+                continue
+            if limit is not None and len(ret) == limit:
+                break
+            ret.append(event)
+            cursor = self.seqs[index]
+        else:
+            cursor = None
+        return ret, cursor
@@ -0,0 +1,135 @@
+# keccak-256 hashing backends
+
+import importlib
+import logging
+import time
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+info = logger.info
+warning = logger.warning
+
+AUTO = "auto"
+
+# backend names in the order auto tries them
+BACKENDS = ("pycryptodome", "pysha3", "eth_hash")
+
+# keccak-256 of the empty string; rejects sha3-256 and other lookalikes
+EMPTY_DIGEST = bytes.fromhex(
+    "c5d2460186f7233c927e7db2dcc703c0e500b653ca82273b7bfad8045d85a470"
+)
+
+# compiled backends hash hundreds of MB/s, pure python ones well under 1
+SLOW_BYTES_PER_SECOND = 20_000_000
+BENCHMARK_SIZE = 64 * 1024
+BENCHMARK_TIME = 0.05
+
+
+def _pycryptodome():
+    from Crypto.Hash import keccak
+
+    def new(data=b""):
+        return keccak.new(data=data, digest_bits=256)
+
+    return new
+
+
+def _pysha3():
+    import sha3
+
+    return sha3.keccak_256
+
+
+def _eth_hash():
+    from eth_hash.auto import keccak
+
+    return keccak.new
+
+
+LOADERS = dict(pycryptodome=_pycryptodome, pysha3=_pysha3, eth_hash=_eth_hash)
+
+
+def _import(path):
+    module, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+class KeccakBackend:
+    """a hashlib style keccak-256 constructor
+
+    new(data) returns a hash object with update() and digest() methods.
+    """
+
+    def __init__(self, name, new):
+        self.name = name
+        self.new = new
+        if self.digest(b"") != EMPTY_DIGEST:
+            raise ValueError(f"keccak backend {name} is not keccak-256")
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name})"
+
+    def digest(self, data):
+        return self.new(data).digest()
+
+
+@lru_cache(maxsize=None)
+def load_backend(name=AUTO):
+    """return the named KeccakBackend
+
+    name is one of BACKENDS, 'auto' for the first of them that is
+    installed, or 'module:attribute' naming a hashlib compatible
+    keccak-256 constructor.
+    """
+    if name == AUTO:
+        for backend in BACKENDS:
+            try:
+                return load_backend(backend)
+            except ImportError:
+                continue
+        raise ImportError(f"no keccak backend installed; tried {BACKENDS}")
+    if ":" in name:
+        return KeccakBackend(name, _import(name))
+    if name not in LOADERS:
+        raise ValueError(
+            f"unknown keccak backend {name}; expected one of "
+            f"{[AUTO, *BACKENDS]} or module:attribute"
+        )
+    return KeccakBackend(name, LOADERS[name]())
+
+
+def available():
+    """return the installed backends"""
+    backends = []
+    for name in BACKENDS:
+        try:
+            backends.append(load_backend(name))
+        except ImportError:
+            continue
+    return backends
+
+
+def benchmark(backend, size=BENCHMARK_SIZE, duration=BENCHMARK_TIME):
+    """return the backend hash rate in bytes per second"""
+    data = bytes(size)
+    backend.digest(data)
+    count = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < duration:
+        backend.digest(data)
+        count += 1
+    return count * size / elapsed
+
+
+def check_backend(backend):
+    """benchmark the backend; warn if it is too slow for the ingest path"""
+    rate = benchmark(backend)
+    if rate < SLOW_BYTES_PER_SECOND:
+        warning(
+            f"keccak backend {backend.name} hashes {rate / 1e6:.1f} MB/s; "
+            "request signature checks will be slow; install pycryptodome "
+            "or set WEBHOOK_KECCAK_BACKEND"
+        )
+    else:
+        info(f"keccak backend {backend.name} {rate / 1e6:.1f} MB/s")
+    return rate
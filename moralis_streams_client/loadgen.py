@@ -0,0 +1,218 @@
+# signed synthetic load for a webhook server
+
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+
+import httpx
+
+from .signature import Signature
+
+PERCENTILES = (50, 90, 99)
+
+
+def _hex(rng, size):
+    return "0x" + rng.randbytes(size).hex()
+
+
+def _quantity(value):
+    return str(value)
+
+
+def synthetic_payload(
+    number,
+    logs=10,
+    txs=10,
+    internal_txs=0,
+    chain_id="0x1",
+    stream_id="loadgen",
+    tag="loadgen",
+    confirmed=False,
+    seed=None,
+):
+    """return a moralis streams webhook body for block number
+
+    Hashes, addresses and data are random bytes; seed makes the payload
+    reproducible.  Each log and internal transaction refers to one of the
+    generated transactions.
+    """
+    rng = random.Random(number if seed is None else seed)
+    tx_hashes = [_hex(rng, 32) for _ in range(max(txs, 1))]
+    return dict(
+        confirmed=confirmed,
+        chainId=chain_id,
+        abi=[],
+        streamId=stream_id,
+        tag=tag,
+        retries=0,
+        block=dict(
+            number=_quantity(number),
+            hash=_hex(rng, 32),
+            timestamp=_quantity(1_700_000_000 + number * 12),
+        ),
+        logs=[
+            dict(
+                logIndex=_quantity(index),
+                transactionHash=rng.choice(tx_hashes),
+                address=_hex(rng, 20),
+                data=_hex(rng, 64),
+                topic0=_hex(rng, 32),
+                topic1=_hex(rng, 32),
+                topic2=_hex(rng, 32),
+                topic3=None,
+            )
+            for index in range(logs)
+        ],
+        txs=[
+            dict(
+                hash=tx_hash,
+                gas=_quantity(rng.randrange(21_000, 1_000_000)),
+                gasPrice=_quantity(rng.randrange(10**9, 10**11)),
+                nonce=_quantity(rng.randrange(10_000)),
+                input=_hex(rng, 68),
+                transactionIndex=_quantity(index),
+                fromAddress=_hex(rng, 20),
+                toAddress=_hex(rng, 20),
+                value=_quantity(rng.randrange(10**18)),
+                type="2",
+                v="0",
+                r=_quantity(rng.getrandbits(256)),
+                s=_quantity(rng.getrandbits(256)),
+                receiptCumulativeGasUsed=_quantity(rng.randrange(10**7)),
+                receiptGasUsed=_quantity(rng.randrange(21_000, 1_000_000)),
+                receiptContractAddress=None,
+                receiptRoot=None,
+                receiptStatus="1",
+            )
+            for index, tx_hash in enumerate(tx_hashes[:txs])
+        ],
+        txsInternal=[
+            dict(
+                **{"from": _hex(rng, 20), "to": _hex(rng, 20)},
+                value=_quantity(rng.randrange(10**18)),
+                transactionHash=rng.choice(tx_hashes),
+                gas=_quantity(rng.randrange(2_300, 100_000)),
+            )
+            for _ in range(internal_txs)
+        ],
+    )
+
+
+def percentile(values, pct):
+    """nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * pct // 100))
+    return values[rank - 1]
+
+
+class LoadGenerator:
+    """send signed webhook bodies to a url and measure the responses
+
+    Requests are sent by concurrency workers over a pooled client.  With
+    a rate, request n is scheduled at n / rate seconds after the start and
+    its latency is measured from that time, so a server that falls behind
+    the schedule shows as latency instead of a lower request rate.
+    Without a rate each worker sends as fast as responses return.
+    """
+
+    def __init__(
+        self,
+        url,
+        bodies,
+        *,
+        signature=None,
+        requests=1000,
+        concurrency=32,
+        rate=None,
+        timeout=30,
+    ):
+        if not bodies:
+            raise ValueError("no request bodies")
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.url = url
+        self.signature = signature or Signature()
+        self.requests = requests
+        self.concurrency = concurrency
+        self.rate = rate
+        self.timeout = timeout
+        self.messages = []
+        for body in bodies:
+            if not isinstance(body, bytes):
+                body = json.dumps(body, separators=(",", ":")).encode()
+            headers = self.signature.headers(body)
+            headers["Content-Type"] = "application/json"
+            self.messages.append((body, headers))
+
+    async def run(self):
+        """send the requests; return a report dict"""
+        latencies = []
+        statuses = Counter()
+        errors = Counter()
+        sent_bytes = 0
+        indexes = iter(range(self.requests))
+        limits = httpx.Limits(
+            max_connections=self.concurrency,
+            max_keepalive_connections=self.concurrency,
+        )
+        async with httpx.AsyncClient(
+            limits=limits, timeout=self.timeout
+        ) as client:
+            start = time.perf_counter()
+
+            async def worker():
+                nonlocal sent_bytes
+                for index in indexes:
+                    if self.rate:
+                        begin = start + index / self.rate
+                        delay = begin - time.perf_counter()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    else:
+                        begin = time.perf_counter()
+                    body, headers = self.messages[index % len(self.messages)]
+                    try:
+                        response = await client.post(
+                            self.url, content=body, headers=headers
+                        )
+                    except httpx.HTTPError as exc:
+                        errors[type(exc).__name__] += 1
+                    else:
+                        statuses[response.status_code] += 1
+                        sent_bytes += len(body)
+                    latencies.append(time.perf_counter() - begin)
+
+            await asyncio.gather(*[worker() for _ in range(self.concurrency)])
+            elapsed = time.perf_counter() - start
+        return self.report(elapsed, latencies, statuses, errors, sent_bytes)
+
+    def report(self, elapsed, latencies, statuses, errors, sent_bytes):
+        latencies.sort()
+        ok = sum(n for status, n in statuses.items() if 200 <= status < 300)
+        latency = {
+            f"p{pct}": percentile(latencies, pct) for pct in PERCENTILES
+        }
+        latency["max"] = latencies[-1] if latencies else None
+        latency["mean"] = (
+            sum(latencies) / len(latencies) if latencies else None
+        )
+        return dict(
+            url=self.url,
+            requests=len(latencies),
+            concurrency=self.concurrency,
+            rate=self.rate,
+            elapsed=elapsed,
+            ok=ok,
+            failed=len(latencies) - ok,
+            requests_per_second=len(latencies) / elapsed,
+            bytes_per_second=sent_bytes / elapsed,
+            latency_ms={
+                key: None if value is None else round(value * 1000, 3)
+                for key, value in latency.items()
+            },
+            status={str(status): n for status, n in sorted(statuses.items())},
+            errors=dict(errors),
+        )
@@ -0,0 +1,188 @@
+# prometheus metrics
+
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value):
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def header(self):
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+
+
+class Counter(Metric):
+    """monotonic counter; labels are passed positionally to inc()"""
+
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, _labels(self.labelnames, labels), value
+
+    def render(self):
+        lines = self.header()
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{labels} {_number(value)}")
+        return lines
+
+
+class Histogram(Metric):
+    """bucketed observations; labels are passed positionally to observe()"""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, value, *labels):
+        series = self.values.get(labels)
+        if series is None:
+            # per-bucket counts, then sum and count
+            series = self.values[labels] = [0] * (len(self.buckets) + 1)
+            series.extend((0.0, 0))
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        lines = self.header()
+        bounds = self.buckets + (float("inf"),)
+        for labels, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            suffix = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {series[-2]}")
+            lines.append(f"{self.name}_count{suffix} {series[-1]}")
+        return lines
+
+
+class Callback(Metric):
+    """metric read at collection time
+
+    collect returns a number, or a dict of label value tuples to numbers
+    """
+
+    def __init__(self, name, help, type, collect, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self.collect = collect
+
+    def render(self):
+        lines = self.header()
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in values.items():
+            labels = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}{labels} {_number(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return ("\n".join(lines) + "\n").encode()
+
+
+REGISTRY = Registry()
+
+EVENTS_ACCEPTED = REGISTRY.register(
+    Counter("webhook_events_accepted_total", "Events accepted for ingest")
+)
+REQUESTS_REJECTED = REGISTRY.register(
+    Counter(
+        "webhook_requests_rejected_total",
+        "Requests rejected before reaching a handler or by the ingest handler",
+        ["reason"],
+    )
+)
+INGEST_SECONDS = REGISTRY.register(
+    Histogram("webhook_ingest_seconds", "Event ingest handler latency")
+)
+RELAY_SECONDS = REGISTRY.register(
+    Histogram("webhook_relay_seconds", "Relay request latency", ["target"])
+)
+RELAY_RESPONSES = REGISTRY.register(
+    Counter(
+        "webhook_relay_responses_total",
+        "Relay responses by target and status code",
+        ["target", "status"],
+    )
+)
+SUBSCRIBERS_DROPPED = REGISTRY.register(
+    Counter(
+        "webhook_subscribers_dropped_total",
+        "Live subscribers disconnected because their queue was full",
+    )
+)
@@ -0,0 +1,154 @@
+# compact moralis webhook payload records
+
+import orjson
+
+from .event_store import _int
+
+
+class Record:
+    """slotted record decoded from a payload object
+
+    FIELDS lists (attribute, key, convert) for each slot; numeric fields
+    are converted to int once when the record is decoded and missing keys
+    decode as None.
+    """
+
+    __slots__ = ()
+    FIELDS = ()
+
+    @classmethod
+    def decode(cls, obj):
+        record = cls.__new__(cls)
+        get = obj.get
+        for attr, key, convert in cls.FIELDS:
+            value = get(key)
+            if convert is not None and value is not None:
+                value = convert(value)
+            setattr(record, attr, value)
+        return record
+
+    def dict(self):
+        return {attr: getattr(self, attr) for attr in self.__slots__}
+
+    def __eq__(self, other):
+        return type(other) is type(self) and self.dict() == other.dict()
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in self.dict().items())
+        return f"{type(self).__name__}({fields})"
+
+
+class Block(Record):
+    FIELDS = (
+        ("number", "number", _int),
+        ("hash", "hash", None),
+        ("timestamp", "timestamp", _int),
+    )
+    __slots__ = tuple(field[0] for field in FIELDS)
+
+
+class Log(Record):
+    FIELDS = (
+        ("log_index", "logIndex", _int),
+        ("transaction_hash", "transactionHash", None),
+        ("address", "address", None),
+        ("data", "data", None),
+    )
+    # event and args are set when the log is decoded with an AbiDecoder
+    __slots__ = tuple(field[0] for field in FIELDS) + (
+        "topics",
+        "event",
+        "args",
+    )
+
+    @classmethod
+    def decode(cls, obj):
+        # logs dominate large payloads, so this is written out in full
+        record = cls.__new__(cls)
+        get = obj.get
+        record.log_index = _int(get("logIndex"))
+        record.transaction_hash = get("transactionHash")
+        record.address = get("address")
+        record.data = get("data")
+        topics = (get("topic0"), get("topic1"), get("topic2"), get("topic3"))
+        if None in topics:
+            topics = tuple(topic for topic in topics if topic is not None)
+        record.topics = topics
+        record.event = None
+        record.args = None
+        return record
+
+
+class Transaction(Record):
+    FIELDS = (
+        ("hash", "hash", None),
+        ("gas", "gas", _int),
+        ("gas_price", "gasPrice", _int),
+        ("nonce", "nonce", _int),
+        ("input", "input", None),
+        ("transaction_index", "transactionIndex", _int),
+        ("from_address", "fromAddress", None),
+        ("to_address", "toAddress", None),
+        ("value", "value", _int),
+        ("type", "type", _int),
+        ("v", "v", _int),
+        ("r", "r", None),
+        ("s", "s", None),
+        ("receipt_cumulative_gas_used", "receiptCumulativeGasUsed", _int),
+        ("receipt_gas_used", "receiptGasUsed", _int),
+        ("receipt_contract_address", "receiptContractAddress", None),
+        ("receipt_root", "receiptRoot", None),
+        ("receipt_status", "receiptStatus", _int),
+    )
+    __slots__ = tuple(field[0] for field in FIELDS)
+
+
+class InternalTransaction(Record):
+    FIELDS = (
+        ("from_address", "from", None),
+        ("to_address", "to", None),
+        ("value", "value", _int),
+        ("transaction_hash", "transactionHash", None),
+        ("gas", "gas", _int),
+    )
+    __slots__ = tuple(field[0] for field in FIELDS)
+
+
+class Payload(Record):
+    """a decoded moralis streams webhook body
+
+    logs, txs and txs_internal are tuples of slotted records; abi is kept
+    as received.
+    """
+
+    FIELDS = (
+        ("stream_id", "streamId", None),
+        ("tag", "tag", None),
+        ("chain_id", "chainId", _int),
+        ("confirmed", "confirmed", bool),
+        ("retries", "retries", _int),
+        ("block", "block", Block.decode),
+        ("abi", "abi", None),
+    )
+    __slots__ = tuple(field[0] for field in FIELDS) + (
+        "logs",
+        "txs",
+        "txs_internal",
+    )
+
+    @classmethod
+    def decode(cls, obj):
+        record = super().decode(obj)
+        record.logs = tuple(map(Log.decode, obj.get("logs") or ()))
+        record.txs = tuple(map(Transaction.decode, obj.get("txs") or ()))
+        record.txs_internal = tuple(
+            map(InternalTransaction.decode, obj.get("txsInternal") or ())
+        )
+        return record
+
+
+def decode(body):
+    """return a Payload from a webhook body as bytes, str or parsed dict"""
+    if isinstance(body, (bytes, bytearray, memoryview, str)):
+        body = orjson.loads(body)
+    return Payload.decode(body)
@@ -0,0 +1,78 @@
+# per-port server pid files
+
+import fcntl
+import os
+import time
+from pathlib import Path
+
+from . import settings
+
+ACQUIRE_TIMEOUT = 0.5
+
+
+def pidfile_path(port):
+    return Path(settings.RUN_DIR) / f"webhook-{port}.pid"
+
+
+class PidFile:
+    """pid file locked by a server for as long as it runs
+
+    The exclusive flock is released by the kernel when the process exits,
+    however it exits, so a pid file that is not locked is stale.  The
+    file is never removed; a new server reuses it.
+    """
+
+    def __init__(self, port):
+        self.path = pidfile_path(port)
+        self.fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *_):
+        self.release()
+
+    def acquire(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        # readers hold a shared lock for a moment; retry past them
+        timeout = time.monotonic() + ACQUIRE_TIMEOUT
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() > timeout:
+                    os.close(fd)
+                    raise RuntimeError(
+                        f"{self.path}: a server is already running"
+                    )
+                time.sleep(0.01)
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self.fd = fd
+
+    def release(self):
+        if self.fd is not None:
+            os.ftruncate(self.fd, 0)
+            os.close(self.fd)
+            self.fd = None
+
+
+def running_pid(port):
+    """return the pid of the server registered for port, or None"""
+    try:
+        fd = os.open(pidfile_path(port), os.O_RDONLY)
+    except FileNotFoundError:
+        return None
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            pid = os.read(fd, 32).strip()
+            # the lock is taken just before the pid is written
+            return int(pid) if pid else None
+        return None
+    finally:
+        os.close(fd)
@@ -0,0 +1,262 @@
+# rule-based event routing
+
+import asyncio
+import itertools
+import json
+import logging
+import time
+
+import httpx
+
+from . import settings
+from .event_store import _int, body_topics
+from .metrics import RELAY_RESPONSES, RELAY_SECONDS
+
+logger = logging.getLogger(__name__)
+debug = logger.debug
+warning = logger.warning
+logger.setLevel(settings.LOG_LEVEL)
+
+# retired route pools being closed
+_closing = set()
+
+# route match keys and the event field each is compared with
+MATCH_KEYS = dict(
+    streamId="stream_id", tag="tag", chainId="chain_id", topic0="topic0"
+)
+
+
+def _normalize(field, value):
+    if field == "chain_id":
+        number = _int(value)
+        if number is None:
+            raise ValueError(f"invalid chainId: {value}")
+        return number
+    if field == "topic0":
+        return str(value).lower()
+    return str(value)
+
+
+def load_routes(path):
+    """return the route definitions in a JSON file"""
+    with open(path) as ifp:
+        routes = json.load(ifp)
+    if not isinstance(routes, list):
+        raise ValueError(f"{path}: expected a list of routes")
+    return routes
+
+
+def event_topics(event):
+    """return the distinct topic0 values of an event's logs
+
+    The values are extracted into the event fields at ingest; the body
+    is only decoded for records built without them.
+    """
+    fields = event.fields or {}
+    topics = fields.get("topics")
+    if topics is None:
+        topics = body_topics(event.body)
+    return topics
+
+
+class Route:
+    """a relay target for events matching all of its match values
+
+    Each match value may be a single value or a list of alternatives; an
+    empty match selects every event.  A route keeps its own connection
+    pool and delivery counters.
+    """
+
+    def __init__(
+        self,
+        name,
+        url,
+        header=None,
+        key=None,
+        match=None,
+        max_connections=None,
+    ):
+        self.name = name
+        self.url = url
+        self.header = header
+        self.key = key
+        self.match = dict(match or {})
+        self.max_connections = max_connections
+        for match_key in self.match:
+            if match_key not in MATCH_KEYS:
+                raise ValueError(
+                    f"route {name}: unknown match key {match_key}; "
+                    f"expected one of {list(MATCH_KEYS)}"
+                )
+        self.client = None
+        self.pending = 0
+        self.retired = False
+        self.requests = 0
+        self.failures = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.last_status = None
+
+    @classmethod
+    def from_dict(cls, obj):
+        try:
+            return cls(**obj)
+        except TypeError as exc:
+            raise ValueError(f"invalid route {obj}: {exc}") from exc
+
+    def dict(self):
+        return dict(
+            name=self.name,
+            url=self.url,
+            header=self.header,
+            key=self.key,
+            match=self.match,
+            max_connections=self.max_connections,
+        )
+
+    def conditions(self):
+        """yield each combination of match values as {field: value}"""
+        fields = []
+        alternatives = []
+        for match_key, values in self.match.items():
+            field = MATCH_KEYS[match_key]
+            if not isinstance(values, list):
+                values = [values]
+            fields.append(field)
+            alternatives.append([_normalize(field, v) for v in values])
+        for combination in itertools.product(*alternatives):
+            yield dict(zip(fields, combination))
+
+    def metrics(self):
+        return dict(
+            requests=self.requests,
+            failures=self.failures,
+            bytes=self.bytes,
+            seconds=self.seconds,
+            last_status=self.last_status,
+        )
+
+    async def send(self, event, id_header):
+        """post the event body; return the relay result"""
+        self.pending += 1
+        try:
+            return await self._post(event, id_header)
+        finally:
+            self.pending -= 1
+            if self.retired and not self.pending:
+                await self.aclose()
+
+    def retire(self):
+        """close the connection pool once in-flight sends complete"""
+        self.retired = True
+        if not self.pending and self.client is not None:
+            task = asyncio.get_running_loop().create_task(self.aclose())
+            _closing.add(task)
+            task.add_done_callback(_closing.discard)
+
+    async def _post(self, event, id_header):
+        if self.client is None:
+            limits = httpx.Limits(
+                max_connections=self.max_connections
+                or settings.ROUTE_MAX_CONNECTIONS
+            )
+            self.client = httpx.AsyncClient(limits=limits)
+        headers = event.headers
+        if self.header and self.key:
+            headers[self.header] = self.key
+        headers[id_header] = str(event.id)
+        self.requests += 1
+        start = time.perf_counter()
+        try:
+            response = await self.client.post(
+                self.url, headers=headers, content=event.raw
+            )
+        except Exception as exc:
+            # any failure is this route's result; raising would fail the
+            # delivery after the other routes were posted, and the
+            # sender's retry would duplicate them
+            self.failures += 1
+            RELAY_RESPONSES.inc(self.name, "error")
+            warning(f"route {self.name}: {self.url}: {exc!r}")
+            return dict(url=self.url, error=repr(exc))
+        finally:
+            elapsed = time.perf_counter() - start
+            self.seconds += elapsed
+            RELAY_SECONDS.observe(elapsed, self.name)
+        self.bytes += len(event.raw)
+        self.last_status = response.status_code
+        RELAY_RESPONSES.inc(self.name, str(response.status_code))
+        if response.is_error:
+            self.failures += 1
+        return dict(
+            url=str(response.url),
+            status_code=response.status_code,
+            text=response.text,
+            headers=dict(response.headers),
+        )
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+
+class RoutingTable:
+    """routes compiled into a dispatch index
+
+    Rules are grouped by the set of fields they match on; each group is a
+    dict keyed by the field values.  Matching an event costs one lookup
+    per group (at most one per distinct topic0 for groups matching on
+    topic0) regardless of the number of rules.
+    """
+
+    def __init__(self, routes=()):
+        self.routes = [
+            r if isinstance(r, Route) else Route.from_dict(r) for r in routes
+        ]
+        names = [route.name for route in self.routes]
+        if len(set(names)) != len(names):
+            raise ValueError("route names must be unique")
+        self.index = {}
+        for position, route in enumerate(self.routes):
+            for condition in route.conditions():
+                shape = tuple(sorted(condition))
+                values = tuple(condition[field] for field in shape)
+                group = self.index.setdefault(shape, {})
+                group.setdefault(values, []).append(position)
+        self.topic_shapes = [s for s in self.index if "topic0" in s]
+        debug(f"compiled {len(self.routes)} routes, {len(self.index)} groups")
+
+    def __len__(self):
+        return len(self.routes)
+
+    def match(self, event):
+        """return the routes selected by an event, in table order"""
+        if not self.routes:
+            return []
+        fields = event.fields or {}
+        topics = event_topics(event) if self.topic_shapes else ()
+        selected = set()
+        for shape, group in self.index.items():
+            if "topic0" in shape:
+                for topic in topics:
+                    values = tuple(
+                        topic if field == "topic0" else fields.get(field)
+                        for field in shape
+                    )
+                    selected.update(group.get(values, ()))
+            else:
+                values = tuple(fields.get(field) for field in shape)
+                selected.update(group.get(values, ()))
+        return [self.routes[position] for position in sorted(selected)]
+
+    async def dispatch(self, event, routes, id_header):
+        """send an event to routes concurrently; return {name: result}"""
+        results = await asyncio.gather(
+            *[route.send(event, id_header) for route in routes]
+        )
+        return {route.name: result for route, result in zip(routes, results)}
+
+    async def aclose(self):
+        for route in self.routes:
+            await route.aclose()
@@ -1,16 +1,62 @@
 #!/usr/bin/env python3
 
 import logging
+import os
+import socket
 import sys
+from importlib.util import find_spec
+from pathlib import Path
 
 import click
 import uvicorn
 
 from moralis_streams_client import settings
 from moralis_streams_client.app import app
+from moralis_streams_client.dedupe import OFF
+from moralis_streams_client.event_queue import default_config
 from moralis_streams_client.logconfig import configure_logging
+from moralis_streams_client.pidfile import PidFile
+from moralis_streams_client.sqlite_store import SQLiteEventStore
 from moralis_streams_client.tunnel import NgrokTunnel
 
+LOOP_CHOICES = ["auto", "asyncio", "uvloop"]
+HTTP_CHOICES = ["auto", "h11", "httptools"]
+
+
+def resolve(choice, fast, fallback):
+    """return the implementation uvicorn selects for an auto choice"""
+    if choice == "auto":
+        return fast if find_spec(fast) else fallback
+    return choice
+
+
+def bind_unix_socket(path):
+    """return a listening unix socket bound to path
+
+    A socket file left by a server that is no longer accepting
+    connections is replaced.  The socket is only accessible to the owner.
+    """
+    path = Path(path)
+    if path.is_socket():
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(path))
+        except ConnectionRefusedError:
+            path.unlink()
+        else:
+            raise RuntimeError(f"{path}: socket is in use")
+        finally:
+            probe.close()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # create the socket file owner-only; a chmod after bind leaves a window
+    umask = os.umask(0o077)
+    try:
+        sock.bind(str(path))
+    finally:
+        os.umask(umask)
+    os.chmod(path, 0o600)
+    return sock
+
 
 class ServerProcess:
     def __init__(self, **kwargs):
@@ -18,6 +64,20 @@ class ServerProcess:
         self.debug = kwargs.get("debug", settings.DEBUG)
         self.addr = kwargs.get("addr", settings.ADDR)
         self.port = kwargs.get("port", settings.PORT)
+        self.workers = kwargs.get("workers") or settings.WORKERS
+        self.loop = kwargs.get("loop") or settings.LOOP
+        self.http = kwargs.get("http") or settings.HTTP
+        self.backlog = kwargs.get("backlog") or settings.BACKLOG
+        self.limit_concurrency = (
+            kwargs.get("limit_concurrency") or settings.LIMIT_CONCURRENCY
+        )
+        timeout_keep_alive = kwargs.get("timeout_keep_alive")
+        self.timeout_keep_alive = (
+            settings.TIMEOUT_KEEP_ALIVE
+            if timeout_keep_alive is None
+            else timeout_keep_alive
+        )
+        self.uds = kwargs.get("uds") or settings.UDS
         self.tunnel = kwargs.get("tunnel", settings.TUNNEL)
         self.log_level = kwargs.get("log_level", settings.LOG_LEVEL)
 
@@ -33,31 +93,93 @@ class ServerProcess:
         self.logger.setLevel(settings.LOG_LEVEL)
         self.info = self.logger.info
 
+    def share(self):
+        """prepare the environment and shared store for worker processes
+
+        Each worker imports the app, so settings are passed in the
+        environment.  All workers buffer events in the sqlite store, which
+        also holds the relay and buffer configuration they share.  The
+        event log and deduplication keep per process state and are
+        refused.
+        """
+        if settings.EVENT_LOG:
+            raise ValueError("the event log is not supported with workers")
+        # the dedupe index is per process; a retry reaching another worker
+        # would not be recognized
+        if settings.DEDUPE != OFF:
+            raise ValueError("deduplication is not supported with workers")
+        if settings.BUFFER_BACKEND != "sqlite":
+            self.logger.warning(
+                f"{self.workers} workers: using sqlite buffer backend "
+                f"{settings.BUFFER_DB}"
+            )
+        os.environ["WEBHOOK_WORKERS"] = str(self.workers)
+        os.environ["WEBHOOK_BUFFER_BACKEND"] = "sqlite"
+        os.environ["WEBHOOK_BUFFER_DB"] = str(settings.BUFFER_DB)
+        store = SQLiteEventStore(settings.BUFFER_DB)
+        store.save_config(**default_config())
+        store.close()
+
     def run(self):
         def fileConfig(*args, **kwargs):
             self.info("uvicorn logging config disabled")
 
         uvicorn.config.logging.config.fileConfig = fileConfig
 
+        # spawned workers do not inherit the fileConfig patch
+        log_config = "disable" if self.workers == 1 else None
+
+        options = dict(
+            host=self.addr,
+            port=self.port,
+            log_level=self.log_level.lower(),
+            log_config=log_config,
+            workers=self.workers,
+            loop=self.loop,
+            http=self.http,
+            backlog=self.backlog,
+            limit_concurrency=self.limit_concurrency,
+            timeout_keep_alive=self.timeout_keep_alive,
+        )
+
         def _uvicorn_run():
-            return uvicorn.run(
-                "moralis_streams_client.app:app",
-                host=self.addr,
-                port=self.port,
-                log_level=self.log_level.lower(),
-                log_config="disable",
+            if self.uds is None:
+                return uvicorn.run("moralis_streams_client.app:app", **options)
+            # uvicorn.run binds one socket; serve the TCP port and the
+            # unix socket from the same server
+            config = uvicorn.Config(
+                "moralis_streams_client.app:app", **options
             )
+            sockets = [config.bind_socket(), bind_unix_socket(self.uds)]
+            self.info(f"listening on unix socket {self.uds}")
+            return uvicorn.Server(config).run(sockets=sockets)
+
+        self.info(
+            f"loop={resolve(self.loop, 'uvloop', 'asyncio')} "
+            f"http={resolve(self.http, 'httptools', 'h11')} "
+            f"backlog={self.backlog} "
+            f"limit_concurrency={self.limit_concurrency} "
+            f"timeout_keep_alive={self.timeout_keep_alive}"
+        )
+
+        if self.workers > 1:
+            if self.uds:
+                raise ValueError("a unix socket is not supported with workers")
+            self.share()
 
-        if self.tunnel:
-            self.info("starting ngrok tunnel...")
-            with NgrokTunnel(
-                self.port, str(settings.NGROK_AUTHTOKEN)
-            ) as tunnel:
-                app.state.tunnel_url = tunnel.public_url
+        # registers the server for Webhook.server_running()
+        with PidFile(self.port):
+            if self.tunnel:
+                self.info("starting ngrok tunnel...")
+                with NgrokTunnel(
+                    self.port, str(settings.NGROK_AUTHTOKEN)
+                ) as tunnel:
+                    app.state.tunnel_url = tunnel.public_url
+                    os.environ["WEBHOOK_TUNNEL_URL"] = tunnel.public_url
+                    return _uvicorn_run()
+            else:
+                self.info("ngrok tunnel disabled")
                 return _uvicorn_run()
-        else:
-            self.info("ngrok tunnel disabled")
-            return _uvicorn_run()
 
 
 @click.command
@@ -68,5 +190,45 @@ class ServerProcess:
     required=True,
     help="server listen port",
 )
-def server(port):
-    sys.exit(ServerProcess(port=port).run())
+@click.option(
+    "-w",
+    "--workers",
+    type=int,
+    help="number of server worker processes",
+)
+@click.option(
+    "--loop",
+    type=click.Choice(LOOP_CHOICES),
+    help="event loop implementation",
+)
+@click.option(
+    "--http",
+    type=click.Choice(HTTP_CHOICES),
+    help="HTTP protocol implementation",
+)
+@click.option(
+    "--backlog",
+    type=int,
+    help="maximum number of pending connections",
+)
+@click.option(
+    "--limit-concurrency",
+    type=int,
+    help="maximum concurrent connections before returning 503",
+)
+@click.option(
+    "--uds",
+    type=click.Path(dir_okay=False),
+    help="also listen on a unix domain socket",
+)
+@click.option(
+    "--timeout-keep-alive",
+    type=int,
+    help="seconds to hold idle keep-alive connections open",
+)
+def server(port, workers, **kwargs):
+    sys.exit(ServerProcess(port=port, workers=workers, **kwargs).run())
+
+
+if __name__ == "__main__":
+    server()
@@ -1,7 +1,9 @@
+import os
+import tempfile
 from pathlib import Path
 
 from starlette.config import Config
-from starlette.datastructures import Secret
+from starlette.datastructures import CommaSeparatedStrings, Secret
 
 from . import defaults
 
@@ -12,6 +14,25 @@ DEBUG = config("WEBHOOK_DEBUG", cast=bool, default=False)
 
 ADDR = config("WEBHOOK_ADDR", cast=str, default="0.0.0.0")
 PORT = config("WEBHOOK_PORT", cast=int, default=8080)
+WORKERS = config("WEBHOOK_WORKERS", cast=int, default=1)
+TUNNEL_URL = config("WEBHOOK_TUNNEL_URL", cast=str, default=None)
+# unix domain socket served alongside the TCP port for local clients
+UDS = config("WEBHOOK_UDS", cast=str, default=None)
+# directory holding the per-port server pid files
+RUN_DIR = config(
+    "WEBHOOK_RUN_DIR",
+    cast=str,
+    default=str(
+        Path(tempfile.gettempdir()) / f"moralis-streams-client-{os.getuid()}"
+    ),
+)
+
+# uvicorn server options; auto selects uvloop and httptools when installed
+LOOP = config("WEBHOOK_LOOP", default="auto")
+HTTP = config("WEBHOOK_HTTP", default="auto")
+BACKLOG = config("WEBHOOK_BACKLOG", cast=int, default=2048)
+LIMIT_CONCURRENCY = config("WEBHOOK_LIMIT_CONCURRENCY", cast=int, default=None)
+TIMEOUT_KEEP_ALIVE = config("WEBHOOK_TIMEOUT_KEEP_ALIVE", cast=int, default=5)
 
 LOG_FILE = config("WEBHOOK_LOG_FILE", cast=str, default=None)
 LOG_FILE_MODE = config("WEBHOOK_LOG_FILE_MODE", cast=str, default="a")
@@ -25,21 +46,87 @@ ACCESS_LOG_FORMAT = config(
 )
 
 BUFFER_ENABLE = config("WEBHOOK_BUFFER_ENABLE", cast=bool, default=True)
+BUFFER_BACKEND = config("WEBHOOK_BUFFER_BACKEND", default="memory")
+BUFFER_DB = config("WEBHOOK_BUFFER_DB", cast=str, default="webhook.db")
+BUFFER_BATCH_SIZE = config("WEBHOOK_BUFFER_BATCH_SIZE", cast=int, default=100)
+# memory buffer body compression: none, zlib or zstd (needs zstandard)
+BUFFER_COMPRESSION = config("WEBHOOK_BUFFER_COMPRESSION", default="none")
+BUFFER_COMPRESSION_LEVEL = config(
+    "WEBHOOK_BUFFER_COMPRESSION_LEVEL", cast=int, default=None
+)
+BUFFER_COMPRESSION_DICT = config(
+    "WEBHOOK_BUFFER_COMPRESSION_DICT", cast=str, default=None
+)
 
 RELAY_URL = config("WEBHOOK_RELAY_URL", cast=str, default=None)
 RELAY_HEADER = config("WEBHOOK_RELAY_HEADER", default="X-API-Key")
 RELAY_ID_HEADER = config("WEBHOOK_RELAY_ID_HEADER", default="X-Relay-ID")
 RELAY_KEY = config("WEBHOOK_RELAY_KEY", cast=Secret)
+ROUTES_FILE = config("WEBHOOK_ROUTES_FILE", cast=str, default=None)
+ROUTE_MAX_CONNECTIONS = config(
+    "WEBHOOK_ROUTE_MAX_CONNECTIONS", cast=int, default=10
+)
+
+# decode payload logs with their ABI when EventRecord.payload is read
+DECODE_ABI = config("WEBHOOK_DECODE_ABI", cast=bool, default=False)
 
 API_KEY = config("WEBHOOK_API_KEY", cast=Secret)
+# keccak-256 implementation for signatures; see keccak.load_backend
+KECCAK_BACKEND = config("WEBHOOK_KECCAK_BACKEND", default="auto")
+AUTH_PUBLIC_PATHS = config(
+    "WEBHOOK_AUTH_PUBLIC_PATHS",
+    cast=CommaSeparatedStrings,
+    default="/hello,/metrics",
+)
 
 TUNNEL = config("WEBHOOK_TUNNEL", cast=bool, default=True)
 NGROK_AUTHTOKEN = config("NGROK_AUTHTOKEN", cast=Secret)
 
+DEDUPE = config("WEBHOOK_DEDUPE", default="off")
+DEDUPE_WINDOW = config("WEBHOOK_DEDUPE_WINDOW", cast=float, default=600.0)
+DEDUPE_SIZE = config("WEBHOOK_DEDUPE_SIZE", cast=int, default=100_000)
+
+EVENT_LOG = config("WEBHOOK_EVENT_LOG", cast=str, default=None)
+EVENT_LOG_FSYNC = config("WEBHOOK_EVENT_LOG_FSYNC", default="interval")
+EVENT_LOG_FSYNC_INTERVAL = config(
+    "WEBHOOK_EVENT_LOG_FSYNC_INTERVAL", cast=float, default=1.0
+)
+EVENT_LOG_SEGMENT_SIZE = config(
+    "WEBHOOK_EVENT_LOG_SEGMENT_SIZE", cast=int, default=64_000_000
+)
+EVENT_LOG_RETENTION = config(
+    "WEBHOOK_EVENT_LOG_RETENTION", cast=int, default=8
+)
+
+SUBSCRIBER_QUEUE_SIZE = config(
+    "WEBHOOK_SUBSCRIBER_QUEUE_SIZE", cast=int, default=1000
+)
+SUBSCRIBER_KEEPALIVE = config(
+    "WEBHOOK_SUBSCRIBER_KEEPALIVE", cast=float, default=15.0
+)
+
 MAX_CONTENT_SIZE = config(
     "WEBHOOK_MAX_CONTENT_SIZE", cast=int, default=10_000_000
 )
 
+# admission control high watermarks for event deliveries; 0 disables
+ADMISSION_MAX_INFLIGHT = config(
+    "WEBHOOK_ADMISSION_MAX_INFLIGHT", cast=int, default=256
+)
+ADMISSION_RELAY_HIGH = config(
+    "WEBHOOK_ADMISSION_RELAY_HIGH", cast=int, default=64
+)
+# off by default: large buffers are a supported configuration
+ADMISSION_BUFFER_HIGH = config(
+    "WEBHOOK_ADMISSION_BUFFER_HIGH", cast=int, default=0
+)
+ADMISSION_LOW_RATIO = config(
+    "WEBHOOK_ADMISSION_LOW_RATIO", cast=float, default=0.9
+)
+ADMISSION_RETRY_AFTER = config(
+    "WEBHOOK_ADMISSION_RETRY_AFTER", cast=int, default=5
+)
+
 MORALIS_API_KEY = config("MORALIS_API_KEY", cast=Secret)
 MORALIS_STREAMS_API_DEBUG = config(
     "MORALIS_STREAMS_API_DEBUG", cast=bool, default=False
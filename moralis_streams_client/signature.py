@@ -4,10 +4,10 @@ import json
 import logging
 import os
 
-from eth_hash.auto import keccak
 from eth_utils import to_hex
 
 from . import settings
+from .keccak import KeccakBackend, load_backend
 
 logger = logging.getLogger("signature")
 debug = logger.debug
@@ -16,13 +16,22 @@ critical = logger.critical
 
 
 class Signature:
-    def __init__(self, key=None, header="X-Signature"):
+    """keccak-256 request signatures
+
+    backend is a KeccakBackend or a backend name passed to load_backend;
+    the default is settings.KECCAK_BACKEND
+    """
+
+    def __init__(self, key=None, header="X-Signature", backend=None):
         key = key or str(settings.API_KEY)
         self.key = self._bytes(key)
         self.header = header
+        if not isinstance(backend, KeccakBackend):
+            backend = load_backend(backend or settings.KECCAK_BACKEND)
+        self.backend = backend
 
     def _bytes(self, data):
-        if isinstance(data, dict):
+        if isinstance(data, (dict, list)):
             data = json.dumps(data, separators=(",", ":")).encode()
         if isinstance(data, str):
             data = data.encode()
@@ -39,8 +48,7 @@ class Signature:
         """calculate the sha3 checksum of body and api_key"""
         body = self._bytes(body)
         # debug(f"calculate: {len(body)} bytes {body=}")
-        body = self._bytes(body)
-        s = keccak.new(body)
+        s = self.backend.new(body)
         s.update(self.key)
         ret = to_hex(s.digest())
         # debug(f"{ret=}")
@@ -48,3 +56,28 @@ class Signature:
 
     def headers(self, body: bytes) -> dict:
         return {self.header: self.calculate(body)}
+
+    def hasher(self):
+        """return an incremental hasher for a body received in chunks"""
+        return SignatureHasher(self.key, self.backend)
+
+
+class SignatureHasher:
+    """sha3 checksum of a body fed chunk by chunk, then the api_key
+
+    calculate() and validate() finalize the hash; a hasher is single use
+    """
+
+    def __init__(self, key: bytes, backend: KeccakBackend):
+        self.key = key
+        self.preimage = backend.new(b"")
+
+    def update(self, chunk: bytes):
+        self.preimage.update(chunk)
+
+    def calculate(self) -> str:
+        self.preimage.update(self.key)
+        return to_hex(self.preimage.digest())
+
+    def validate(self, signature: str) -> bool:
+        return signature == self.calculate()
@@ -0,0 +1,253 @@
+# sqlite event buffer store
+
+import logging
+import sqlite3
+import time
+from uuid import UUID
+
+import orjson
+
+from . import settings
+from .event_record import EventRecord
+from .event_store import _int
+
+logger = logging.getLogger(__name__)
+debug = logger.debug
+logger.setLevel(settings.LOG_LEVEL)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    stream_id TEXT,
+    tag TEXT,
+    chain_id INTEGER,
+    block_number INTEGER,
+    confirmed INTEGER,
+    path TEXT,
+    method TEXT,
+    headers BLOB,
+    body BLOB NOT NULL,
+    relay BLOB
+);
+CREATE INDEX IF NOT EXISTS events_stream_id ON events (stream_id, seq);
+CREATE INDEX IF NOT EXISTS events_tag ON events (tag, seq);
+CREATE INDEX IF NOT EXISTS events_chain_id ON events (chain_id, seq);
+CREATE INDEX IF NOT EXISTS events_block_number ON events (block_number);
+CREATE INDEX IF NOT EXISTS events_confirmed ON events (confirmed, seq);
+CREATE TABLE IF NOT EXISTS config (
+    key TEXT PRIMARY KEY,
+    value BLOB
+);
+"""
+
+INSERT = """
+INSERT OR IGNORE INTO events (
+    id, stream_id, tag, chain_id, block_number, confirmed,
+    path, method, headers, body, relay
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+COLUMNS = "id, path, method, headers, body, relay"
+
+FIELDS = "stream_id, tag, chain_id, block_number, confirmed"
+
+# bound parameters per statement; sqlite allows at least 999
+MAX_VARIABLES = 500
+
+# the buffered byte total scans the whole table
+NBYTES_INTERVAL = 30.0
+
+CONDITIONS = dict(
+    stream_id="stream_id = ?",
+    tag="tag = ?",
+    chain_id="chain_id = ?",
+    from_block="block_number >= ?",
+    to_block="block_number <= ?",
+    confirmed="confirmed = ?",
+)
+
+
+class SQLiteEventStore:
+    """event buffer in a WAL-mode sqlite database
+
+    Moralis payload fields are extracted into indexed columns so the
+    buffer can be queried by stream, tag, chain, block and confirmation.
+    The body and headers are stored as the received bytes.  Inserts are
+    queued and written in batches of batch_size; pending rows are
+    flushed before any read.
+
+    The config table holds queue settings shared by every process
+    using the same database.
+    """
+
+    def __init__(self, path, batch_size=None):
+        self.path = str(path)
+        self.batch_size = batch_size or settings.BUFFER_BATCH_SIZE
+        self.pending = []
+        self.bytes = 0
+        self.bytes_time = None
+        self.db = sqlite3.connect(
+            self.path, isolation_level=None, check_same_thread=False
+        )
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        debug(f"opened {self.path}")
+
+    def __len__(self):
+        self.flush()
+        return self.db.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def nbytes(self):
+        """return the size of the buffered bodies and headers
+
+        The stored total is refreshed from the table at most every
+        NBYTES_INTERVAL seconds and tracks this process's inserts in
+        between; pending rows are counted without flushing them.
+        """
+        now = time.monotonic()
+        if self.bytes_time is None or now - self.bytes_time > NBYTES_INTERVAL:
+            self.bytes = int(
+                self.db.execute(
+                    "SELECT TOTAL(LENGTH(body)) + TOTAL(LENGTH(headers)) "
+                    "FROM events"
+                ).fetchone()[0]
+            )
+            self.bytes_time = now
+        return self.bytes + self._pending_bytes()
+
+    def _pending_bytes(self):
+        return sum(len(row[8] or b"") + len(row[9]) for row in self.pending)
+
+    def flush(self):
+        if self.pending:
+            with self.db:
+                self.db.execute("BEGIN")
+                self.db.executemany(INSERT, self.pending)
+            self.bytes += self._pending_bytes()
+            self.pending.clear()
+
+    def append(self, event):
+        fields = event.fields
+        self.pending.append(
+            (
+                str(event.id),
+                fields["stream_id"],
+                fields["tag"],
+                fields["chain_id"],
+                fields["block_number"],
+                fields["confirmed"],
+                event.path,
+                event.method,
+                event.raw_headers,
+                event.raw,
+                None if event.relay is None else orjson.dumps(event.relay),
+            )
+        )
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def _record(self, row):
+        event_id, path, method, headers, body, relay, *fields = row
+        fields = dict(zip(FIELDS.split(", "), fields))
+        if fields["confirmed"] is not None:
+            fields["confirmed"] = bool(fields["confirmed"])
+        return EventRecord(
+            UUID(event_id),
+            path,
+            method,
+            headers,
+            body,
+            None if relay is None else orjson.loads(relay),
+            fields,
+        )
+
+    def get(self, event_id):
+        self.flush()
+        row = self.db.execute(
+            f"SELECT {COLUMNS}, {FIELDS} FROM events WHERE id = ?",
+            (str(event_id),),
+        ).fetchone()
+        return None if row is None else self._record(row)
+
+    def pop(self, event_id):
+        event = self.get(event_id)
+        if event is not None:
+            self.db.execute(
+                "DELETE FROM events WHERE id = ?", (str(event_id),)
+            )
+        return event
+
+    def delete_many(self, event_ids):
+        """delete events by id in one transaction; return the ids deleted"""
+        self.flush()
+        event_ids = list(dict.fromkeys(event_ids))
+        keys = [str(event_id) for event_id in event_ids]
+        found = set()
+        with self.db:
+            self.db.execute("BEGIN")
+            for start in range(0, len(keys), MAX_VARIABLES):
+                chunk = keys[start : start + MAX_VARIABLES]
+                marks = ", ".join("?" * len(chunk))
+                rows = self.db.execute(
+                    f"SELECT id FROM events WHERE id IN ({marks})", chunk
+                )
+                found.update(row[0] for row in rows)
+                self.db.execute(
+                    f"DELETE FROM events WHERE id IN ({marks})", chunk
+                )
+        return [i for i, key in zip(event_ids, keys) if key in found]
+
+    def clear(self):
+        self.pending.clear()
+        self.bytes = 0
+        self.db.execute("DELETE FROM events")
+
+    def values(self):
+        return self.page()[0]
+
+    def page(self, after=None, limit=None, filters=None):
+        """return (events, cursor) for up to limit events following cursor
+
+        cursor is None when no further events remain
+        """
+        self.flush()
+        conditions = []
+        params = []
+        if after is not None:
+            conditions.append("seq > ?")
+            params.append(after)
+        for key, value in (filters or {}).items():
+            conditions.append(CONDITIONS[key])
+            params.append(_int(value) if key == "chain_id" else value)
+        query = f"SELECT seq, {COLUMNS}, {FIELDS} FROM events"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY seq"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit + 1)
+        rows = self.db.execute(query, params).fetchall()
+        cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            cursor = rows[-1][0]
+        return [self._record(row[1:]) for row in rows], cursor
+
+    def load_config(self):
+        rows = self.db.execute("SELECT key, value FROM config").fetchall()
+        return {key: orjson.loads(value) for key, value in rows}
+
+    def save_config(self, **values):
+        with self.db:
+            self.db.execute("BEGIN")
+            self.db.executemany(
+                "INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)",
+                [(key, orjson.dumps(value)) for key, value in values.items()],
+            )
+
+    def close(self):
+        self.flush()
+        self.db.close()
@@ -4,6 +4,7 @@ import json
 import logging
 from pprint import pformat
 
+import orjson
 from fastapi import HTTPException, Request
 from httpx import codes
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -16,34 +17,18 @@ error = logger.error
 critical = logger.critical
 
 
-async def validate_signature(request: Request):
-
-    signature = request.app.state.signature
-    path = request.scope["path"]
-
-    if signature is None or signature.header is None or signature.key is None:
-        msg = "signature validator not configured"
-        critical(f"{msg}: {path}")
+def parse_body(body):
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError as exc:
         raise HTTPException(
-            detail=msg, status_code=codes.INTERNAL_SERVER_ERROR
+            detail=f"invalid JSON body: {exc}", status_code=codes.BAD_REQUEST
         )
 
-    request_signature = request.headers.get(signature.header, None)
-
-    if request_signature is None:
-        msg = "missing signature"
-        error(f"{msg}: {path}")
-        raise HTTPException(detail=msg, status_code=codes.BAD_REQUEST)
-    else:
-        body = await request.body()
-        if len(body) == 0:
-            body = b""
-        else:
-            body = json.dumps(json.loads(body), separators=(",", ":")).encode()
-        debug(
-            f"validating: {path} type={type(body)} length={len(body)} {request_signature}"
-        )
-        if not signature.validate(request_signature, body):
-            msg = "authorization failed"
-            error(f"{msg}: {path}")
-            raise HTTPException(detail=msg, status_code=codes.UNAUTHORIZED)
+
+async def get_json_body(request: Request):
+    """return the request body parsed once, reusing the validator's parse"""
+    ret = getattr(request.state, "json", None)
+    if ret is None:
+        ret = request.state.json = parse_body(await request.body())
+    return ret
@@ -1,9 +1,10 @@
 # webhook server process
 
+import asyncio
 import json
 import logging
 import os
-import re
+import socket
 import subprocess
 import sys
 import time
@@ -13,14 +14,36 @@ import httpx
 import psutil
 
 from . import settings
+from .defaults import NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE
 from .logconfig import configure_logging
+from .pidfile import running_pid
 from .signature import Signature
 
 logger = logging.getLogger(__name__)
 debug = logger.debug
 
-PROCESS_START_TIMEOUT = 5
+# start allows for the ngrok tunnel to connect before the server listens
+PROCESS_START_TIMEOUT = 30
 PROCESS_STOP_TIMEOUT = 10
+PROBE_TIMEOUT = 1
+POLL_INTERVAL = 0.1
+
+# pooled client connections and concurrent requests in bulk operations
+MAX_CONNECTIONS = 20
+CONCURRENCY = 20
+DELETE_BATCH_SIZE = 10_000
+
+
+def socket_listening(path):
+    """return True if a server is accepting connections on unix socket path"""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(path))
+    except OSError:
+        return False
+    finally:
+        probe.close()
+    return True
 
 
 class Webhook:
@@ -30,6 +53,8 @@ class Webhook:
         debug=None,
         addr=None,
         port=None,
+        workers=None,
+        uds=None,
         base_url=None,
         tunnel=None,
         relay_url=None,
@@ -43,6 +68,8 @@ class Webhook:
         self.debug = settings.DEBUG if debug is None else debug
         self.addr = addr or settings.ADDR
         self.port = port or settings.PORT
+        self.workers = workers or settings.WORKERS
+        self.uds = uds or settings.UDS
         self.tunnel = settings.TUNNEL if tunnel is None else tunnel
         self.relay_url = relay_url or settings.RELAY_URL
         self.relay_key = relay_key or settings.RELAY_KEY
@@ -57,27 +84,68 @@ class Webhook:
         self.base_url = base_url.strip("/") + "/"
         self.signature = Signature()
         self.proc = None
+        self.client = None
+        self.client_loop = None
         configure_logging()
 
-    async def _request(self, method, path, **kwargs):
-        # generate a signature checksum
-        raise_for_status = kwargs.pop("raise_for_status", True)
-        kwargs.setdefault("json", None)
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        await self.aclose()
+
+    def _client(self):
+        """return the pooled client, created for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self.client is None or self.client_loop is not loop:
+            limits = httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_CONNECTIONS,
+            )
+            if self.uds and socket_listening(self.uds):
+                # a server on this host; skip TCP.  A socket file left
+                # by a stopped server fails the probe and TCP is used.
+                transport = httpx.AsyncHTTPTransport(
+                    uds=self.uds, limits=limits
+                )
+                self.client = httpx.AsyncClient(transport=transport)
+            else:
+                self.client = httpx.AsyncClient(limits=limits)
+            self.client_loop = loop
+        return self.client
+
+    async def aclose(self):
+        """close the pooled client"""
+        if self.client is not None:
+            if self.client_loop is asyncio.get_running_loop():
+                await self.client.aclose()
+            self.client = None
+            self.client_loop = None
+
+    def _sign(self, kwargs):
+        # send the exact bytes that were signed
+        data = kwargs.pop("json", None)
         kwargs.setdefault("headers", {})
-        if kwargs["json"] is None:
+        if data is None:
             body = b""
         else:
-            body = kwargs["json"]
+            body = json.dumps(data, separators=(",", ":")).encode()
+            kwargs["content"] = body
+            kwargs["headers"]["Content-Type"] = "application/json"
         kwargs["headers"].update(self.signature.headers(body))
+        return kwargs
 
-        async with httpx.AsyncClient() as client:
-            self.response = await client.request(
-                method, self.base_url + path, **kwargs
-            )
+    async def _request(self, method, path, **kwargs):
+        raise_for_status = kwargs.pop("raise_for_status", True)
+        kwargs = self._sign(kwargs)
+
+        response = await self._client().request(
+            method, self.base_url + path, **kwargs
+        )
+        self.response = response
         if raise_for_status:
-            self.response.raise_for_status()
-        body = self.response.json()
-        return body["result"]
+            response.raise_for_status()
+        return response.json()["result"]
 
     async def hello(self):
         """send and receive a friendly greeting"""
@@ -121,10 +189,36 @@ class Webhook:
 
         return await self._request(method, "relay", json=args)
 
+    async def routes(self, routes=None):
+        """return or replace the relay routing table"""
+        if routes is None:
+            return await self._request("GET", "routes")
+        return await self._request("POST", "routes", json=routes)
+
+    async def dedupe(self):
+        """return duplicate delivery counters"""
+        return await self._request("GET", "dedupe")
+
     async def inject(self, event):
         """process an event as a received callback"""
         return await self._request("POST", "contract/event", json=event)
 
+    async def inject_many(self, events, concurrency=CONCURRENCY):
+        """inject events concurrently; return the event ids in order
+
+        the exception raised by a failed injection is returned in place
+        of its event id
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def inject(event):
+            async with semaphore:
+                return await self.inject(event)
+
+        return await asyncio.gather(
+            *[inject(event) for event in events], return_exceptions=True
+        )
+
     async def event(self, event_id):
         """return event by id"""
         return await self._request("GET", f"event/{event_id}")
@@ -133,9 +227,62 @@ class Webhook:
         """delete event by id"""
         return await self._request("DELETE", f"event/{event_id}")
 
-    async def events(self):
+    async def delete_many(self, event_ids):
+        """delete events by id; return dict(deleted=[ids], missing=[ids])
+
+        ids are sent in batches of DELETE_BATCH_SIZE per request
+        """
+        event_ids = [str(event_id) for event_id in event_ids]
+        ret = dict(deleted=[], missing=[])
+        for start in range(0, len(event_ids), DELETE_BATCH_SIZE):
+            batch = event_ids[start : start + DELETE_BATCH_SIZE]
+            result = await self._request(
+                "POST", "events/delete", json=dict(ids=batch)
+            )
+            ret["deleted"].extend(result["deleted"])
+            ret["missing"].extend(result["missing"])
+        return ret
+
+    async def _stream(self, method, path, **kwargs):
+        """yield each line of a streamed response"""
+        kwargs = self._sign(kwargs)
+        async with self._client().stream(
+            method, self.base_url + path, timeout=None, **kwargs
+        ) as response:
+            self.response = response
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line:
+                    yield line
+
+    async def iter_events(self, after=None, limit=None, **filters):
+        """yield events as they are streamed from the server
+
+        filters: streamId, tag, chainId, fromBlock, toBlock, confirmed
+        """
+        params = {k: v for k, v in filters.items() if v is not None}
+        if after is not None:
+            params["after"] = after
+        if limit is not None:
+            params["limit"] = limit
+        headers = {"Accept": NDJSON_MEDIA_TYPE}
+        async for line in self._stream(
+            "GET", "events", params=params, headers=headers
+        ):
+            yield json.loads(line)
+
+    async def events(self, **filters):
         """return a list of all events"""
-        return await self._request("GET", "events")
+        return [event async for event in self.iter_events(**filters)]
+
+    async def subscribe(self):
+        """yield events pushed by the server as they are received"""
+        headers = {"Accept": SSE_MEDIA_TYPE}
+        async for line in self._stream("GET", "subscribe", headers=headers):
+            if line.startswith("event: overflow"):
+                raise OverflowError("subscriber disconnected by server")
+            if line.startswith("data:"):
+                yield json.loads(line[5:])
 
     async def shutdown(self):
         """request server shutdown"""
@@ -150,6 +297,9 @@ class Webhook:
 
         env["WEBHOOK_ADDR"] = self.addr
         env["WEBHOOK_PORT"] = str(self.port)
+        env["WEBHOOK_WORKERS"] = str(self.workers)
+        if self.uds:
+            env["WEBHOOK_UDS"] = str(self.uds)
         env["WEBHOOK_LOG_FILE"] = str(self.log_file)
         env["WEBHOOK_LOG_LEVEL"] = str(self.log_level)
         env["WEBHOOK_DEBUG"] = "1" if self.debug else "0"
@@ -170,60 +320,83 @@ class Webhook:
             if k.startswith("WEBHOOK"):
                 debug(f"  {k}={v}")
 
-        pid = subprocess.Popen(
+        proc = subprocess.Popen(
             cmd,
             env=env,
             stderr=subprocess.STDOUT,
             stdout=subprocess.DEVNULL,
             close_fds=True,
-        ).pid
-        debug(f"{pid=}")
+        )
+        debug(f"pid={proc.pid}")
 
         if wait:
-            timeout = time.time() + PROCESS_START_TIMEOUT
-            while await self.server_running() is False:
-                time.sleep(0.25)
-                if time.time() > timeout:
-                    raise TimeoutError
-        return pid
+            await self.wait_ready(proc)
+            if self.uds:
+                # the probe client was created before the socket existed
+                await self.aclose()
+        return proc.pid
+
+    async def ready(self):
+        """probe /hello; return True if the server is answering requests"""
+        try:
+            await self._request("GET", "hello", timeout=PROBE_TIMEOUT)
+        except (httpx.HTTPError, ValueError, KeyError):
+            return False
+        return True
+
+    async def wait_ready(self, proc=None, timeout=PROCESS_START_TIMEOUT):
+        """wait until the server answers; fail early if proc exits"""
+        expires = time.monotonic() + timeout
+        while not await self.ready():
+            if proc is not None and proc.poll() is not None:
+                raise RuntimeError(
+                    f"process {proc.args} returned {proc.returncode}"
+                )
+            if time.monotonic() > expires:
+                raise TimeoutError("server did not become ready")
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def wait_stopped(self, timeout=PROCESS_STOP_TIMEOUT):
+        """wait until no server is registered for the port"""
+        expires = time.monotonic() + timeout
+        while await self.server_running():
+            if time.monotonic() > expires:
+                raise TimeoutError("server did not stop")
+            await asyncio.sleep(POLL_INTERVAL)
 
     async def processes(self):
-        """return list of server processess"""
-        pattern = f".*webhook.*--port {self.port}.*"
-        procs = []
-        for p in psutil.process_iter():
-            cmdline = " ".join(p.cmdline())
-            if re.match(pattern, cmdline):
-                debug(f"process: {p}")
-                procs.append(p)
-        return procs
+        """return the registered server process and its children"""
+        pid = running_pid(self.port)
+        if pid is None:
+            return []
+        try:
+            proc = psutil.Process(pid)
+            return [proc] + proc.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return []
 
     async def server_running(self):
         """return bool indicating if server is running"""
-        return bool(await self.processes())
+        return running_pid(self.port) is not None
 
     async def stop(self, wait=True, callback=None):
-        """signal running server processes to terminate"""
-        if await self.server_running():
-            procs = await self.processes()
-            for p in procs:
-                debug(f"terminate: {p}")
-                p.terminate()
-
-            if wait:
-                gone, alive = psutil.wait_procs(
-                    await self.processes(),
-                    timeout=PROCESS_STOP_TIMEOUT,
-                    callback=callback,
-                )
-                for p in alive:
-                    p.kill()
-
-                if await self.server_running():
-                    await self.shutdown()
-
-            timeout = time.time() + PROCESS_STOP_TIMEOUT
-            while wait and await self.server_running():
-                time.sleep(0.25)
-                if time.time() > timeout:
-                    raise TimeoutError
+        """signal the running server to terminate
+
+        the server stops its worker processes; those still alive after
+        PROCESS_STOP_TIMEOUT are killed
+        """
+        procs = await self.processes()
+        if not procs:
+            return
+        debug(f"terminate: {procs[0]}")
+        procs[0].terminate()
+        if wait:
+            gone, alive = await asyncio.to_thread(
+                psutil.wait_procs,
+                procs,
+                timeout=PROCESS_STOP_TIMEOUT,
+                callback=callback,
+            )
+            for p in alive:
+                p.kill()
+            await self.wait_stopped()
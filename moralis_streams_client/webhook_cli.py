@@ -7,6 +7,7 @@ import sys
 from multiprocessing import Process
 from pathlib import Path
 from subprocess import CalledProcessError, check_output
+from textwrap import indent
 
 import asyncclick as click
 from eth_hash.auto import keccak
@@ -14,6 +15,8 @@ from eth_utils import to_hex
 
 from . import settings
 from .exception_handler import ExceptionHandler
+from .keccak import SLOW_BYTES_PER_SECOND, available, benchmark
+from .loadgen import LoadGenerator, synthetic_payload
 from .signature import Signature
 from .webhook import Webhook
 
@@ -53,6 +56,18 @@ def run(cmd):
     type=int,
     help="server listen port",
 )
+@click.option(
+    "-w",
+    "--workers",
+    type=int,
+    help="server worker processes sharing a sqlite buffer",
+)
+@click.option(
+    "-u",
+    "--uds",
+    type=click.Path(dir_okay=False),
+    help="server unix domain socket for local clients",
+)
 @click.option(
     "-t/-T",
     "--tunnel/--no-tunnel",
@@ -109,6 +124,8 @@ def webhook(
     debug,
     addr,
     port,
+    workers,
+    uds,
     tunnel,
     relay_url,
     relay_key,
@@ -127,6 +144,10 @@ def webhook(
         settings.ADDR = addr
     if port:
         settings.PORT = port
+    if workers:
+        settings.WORKERS = workers
+    if uds:
+        settings.UDS = uds
     if tunnel is not None:
         settings.TUNNEL = tunnel
     if relay_url:
@@ -242,6 +263,18 @@ async def relay(ctx, relay_enabled):
     )
 
 
+@webhook.command
+@click.argument("routes-file", required=False, type=click.File("r"))
+@click.pass_context
+async def routes(ctx, routes_file):
+    """output the relay routes, or replace them from a JSON file"""
+    webhook = ctx.obj["webhook"]
+    if routes_file is None:
+        output(await webhook.routes())
+    else:
+        output(await webhook.routes(json.load(routes_file)))
+
+
 @webhook.command
 @click.option("-m", "--message", type=str, help="create json message data")
 @click.argument("input", default="-", type=click.File("r"))
@@ -256,6 +289,108 @@ async def inject(ctx, message, input):
     output(await webhook.inject(data))
 
 
+@webhook.command
+@click.option(
+    "-n", "--requests", type=int, default=1000, help="requests to send"
+)
+@click.option(
+    "-c", "--concurrency", type=int, default=32, help="concurrent requests"
+)
+@click.option(
+    "-r",
+    "--rate",
+    type=float,
+    help="target requests per second [default: as fast as possible]",
+)
+@click.option("--logs", type=int, default=10, help="logs per block")
+@click.option("--txs", type=int, default=10, help="transactions per block")
+@click.option(
+    "--internal-txs",
+    type=int,
+    default=0,
+    help="internal transactions per block",
+)
+@click.option(
+    "-b", "--blocks", type=int, default=100, help="distinct payloads to send"
+)
+@click.option(
+    "-o",
+    "--output",
+    "output_file",
+    type=click.File("w"),
+    help="also write the results as JSON to a file",
+)
+@click.pass_context
+async def loadgen(
+    ctx,
+    requests,
+    concurrency,
+    rate,
+    logs,
+    txs,
+    internal_txs,
+    blocks,
+    output_file,
+):
+    """send signed synthetic events and report throughput and latency"""
+    webhook = ctx.obj["webhook"]
+    payloads = [
+        synthetic_payload(number, logs, txs, internal_txs)
+        for number in range(1, blocks + 1)
+    ]
+    generator = LoadGenerator(
+        webhook.base_url + "contract/event",
+        payloads,
+        signature=webhook.signature,
+        requests=requests,
+        concurrency=concurrency,
+        rate=rate,
+    )
+    report = await generator.run()
+    report["payload"] = dict(
+        logs=logs,
+        txs=txs,
+        internal_txs=internal_txs,
+        blocks=blocks,
+        bytes=sum(len(body) for body, _ in generator.messages) // blocks,
+    )
+    output(report)
+    if output_file:
+        json.dump(report, output_file, indent=2)
+        output_file.write("\n")
+
+
+@webhook.command
+@click.pass_context
+async def keccak_backends(ctx):
+    """benchmark the installed keccak backends; output the active one"""
+    webhook = ctx.obj["webhook"]
+    active = webhook.signature.backend
+    backends = available()
+    if active.name not in [backend.name for backend in backends]:
+        backends.append(active)
+    results = []
+    for backend in backends:
+        rate = benchmark(backend, duration=0.5)
+        results.append(
+            dict(
+                name=backend.name,
+                active=backend.name == active.name,
+                mb_per_second=round(rate / 1e6, 1),
+                slow=rate < SLOW_BYTES_PER_SECOND,
+            )
+        )
+    output(dict(active=active.name, backends=results))
+
+
+@webhook.command
+@click.pass_context
+async def dedupe(ctx):
+    """output duplicate delivery counters"""
+    webhook = ctx.obj["webhook"]
+    output(await webhook.dedupe())
+
+
 @webhook.command
 @click.argument("event-id", type=str)
 @click.pass_context
@@ -266,12 +401,15 @@ async def event(ctx, event_id):
 
 
 @webhook.command
-@click.argument("event-id", type=str)
+@click.argument("event-ids", type=str, nargs=-1, required=True)
 @click.pass_context
-async def delete(ctx, event_id):
-    """delete an event by id"""
+async def delete(ctx, event_ids):
+    """delete events by id"""
     webhook = ctx.obj["webhook"]
-    output(await webhook.delete(event_id))
+    if len(event_ids) == 1:
+        output(await webhook.delete(event_ids[0]))
+    else:
+        output(await webhook.delete_many(event_ids))
 
 
 @webhook.command
@@ -283,13 +421,64 @@ async def clear(ctx):
 
 
 @webhook.command
+@click.option(
+    "-n", "--ndjson", is_flag=True, help="output one JSON event per line"
+)
+@click.option("-s", "--stream-id", type=str, help="select by streamId")
+@click.option("-t", "--tag", type=str, help="select by tag")
+@click.option("-c", "--chain-id", type=str, help="select by chainId")
+@click.option("-f", "--from-block", type=int, help="minimum block number")
+@click.option("-T", "--to-block", type=int, help="maximum block number")
+@click.option(
+    "--confirmed/--unconfirmed",
+    is_flag=True,
+    default=None,
+    help="select by confirmed flag",
+)
 @click.argument("output", default="-", type=click.File("w"))
 @click.pass_context
-async def events(ctx, output):
+async def events(
+    ctx,
+    ndjson,
+    stream_id,
+    tag,
+    chain_id,
+    from_block,
+    to_block,
+    confirmed,
+    output,
+):
     """output events received by the webhook server"""
     webhook = ctx.obj["webhook"]
-    json.dump(await webhook.events(), output, indent=2)
-    output.write("\n")
+    filters = dict(
+        streamId=stream_id,
+        tag=tag,
+        chainId=chain_id,
+        fromBlock=from_block,
+        toBlock=to_block,
+        confirmed=None if confirmed is None else str(confirmed).lower(),
+    )
+    if ndjson:
+        async for event in webhook.iter_events(**filters):
+            output.write(json.dumps(event) + "\n")
+        return
+    separator = "\n"
+    output.write("[")
+    async for event in webhook.iter_events(**filters):
+        output.write(separator + indent(json.dumps(event, indent=2), "  "))
+        separator = ",\n"
+    output.write("\n]\n" if separator != "\n" else "]\n")
+
+
+@webhook.command
+@click.argument("output", default="-", type=click.File("w"))
+@click.pass_context
+async def subscribe(ctx, output):
+    """output events as they are received by the webhook server"""
+    webhook = ctx.obj["webhook"]
+    async for event in webhook.subscribe():
+        output.write(json.dumps(event) + "\n")
+        output.flush()
 
 
 @webhook.command
@@ -311,14 +500,11 @@ async def start(ctx, wait):
         fail("already running")
     else:
         click.echo("starting webhook server...", nl=False, err=True)
-        proc = await webhook.start(wait)
-        if wait:
-            while not await webhook.server_running():
-                if proc.poll() is not None:
-                    click.echo("error")
-                    fail(f"process {proc.args} returned {proc.returncode}")
-                click.echo(".", nl=False, err=True)
-
+        try:
+            await webhook.start(wait)
+        except (RuntimeError, TimeoutError) as exc:
+            click.echo("error", err=True)
+            fail(exc)
         click.echo("started", err=True)
 
 
@@ -338,6 +524,6 @@ async def stop(ctx, wait):
         fail("not running")
     else:
         click.echo(await webhook.shutdown(), err=True, nl=False)
-    while await webhook.server_running():
-        click.echo(".", err=True, nl=False)
+    if wait:
+        await webhook.wait_stopped()
     click.echo("stopped", err=True)
@@ -0,0 +1,159 @@
+# abi log decoder tests
+
+from uuid import uuid4
+
+import pytest
+
+from moralis_streams_client import settings
+from moralis_streams_client.abi import AbiDecoder, event_topic
+from moralis_streams_client.event_record import EventRecord
+from moralis_streams_client.payload import decode
+
+TRANSFER = dict(
+    type="event",
+    name="Transfer",
+    anonymous=False,
+    inputs=[
+        dict(name="from", type="address", indexed=True),
+        dict(name="to", type="address", indexed=True),
+        dict(name="value", type="uint256", indexed=False),
+    ],
+)
+
+# ERC-721 Transfer: same signature and topic0, every argument indexed
+NFT_TRANSFER = dict(
+    TRANSFER,
+    inputs=[dict(item, indexed=True) for item in TRANSFER["inputs"]],
+)
+
+MEMO = dict(
+    type="event",
+    name="Memo",
+    anonymous=False,
+    inputs=[
+        dict(name="sender", type="address", indexed=True),
+        dict(name="delta", type="int256", indexed=False),
+        dict(name="text", type="string", indexed=False),
+    ],
+)
+
+TRANSFER_TOPIC = (
+    "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+)
+
+
+def _word(value):
+    return format(value % (1 << 256), "064x")
+
+
+def _log(index, topics, data):
+    log = dict(
+        logIndex=str(index),
+        transactionHash="0x" + "ab" * 32,
+        address="0x" + "cd" * 20,
+        data=data,
+    )
+    for number, topic in enumerate(topics):
+        log[f"topic{number}"] = topic
+    return log
+
+
+def _payload(logs, abi):
+    return decode(dict(streamId="s", chainId="0x1", logs=logs, abi=abi))
+
+
+def test_abi_event_topic():
+    assert event_topic(TRANSFER) == TRANSFER_TOPIC
+
+
+def test_abi_decode_static():
+    sender = "0x" + "11" * 20
+    receiver = "0x" + "22" * 20
+    topics = [TRANSFER_TOPIC, "0x" + _word(int(sender, 16))]
+    topics.append("0x" + _word(int(receiver, 16)))
+    payload = _payload([_log(0, topics, "0x" + _word(10**18))], [TRANSFER])
+    assert AbiDecoder().decode_payload(payload) == 1
+    (log,) = payload.logs
+    assert log.event == "Transfer"
+    assert log.args == {"from": sender, "to": receiver, "value": 10**18}
+
+
+def test_abi_decode_batch():
+    topics = [TRANSFER_TOPIC, "0x" + _word(1), "0x" + _word(2)]
+    logs = [_log(i, topics, "0x" + _word(i)) for i in range(10)]
+    logs.append(_log(10, ["0x" + "00" * 32], "0x"))
+    payload = _payload(logs, [])
+    decoder = AbiDecoder([TRANSFER])
+    assert decoder.decode_logs(payload.logs) == 10
+    assert [log.args["value"] for log in payload.logs[:10]] == list(range(10))
+    assert payload.logs[10].event is None
+
+
+def test_abi_decode_dynamic():
+    eth_abi = pytest.importorskip("eth_abi")
+    sender = "0x" + "33" * 20
+    data = eth_abi.encode(["int256", "string"], [-5, "hello"])
+    topics = [event_topic(MEMO), "0x" + _word(int(sender, 16))]
+    payload = _payload([_log(0, topics, "0x" + data.hex())], [MEMO])
+    decoder = AbiDecoder()
+    assert decoder.decode_payload(payload) == 1
+    assert payload.logs[0].args == dict(sender=sender, delta=-5, text="hello")
+    assert decoder.decoders[event_topic(MEMO), 1].data_converters is None
+
+
+def test_abi_decode_invalid_data():
+    topics = [TRANSFER_TOPIC, "0x" + _word(1), "0x" + _word(2)]
+    payload = _payload([_log(0, topics, "0xzz")], [TRANSFER])
+    assert AbiDecoder().decode_payload(payload) == 0
+    assert payload.logs[0].args is None
+
+
+def test_abi_decode_topic_case():
+    topics = [TRANSFER_TOPIC.upper().replace("0X", "0x"), "0x" + _word(1)]
+    topics.append("0x" + _word(2))
+    payload = _payload([_log(0, topics, "0x" + _word(3))], [TRANSFER])
+    assert AbiDecoder().decode_payload(payload) == 1
+
+
+def test_abi_decode_event_record(monkeypatch):
+    topics = [TRANSFER_TOPIC, "0x" + _word(1), "0x" + _word(2)]
+    body = dict(
+        streamId="s",
+        chainId="0x1",
+        logs=[_log(0, topics, "0x" + _word(3))],
+        abi=[TRANSFER],
+    )
+    event = EventRecord.from_body(uuid4(), "contract/event", "POST", {}, body)
+    assert event.payload.logs[0].args is None
+    monkeypatch.setattr(settings, "DECODE_ABI", True)
+    (log,) = event.payload.logs
+    assert log.event == "Transfer"
+    assert log.args["value"] == 3
+
+
+def test_abi_decode_erc20_erc721_transfer():
+    topics = [TRANSFER_TOPIC, "0x" + _word(1), "0x" + _word(2)]
+    token = _log(0, topics, "0x" + _word(500))
+    nft = _log(1, topics + ["0x" + _word(7)], "0x")
+    for abi in ([TRANSFER, NFT_TRANSFER], [NFT_TRANSFER, TRANSFER]):
+        payload = _payload([token, nft], abi)
+        assert AbiDecoder().decode_payload(payload) == 2
+        assert payload.logs[0].args["value"] == 500
+        assert payload.logs[1].args["value"] == 7
+
+    # the payload ABI is preferred over decoders cached from other ABIs
+    decoder = AbiDecoder([dict(TRANSFER, name="Other")])
+    payload = _payload([token], [TRANSFER])
+    assert decoder.decode_payload(payload) == 1
+    assert payload.logs[0].event == "Transfer"
+    # without an ABI the cache is the fallback
+    payload = _payload([token], [])
+    assert decoder.decode_payload(payload) == 1
+
+
+def test_abi_decoder_bounded():
+    decoder = AbiDecoder(max_abis=2, max_decoders=3)
+    for index in range(5):
+        decoder.add([dict(TRANSFER, name=f"Event{index}")])
+    assert len(decoder.abis) == 2
+    assert len(decoder.decoders) == 3
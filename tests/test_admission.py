@@ -0,0 +1,117 @@
+# admission control middleware tests
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from moralis_streams_client.admission import (
+    ADMISSION_REJECTED,
+    AdmissionMiddleware,
+    Watermark,
+)
+
+HIGH = 10
+
+
+@pytest.fixture
+def events():
+    return SimpleNamespace(events=[], relaying=0)
+
+
+@pytest.fixture
+def release():
+    return asyncio.Event()
+
+
+@pytest.fixture
+async def client(events, release):
+    async def ingest(request: Request):
+        await request.body()
+        if request.query_params.get("wait"):
+            await release.wait()
+        return JSONResponse(dict(result="ok"))
+
+    middleware = [
+        Middleware(
+            AdmissionMiddleware,
+            events=events,
+            paths=["/ingest"],
+            max_inflight=2,
+            relay_high=HIGH,
+            buffer_high=HIGH,
+            retry_after=7,
+        )
+    ]
+    app = Starlette(
+        routes=[
+            Route("/ingest", ingest, methods=["POST"]),
+            Route("/other", ingest, methods=["POST"]),
+        ],
+        middleware=middleware,
+    )
+    async with AsyncClient(app=app, base_url="http://test") as _client:
+        yield _client
+
+
+def test_admission_watermark():
+    mark = Watermark(10, 0.5)
+    assert [mark.check(value) for value in (9, 10, 9, 5, 4, 9)] == [
+        False,
+        True,
+        True,
+        True,
+        False,
+        False,
+    ]
+    assert not Watermark(None, 0.5).check(100)
+
+
+async def test_admission_relay_backlog(client, events):
+    assert (await client.post("/ingest")).status_code == 200
+    events.relaying = HIGH
+    rejected = ADMISSION_REJECTED.values.get(("relay",), 0)
+    response = await client.post("/ingest")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "7"
+    assert "relay" in response.json()["detail"]
+    assert ADMISSION_REJECTED.values[("relay",)] == rejected + 1
+    # other paths are not subject to admission control
+    assert (await client.post("/other")).status_code == 200
+    events.relaying = HIGH - 1
+    assert (await client.post("/ingest")).status_code == 503
+    events.relaying = 0
+    assert (await client.post("/ingest")).status_code == 200
+
+
+async def test_admission_inflight(client, release):
+    waiting = [
+        asyncio.create_task(client.post("/ingest?wait=1")) for _ in range(2)
+    ]
+    await asyncio.sleep(0.1)
+    response = await client.post("/ingest")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "7"
+    release.set()
+    assert [r.status_code for r in await asyncio.gather(*waiting)] == [
+        200,
+        200,
+    ]
+    assert (await client.post("/ingest")).status_code == 200
+
+
+async def test_admission_buffer_depth(events):
+    events.events.extend(range(HIGH))
+    middleware = AdmissionMiddleware(None, events, buffer_high=HIGH)
+    assert middleware.overloaded() == "buffer"
+    # the depth is cached between refreshes
+    events.events.clear()
+    assert middleware.overloaded() == "buffer"
+    middleware.depth_time = None
+    assert middleware.overloaded() is None
@@ -0,0 +1,95 @@
+# signature middleware tests
+
+import pytest
+from httpx import AsyncClient
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from moralis_streams_client.auth import NONE, SignatureMiddleware
+from moralis_streams_client.signature import Signature
+
+TEST_KEY = "nobody_expects_the_spanish_inquisition"
+
+
+async def echo(request: Request):
+    body = await request.body()
+    parsed = getattr(request.state, "json", None)
+    return JSONResponse(dict(length=len(body), parsed=parsed))
+
+
+@pytest.fixture
+def signature():
+    return Signature(TEST_KEY)
+
+
+@pytest.fixture
+async def client(signature):
+    routes = [
+        Route("/open", echo),
+        Route("/echo", echo, methods=["GET", "POST"]),
+    ]
+    middleware = [Middleware(SignatureMiddleware, policies={"/open": NONE})]
+    app = Starlette(routes=routes, middleware=middleware)
+    app.state.signature = signature
+    async with AsyncClient(app=app, base_url="http://test") as _client:
+        yield _client
+
+
+async def test_auth_no_auth_route(client):
+    response = await client.get("/open")
+    assert response.status_code == 200
+
+
+async def test_auth_missing_signature(client):
+    response = await client.get("/echo")
+    assert response.status_code == 400
+    assert response.json() == {"detail": "missing signature"}
+
+
+async def test_auth_header_only(client, signature):
+    response = await client.get("/echo", headers=signature.headers(b""))
+    assert response.status_code == 200
+    response = await client.get("/echo", headers={signature.header: "0x0"})
+    assert response.status_code == 401
+
+
+async def test_auth_raw_body(client, signature):
+    body = b'{"spam": "eggs"}'
+    response = await client.post(
+        "/echo", content=body, headers=signature.headers(body)
+    )
+    assert response.status_code == 200
+    assert response.json() == dict(length=len(body), parsed=None)
+
+
+async def test_auth_canonical_body(client, signature):
+    data = dict(spam="eggs", count=[1, 2, 3])
+    response = await client.post(
+        "/echo", json=data, headers=signature.headers(data)
+    )
+    assert response.status_code == 200
+    assert response.json()["parsed"] == data
+
+
+async def test_auth_canonical_big_int(client, signature):
+    value = 123456789012345678901234567890
+    headers = signature.headers(dict(v=value))
+    response = await client.post(
+        "/echo", content=f'{{"v": {value}}}'.encode(), headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()["parsed"] == dict(v=value)
+
+
+async def test_auth_bad_body(client, signature):
+    data = dict(spam="eggs")
+    headers = signature.headers(data)
+    response = await client.post(
+        "/echo", json=dict(spam="ham"), headers=headers
+    )
+    assert response.status_code == 401
+    response = await client.post("/echo", content=b"{spam", headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,91 @@
+# buffered event body compression tests
+
+from uuid import uuid4
+
+import pytest
+
+from moralis_streams_client.compression import (
+    ZLIB,
+    ZSTD,
+    load_codec,
+    train_dictionary,
+)
+from moralis_streams_client.event_record import (
+    CompressedEventRecord,
+    EventRecord,
+)
+from moralis_streams_client.event_store import EventStore
+
+
+def _event(count):
+    log = dict(
+        logIndex=hex(count),
+        transactionHash="0x" + f"{count:064x}",
+        address="0x" + "cd" * 20,
+        data="0x" + "00" * 64,
+        topic0="0x" + "ef" * 32,
+    )
+    return EventRecord.from_body(
+        id=uuid4(),
+        path="contract/event",
+        method="POST",
+        headers={"content-type": "application/json"},
+        body=dict(
+            streamId="stream",
+            tag="test",
+            chainId="0x1",
+            block=dict(number=str(count), hash="0x00", timestamp="0"),
+            logs=[log] * 20,
+        ),
+    )
+
+
+def _codecs():
+    yield pytest.param(load_codec(ZLIB), id="zlib")
+    samples = [_event(i).raw for i in range(20)]
+    dictionary = train_dictionary(ZLIB, samples)
+    yield pytest.param(load_codec(ZLIB, dictionary=dictionary), id="zlib-dict")
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return
+    yield pytest.param(load_codec(ZSTD), id="zstd")
+    samples = [_event(i).raw for i in range(200)]
+    dictionary = train_dictionary(ZSTD, samples, 4096)
+    yield pytest.param(load_codec(ZSTD, dictionary=dictionary), id="zstd-dict")
+
+
+@pytest.mark.parametrize("codec", list(_codecs()))
+def test_compression_event_store(codec):
+    plain = EventStore()
+    store = EventStore(codec)
+    events = [_event(i) for i in range(10)]
+    for event in events:
+        plain.append(event)
+        store.append(event)
+    assert store.nbytes() < plain.nbytes() / 4
+    for event in events:
+        stored = store.get(event.id)
+        assert isinstance(stored, CompressedEventRecord)
+        assert stored.raw == event.raw
+        assert stored.serialize() == event.serialize()
+        assert stored.fields == event.fields
+    page, _ = store.page(limit=3)
+    assert [e.id for e in page] == [e.id for e in events[:3]]
+    store.pop(events[0].id)
+    assert store.nbytes() == sum(e.nbytes() for e in store.values())
+
+
+def test_compression_load_codec(tmp_path):
+    assert load_codec("none") is None
+    with pytest.raises(ValueError):
+        load_codec("lzma")
+    dictionary = train_dictionary(ZLIB, [_event(1).raw])
+    path = tmp_path / "buffer.dict"
+    path.write_bytes(dictionary)
+    codec = load_codec(ZLIB, level=9, dictionary=str(path))
+    assert codec.level == 9
+    assert codec.dictionary == dictionary
+    raw = _event(2).raw
+    assert codec.decompress(codec.compress(raw)) == raw
+    assert len(codec.compress(raw)) < len(load_codec(ZLIB).compress(raw))
@@ -0,0 +1,71 @@
+# content size limit middleware tests
+
+import pytest
+from httpx import AsyncClient
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from moralis_streams_client.content_size_limit import (
+    ContentSizeLimitMiddleware,
+)
+
+MAX_SIZE = 1000
+
+
+async def echo(request: Request):
+    body = await request.body()
+    return JSONResponse(dict(length=len(body)))
+
+
+@pytest.fixture
+async def client():
+    middleware = [
+        Middleware(ContentSizeLimitMiddleware, max_content_size=MAX_SIZE)
+    ]
+    app = Starlette(
+        routes=[Route("/echo", echo, methods=["POST"])], middleware=middleware
+    )
+    async with AsyncClient(app=app, base_url="http://test") as _client:
+        yield _client
+
+
+async def test_content_size_within_limit(client):
+    response = await client.post("/echo", content=b"x" * MAX_SIZE)
+    assert response.status_code == 200
+    assert response.json() == dict(length=MAX_SIZE)
+
+
+async def test_content_size_declared_length(client):
+    response = await client.post("/echo", content=b"x" * (MAX_SIZE + 1))
+    assert response.status_code == 413
+    assert "Content-Length" in response.json()["detail"]
+
+
+async def test_content_size_streaming():
+    received = []
+
+    async def app(scope, receive, send):
+        while (await receive()).get("more_body"):
+            pass
+        raise AssertionError("limit not enforced")
+
+    async def receive():
+        received.append(1)
+        return dict(type="http.request", body=b"x" * 300, more_body=True)
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    middleware = ContentSizeLimitMiddleware(app, max_content_size=MAX_SIZE)
+    scope = dict(type="http", method="POST", path="/", headers=[])
+    await middleware(scope, receive, send)
+
+    # the fourth chunk crosses the limit and no further chunks are read
+    assert len(received) == 4
+    assert messages[0]["type"] == "http.response.start"
+    assert messages[0]["status"] == 413
@@ -0,0 +1,108 @@
+# deduplication tests
+
+import json
+from uuid import UUID, uuid4
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from moralis_streams_client.app import EventQueueFactory, app
+from moralis_streams_client.dedupe import Deduplicator, dedupe_key
+from moralis_streams_client.signature import Signature
+
+
+def _payload(confirmed, retries=0, block_hash="0xabc"):
+    return dict(
+        streamId="stream",
+        block=dict(number="100", hash=block_hash, timestamp="0"),
+        confirmed=confirmed,
+        retries=retries,
+    )
+
+
+def test_dedupe_key():
+    assert dedupe_key(_payload(False), "0x1") == dedupe_key(
+        _payload(False, retries=1), "0x2"
+    )
+    assert dedupe_key(_payload(False), "0x1") != dedupe_key(
+        _payload(True), "0x1"
+    )
+    assert dedupe_key(dict(message="hello"), "0x1") == "0x1"
+
+
+def test_dedupe_retries():
+    dedupe = Deduplicator(mode="drop", window=60, max_size=100)
+    first = uuid4()
+    assert dedupe.check(_payload(False), "0x1", first) is None
+    assert dedupe.check(_payload(True), "0x2", uuid4()) is None
+    assert dedupe.check(_payload(False, retries=1), "0x3", uuid4()) == first
+    stats = dedupe.stats()
+    assert stats["accepted"] == 2
+    assert stats["duplicates"] == 1
+
+
+def test_dedupe_bounded():
+    dedupe = Deduplicator(mode="tag", window=60, max_size=10)
+    for i in range(20):
+        dedupe.check(_payload(False, block_hash=f"0x{i}"), None, uuid4())
+    assert len(dedupe.index) == 10
+    assert (
+        dedupe.check(_payload(False, block_hash="0x0"), None, uuid4()) is None
+    )
+
+
+def test_dedupe_window():
+    dedupe = Deduplicator(mode="drop", window=0, max_size=10)
+    assert dedupe.check(_payload(False), None, uuid4()) is None
+    assert dedupe.check(_payload(False), None, uuid4()) is None
+
+
+def test_dedupe_off():
+    dedupe = Deduplicator(mode="off")
+    assert dedupe.check(_payload(False), None, uuid4()) is None
+    assert dedupe.check(_payload(False), None, uuid4()) is None
+    assert dedupe.stats()["accepted"] == 0
+    with pytest.raises(ValueError):
+        Deduplicator(mode="sometimes")
+
+
+def test_dedupe_forget():
+    dedupe = Deduplicator(mode="drop", window=60, max_size=100)
+    first = uuid4()
+    assert dedupe.check(_payload(False), "0x1", first) is None
+    dedupe.forget(_payload(False), "0x1", uuid4())
+    assert dedupe.check(_payload(False), "0x2", uuid4()) == first
+    dedupe.forget(_payload(False), "0x1", first)
+    assert dedupe.check(_payload(False, retries=1), "0x3", uuid4()) is None
+    assert dedupe.stats()["accepted"] == 1
+
+
+async def test_dedupe_failed_append(monkeypatch):
+    events = EventQueueFactory.events
+    monkeypatch.setattr(events, "dedupe", Deduplicator(mode="drop"))
+    monkeypatch.setitem(events.config, "buffer_enabled", True)
+    monkeypatch.setitem(events.config, "relay_url", "http://127.0.0.1:9/")
+    signature = Signature(key="test")
+    monkeypatch.setattr(app.state, "signature", signature, raising=False)
+    transport = ASGITransport(app=app, raise_app_exceptions=False)
+
+    async def deliver(client, retries):
+        body = json.dumps(_payload(False, retries=retries)).encode()
+        return await client.post(
+            "/contract/event",
+            content=body,
+            headers=dict(
+                signature.headers(body),
+                **{"content-type": "application/json"},
+            ),
+        )
+
+    async with AsyncClient(transport=transport, base_url="http://t") as c:
+        # the relay target is unreachable
+        assert (await deliver(c, 0)).status_code == 500
+        events.config["relay_url"] = None
+        response = await deliver(c, 1)
+        assert response.status_code == 200
+        assert await events.lookup(
+            UUID(response.json()["result"]), delete=True
+        )
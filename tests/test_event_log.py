@@ -0,0 +1,147 @@
+# event log tests
+
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+from uuid import uuid4
+
+import pytest
+
+from moralis_streams_client.event_log import CLEAR, DELETE, EVENT, EventLog
+from moralis_streams_client.event_queue import EventQueue
+from moralis_streams_client.event_record import EventRecord
+
+
+def _event(count):
+    return EventRecord.from_body(
+        id=uuid4(),
+        path="contract/event",
+        method="POST",
+        headers={},
+        body=dict(count=count),
+    )
+
+
+def test_event_log_replay(tmp_path):
+    log = EventLog(tmp_path, fsync="none")
+    log.append(b"one")
+    log.append(b"two")
+    log.delete("some-id")
+    records = list(log.replay())
+    assert records == [(EVENT, b"one"), (EVENT, b"two"), (DELETE, b"some-id")]
+
+
+def test_event_log_rotation(tmp_path):
+    log = EventLog(tmp_path, fsync="none", segment_size=100, retention=3)
+    for i in range(20):
+        log.append(b"x" * 50)
+    assert len(log.segments()) == 3
+    log.clear()
+    assert len(log.segments()) == 1
+    assert list(log.replay()) == [(CLEAR, b"")]
+
+
+def test_event_log_torn_write(tmp_path):
+    log = EventLog(tmp_path, fsync="always")
+    log.append(b"complete")
+    log.append(b"incomplete")
+    log.close()
+    segment = log.segments()[-1]
+    segment.write_bytes(segment.read_bytes()[:-3])
+    assert list(log.replay()) == [(EVENT, b"complete")]
+    log.append(b"after")
+    assert list(log.replay()) == [(EVENT, b"complete"), (EVENT, b"after")]
+
+
+async def test_event_log_recover(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        "moralis_streams_client.settings.EVENT_LOG", str(tmp_path)
+    )
+    queue = EventQueue()
+    queue.relay_url = None
+    events = [_event(i) for i in range(5)]
+    for event in events:
+        await queue.append(event)
+    await queue.lookup(events[1].id, delete=True)
+
+    recovered = EventQueue()
+    assert recovered.recover() == 4
+    listed = await recovered.list()
+    assert [e.id for e in listed] == [
+        e.id for e in events if e is not events[1]
+    ]
+    assert listed[0].body == events[0].body
+
+
+@pytest.mark.parametrize("fsync", ["none", "interval", "always"])
+def test_event_log_killed(tmp_path, fsync):
+    script = (
+        "import os, signal\n"
+        "from moralis_streams_client.event_log import EventLog\n"
+        f"log = EventLog({str(tmp_path)!r}, fsync={fsync!r})\n"
+        "for i in range(50):\n"
+        "    log.append(b'event %d' % i)\n"
+        "os.kill(os.getpid(), signal.SIGKILL)\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", script])
+    assert proc.returncode == -signal.SIGKILL
+    assert len(list(EventLog(tmp_path).replay())) == 50
+
+
+async def test_event_log_interval_sync(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(os, "fsync", synced.append)
+    log = EventLog(tmp_path, fsync="interval", fsync_interval=0.05)
+    log.start()
+    log.append(b"one")
+    log.append(b"two")
+    assert log.dirty
+    await asyncio.sleep(0.2)
+    assert not log.dirty
+    assert synced
+    await log.aclose()
+    assert log.task is None
+
+
+def test_event_log_retention_compaction(tmp_path):
+    live = {}
+    log = EventLog(
+        tmp_path,
+        fsync="none",
+        segment_size=100,
+        retention=3,
+        snapshot=live.values,
+    )
+    live["first"] = b"first" * 10
+    log.append(live["first"])
+    for i in range(20):
+        log.append(b"x" * 50)
+        log.delete(f"x{i}")
+    assert len(log.segments()) <= 4
+    assert (EVENT, live["first"]) in list(log.replay())
+
+
+async def test_event_log_recover_raw(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        "moralis_streams_client.settings.EVENT_LOG", str(tmp_path)
+    )
+    queue = EventQueue()
+    queue.relay_url = None
+    raw = b'{"v": 123456789012345678901234567890, "s": "\\u00e9"}'
+    event = EventRecord(
+        uuid4(), "contract/event", "POST", {"a": "b"}, raw, fields={}
+    )
+    await queue.append(event)
+    # a record written by earlier versions
+    legacy = _event(1)
+    queue.log.append(legacy.serialize())
+
+    recovered = EventQueue()
+    assert recovered.recover() == 2
+    restored = await recovered.lookup(event.id, delete=False)
+    assert restored.raw == raw
+    assert restored.headers == {"a": "b"}
+    assert restored.serialize() == event.serialize()
+    assert (await recovered.lookup(legacy.id, delete=False)).raw == legacy.raw
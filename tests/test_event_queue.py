@@ -0,0 +1,187 @@
+# event queue tests
+
+from uuid import uuid4
+
+import pytest
+
+from moralis_streams_client.event_queue import EventQueue
+from moralis_streams_client.event_record import EventRecord
+from moralis_streams_client.event_store import EventStore
+from moralis_streams_client.sqlite_store import SQLiteEventStore
+
+
+def _event(count):
+    return EventRecord.from_body(
+        id=uuid4(),
+        path="contract/event",
+        method="POST",
+        headers={},
+        body=dict(count=count),
+    )
+
+
+def _moralis_event(stream_id, block, confirmed):
+    return EventRecord.from_body(
+        id=uuid4(),
+        path="contract/event",
+        method="POST",
+        headers={},
+        body=dict(
+            streamId=stream_id,
+            tag="test",
+            chainId="0x5",
+            block=dict(number=str(block), hash="0x00", timestamp="0"),
+            confirmed=confirmed,
+        ),
+    )
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        _store = SQLiteEventStore(tmp_path / "events.db", batch_size=4)
+        yield _store
+        _store.close()
+    else:
+        yield EventStore()
+
+
+@pytest.fixture
+def queue(store):
+    _queue = EventQueue(store)
+    _queue.relay_url = None
+    _queue.buffer_enabled = True
+    return _queue
+
+
+async def test_event_queue_order(queue):
+    events = [_event(i) for i in range(10)]
+    for event in events:
+        assert await queue.append(event) == event.id
+    listed = await queue.list()
+    assert [e.id for e in listed] == [e.id for e in events]
+
+
+async def test_event_queue_lookup(queue):
+    events = [_event(i) for i in range(10)]
+    for event in events:
+        await queue.append(event)
+    found = await queue.lookup(events[3].id, delete=False)
+    assert found == events[3]
+    assert len(await queue.list()) == 10
+    assert await queue.lookup(uuid4(), delete=False) is None
+
+
+async def test_event_queue_delete(queue):
+    events = [_event(i) for i in range(10)]
+    for event in events:
+        await queue.append(event)
+    deleted = await queue.lookup(events[3].id, delete=True)
+    assert deleted == events[3]
+    assert await queue.lookup(events[3].id, delete=False) is None
+    assert await queue.lookup(events[3].id, delete=True) is None
+    listed = await queue.list()
+    assert [e.id for e in listed] == [
+        e.id for e in events if e is not events[3]
+    ]
+    assert await queue.clear() == "cleared"
+    assert await queue.list() == []
+
+
+async def test_event_queue_delete_many(queue):
+    events = [_event(i) for i in range(10)]
+    for event in events:
+        await queue.append(event)
+    missing = uuid4()
+    ids = [events[1].id, missing, events[5].id, events[1].id]
+    assert await queue.delete_many(ids) == [events[1].id, events[5].id]
+    assert await queue.delete_many(ids) == []
+    listed = await queue.list()
+    assert [e.id for e in listed] == [
+        e.id for i, e in enumerate(events) if i not in (1, 5)
+    ]
+
+
+async def test_event_queue_subscribe(queue):
+    fast = queue.subscribe(maxsize=10)
+    slow = queue.subscribe(maxsize=2)
+    events = [_event(i) for i in range(3)]
+    for event in events:
+        await queue.append(event)
+    assert slow.overflow is True
+    assert slow not in queue.subscribers
+    assert fast in queue.subscribers
+    for event in events:
+        data = await fast.get(timeout=1)
+        assert str(event.id).encode() in data
+    queue.unsubscribe(fast)
+    assert queue.subscribers == set()
+
+
+async def test_event_queue_filters(queue):
+    events = [
+        _moralis_event(stream_id, block, confirmed)
+        for stream_id in ["a", "b"]
+        for block in range(100, 105)
+        for confirmed in [False, True]
+    ]
+    for event in events:
+        await queue.append(event)
+
+    async def ids(**filters):
+        result, cursor = await queue.page(filters=filters)
+        return [e.id for e in result]
+
+    def expect(select):
+        return [e.id for e in events if select(e.body)]
+
+    assert await ids(stream_id="a") == expect(lambda b: b["streamId"] == "a")
+    assert await ids(confirmed=True) == expect(lambda b: b["confirmed"])
+    assert await ids(chain_id="5") == expect(lambda b: True)
+    assert await ids(chain_id="0x1") == []
+    assert await ids(from_block=102, to_block=103, stream_id="b") == expect(
+        lambda b: b["streamId"] == "b"
+        and int(b["block"]["number"]) in (102, 103)
+    )
+    page, cursor = await queue.page(limit=3, filters=dict(stream_id="b"))
+    assert [e.id for e in page] == expect(lambda b: b["streamId"] == "b")[:3]
+    streamed = [e.id async for e in queue.stream(filters=dict(tag="test"))]
+    assert streamed == expect(lambda b: True)
+
+
+async def test_event_queue_shared(tmp_path):
+    path = tmp_path / "events.db"
+    stores = [SQLiteEventStore(path, batch_size=1) for _ in range(2)]
+    first, second = [EventQueue(store, shared=True) for store in stores]
+    first.set_config(relay_url=None, buffer_enabled=True)
+    assert second.relay_url is None
+    assert second.buffer_enabled is True
+
+    event = _event(0)
+    await first.append(event)
+    assert (await second.lookup(event.id, delete=False)).id == event.id
+
+    second.buffer_enabled = False
+    assert first.buffer_enabled is False
+    await first.append(_event(1))
+    assert len(await second.list()) == 1
+
+    for store in stores:
+        store.close()
+
+
+def test_event_queue_sqlite_nbytes(tmp_path):
+    store = SQLiteEventStore(tmp_path / "events.db", batch_size=4)
+    events = [_event(i) for i in range(6)]
+    for event in events:
+        store.append(event)
+    # pending rows are counted without flushing them
+    assert store.pending
+    total = sum(e.nbytes() for e in events)
+    assert store.nbytes() == total
+    store.delete_many([events[0].id])
+    # the stored total is cached between refreshes
+    assert store.nbytes() == total
+    store.bytes_time = None
+    assert store.nbytes() == total - events[0].nbytes()
+    store.close()
@@ -0,0 +1,53 @@
+# keccak backend tests
+
+import pytest
+
+from moralis_streams_client.keccak import (
+    EMPTY_DIGEST,
+    available,
+    benchmark,
+    load_backend,
+)
+from moralis_streams_client.signature import Signature
+
+
+def keccak_256(data=b""):
+    from Crypto.Hash import keccak
+
+    return keccak.new(data=data, digest_bits=256)
+
+
+def test_keccak_auto():
+    backend = load_backend("auto")
+    assert backend.name in [b.name for b in available()]
+    assert backend.digest(b"") == EMPTY_DIGEST
+
+
+def test_keccak_backends_agree():
+    data = b"this parrot is no more" * 1000
+    digests = {b.name: b.digest(data) for b in available()}
+    assert len(set(digests.values())) == 1
+
+
+def test_keccak_import_path():
+    backend = load_backend("tests.test_keccak:keccak_256")
+    assert backend.digest(b"") == EMPTY_DIGEST
+    with pytest.raises(ValueError):
+        load_backend("hashlib:sha3_256")
+    with pytest.raises(ValueError):
+        load_backend("nonesuch")
+
+
+def test_keccak_signature_backend():
+    data = b'{"parrot":"pining"}'
+    expected = Signature(key="k", backend="auto").calculate(data)
+    for backend in available():
+        signature = Signature(key="k", backend=backend)
+        assert signature.calculate(data) == expected
+        hasher = signature.hasher()
+        hasher.update(data)
+        assert hasher.validate(expected)
+
+
+def test_keccak_benchmark():
+    assert benchmark(load_backend(), duration=0.01) > 0
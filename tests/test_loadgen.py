@@ -0,0 +1,42 @@
+# synthetic load generator tests
+
+import pytest
+
+from moralis_streams_client.loadgen import (
+    LoadGenerator,
+    percentile,
+    synthetic_payload,
+)
+from moralis_streams_client.payload import decode
+
+
+def test_loadgen_payload():
+    body = synthetic_payload(7, logs=3, txs=2, internal_txs=1)
+    payload = decode(body)
+    assert payload.block.number == 7
+    assert len(payload.logs) == 3
+    assert len(payload.txs) == 2
+    assert len(payload.txs_internal) == 1
+    tx_hashes = {tx.hash for tx in payload.txs}
+    assert {log.transaction_hash for log in payload.logs} <= tx_hashes
+    assert synthetic_payload(7, logs=3, txs=2, internal_txs=1) == body
+    assert synthetic_payload(8, logs=3, txs=2, internal_txs=1) != body
+
+
+def test_loadgen_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([5], 50) == 5
+    assert percentile([], 50) is None
+
+
+def test_loadgen_signed_messages():
+    generator = LoadGenerator("http://test/", [synthetic_payload(1)])
+    body, headers = generator.messages[0]
+    assert generator.signature.validate(
+        headers[generator.signature.header], body
+    )
+    with pytest.raises(ValueError):
+        LoadGenerator("http://test/", [])
@@ -0,0 +1,64 @@
+# prometheus metrics tests
+
+from moralis_streams_client.metrics import (
+    Callback,
+    Counter,
+    Histogram,
+    Registry,
+)
+
+
+def _render(*metrics):
+    registry = Registry()
+    for metric in metrics:
+        registry.register(metric)
+    return registry.render().decode().splitlines()
+
+
+def test_metrics_counter():
+    counter = Counter("test_total", "test counter", ["reason"])
+    counter.inc("size")
+    counter.inc("size")
+    counter.inc("signature", amount=3)
+    lines = _render(counter)
+    assert lines[:2] == [
+        "# HELP test_total test counter",
+        "# TYPE test_total counter",
+    ]
+    assert 'test_total{reason="size"} 2' in lines
+    assert 'test_total{reason="signature"} 3' in lines
+
+
+def test_metrics_histogram():
+    histogram = Histogram("test_seconds", "test histogram", buckets=(0.1, 1))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+    lines = _render(histogram)
+    assert 'test_seconds_bucket{le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{le="1"} 2' in lines
+    assert 'test_seconds_bucket{le="+Inf"} 3' in lines
+    assert "test_seconds_sum 5.55" in lines
+    assert "test_seconds_count 3" in lines
+
+
+def test_metrics_callback():
+    gauge = Callback("test_gauge", "test gauge", "gauge", lambda: 7)
+    labeled = Callback(
+        "test_labeled",
+        "test labeled",
+        "counter",
+        lambda: {("a",): 1, ("b",): 2},
+        ["name"],
+    )
+    lines = _render(gauge, labeled)
+    assert "# TYPE test_gauge gauge" in lines
+    assert "test_gauge 7" in lines
+    assert 'test_labeled{name="a"} 1' in lines
+    assert 'test_labeled{name="b"} 2' in lines
+
+
+def test_metrics_label_escape():
+    counter = Counter("test_total", "test counter", ["target"])
+    counter.inc('a"b\\c\nd')
+    assert 'test_total{target="a\\"b\\\\c\\nd"} 1' in _render(counter)
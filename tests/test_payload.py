@@ -0,0 +1,105 @@
+# payload decoder tests
+
+import orjson
+
+from moralis_streams_client.models.model import IWebhookUnParsed
+from moralis_streams_client.payload import Block, Log, Payload, decode
+
+BODY = dict(
+    block=dict(number="12345", hash="0x" + "aa" * 32, timestamp="1666000000"),
+    chainId="0x5",
+    logs=[
+        dict(
+            logIndex="7",
+            transactionHash="0x" + "ab" * 32,
+            address="0x" + "cd" * 20,
+            data="0x",
+            topic0="0x" + "ef" * 32,
+            topic1="0x" + "01" * 32,
+            topic2=None,
+            topic3=None,
+        )
+    ],
+    txs=[
+        dict(
+            hash="0x" + "ab" * 32,
+            gas="21000",
+            gasPrice="1000000000",
+            nonce="3",
+            input="0x",
+            transactionIndex="0",
+            fromAddress="0x" + "01" * 20,
+            toAddress="0x" + "02" * 20,
+            value="1000000000000000000",
+            type="2",
+            v="0",
+            r="0x01",
+            s="0x02",
+            receiptCumulativeGasUsed="21000",
+            receiptGasUsed="21000",
+            receiptContractAddress=None,
+            receiptRoot=None,
+            receiptStatus="1",
+        )
+    ],
+    txsInternal=[
+        {
+            "from": "0x" + "01" * 20,
+            "to": "0x" + "02" * 20,
+            "value": "5",
+            "transactionHash": "0x" + "ab" * 32,
+            "gas": "0",
+        }
+    ],
+    abi=[],
+    retries=0,
+    confirmed=True,
+    tag="test",
+    streamId="stream",
+)
+
+
+def test_payload_decode():
+    payload = decode(orjson.dumps(BODY))
+    assert isinstance(payload, Payload)
+    assert payload == decode(BODY)
+    assert payload.chain_id == 5
+    assert payload.confirmed is True
+    assert payload.block == Block.decode(BODY["block"])
+    assert payload.block.number == 12345
+    assert payload.block.timestamp == 1666000000
+
+    (log,) = payload.logs
+    assert isinstance(log, Log)
+    assert log.log_index == 7
+    assert log.topics == ("0x" + "ef" * 32, "0x" + "01" * 32)
+    assert not hasattr(log, "__dict__")
+
+    (tx,) = payload.txs
+    assert tx.value == 10**18
+    assert tx.gas_price == 10**9
+    assert tx.receipt_status == 1
+    assert tx.receipt_root is None
+
+    (internal,) = payload.txs_internal
+    assert internal.from_address == "0x" + "01" * 20
+    assert internal.value == 5
+
+
+def test_payload_decode_partial():
+    payload = decode(b'{"streamId": "s", "chainId": "0x1"}')
+    assert payload.stream_id == "s"
+    assert payload.block is None
+    assert payload.logs == ()
+
+
+def test_payload_matches_model():
+    body = dict(BODY, logs=[dict(BODY["logs"][0], topic2="0x", topic3="0x")])
+    body["txs"] = [{k: v or "" for k, v in tx.items()} for tx in body["txs"]]
+    model = IWebhookUnParsed.parse_obj(body)
+    payload = decode(body)
+    assert payload.stream_id == model.streamId
+    assert payload.block.hash == model.block.hash
+    assert [log.transaction_hash for log in payload.logs] == [
+        log.transactionHash for log in model.logs
+    ]
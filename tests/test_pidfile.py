@@ -0,0 +1,53 @@
+# server pid file registry tests
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from moralis_streams_client import settings
+from moralis_streams_client.pidfile import PidFile, pidfile_path, running_pid
+
+PORT = 8099
+
+
+@pytest.fixture(autouse=True)
+def run_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RUN_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_pidfile_register():
+    assert running_pid(PORT) is None
+    with PidFile(PORT):
+        assert running_pid(PORT) == os.getpid()
+        with pytest.raises(RuntimeError):
+            PidFile(PORT).acquire()
+    assert running_pid(PORT) is None
+    with PidFile(PORT):
+        assert running_pid(PORT) == os.getpid()
+
+
+def test_pidfile_stale_after_kill(run_dir):
+    script = (
+        "import sys, time\n"
+        "from moralis_streams_client import settings\n"
+        "from moralis_streams_client.pidfile import PidFile\n"
+        f"settings.RUN_DIR = {str(run_dir)!r}\n"
+        f"PidFile({PORT}).acquire()\n"
+        "print('ready', flush=True)\n"
+        "time.sleep(60)\n"
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-c", script], stdout=subprocess.PIPE, text=True
+    )
+    try:
+        assert proc.stdout.readline().strip() == "ready"
+        assert running_pid(PORT) == proc.pid
+    finally:
+        proc.kill()
+        proc.wait()
+    # the pid is left in the file but the lock died with the process
+    assert pidfile_path(PORT).read_text().strip() == str(proc.pid)
+    assert running_pid(PORT) is None
@@ -0,0 +1,143 @@
+# event routing tests
+
+import asyncio
+from uuid import uuid4
+
+import httpx
+import pytest
+
+from moralis_streams_client.event_queue import EventQueue
+from moralis_streams_client.event_record import EventRecord
+from moralis_streams_client.routing import RoutingTable
+
+TOPIC = "0x" + "ab" * 32
+
+
+def _event(stream_id="s1", tag="t1", chain_id="0x1", topics=()):
+    return EventRecord.from_body(
+        id=uuid4(),
+        path="contract/event",
+        method="POST",
+        headers={},
+        body=dict(
+            streamId=stream_id,
+            tag=tag,
+            chainId=chain_id,
+            logs=[dict(topic0=topic) for topic in topics],
+        ),
+    )
+
+
+def _names(table, event):
+    return [route.name for route in table.match(event)]
+
+
+def test_routing_match():
+    table = RoutingTable(
+        [
+            dict(name="all", url="http://all"),
+            dict(name="s1", url="http://s1", match=dict(streamId="s1")),
+            dict(
+                name="mainnet",
+                url="http://mainnet",
+                match=dict(chainId=[1, "0x89"], tag="t1"),
+            ),
+            dict(name="topic", url="http://t", match=dict(topic0=TOPIC)),
+        ]
+    )
+    assert _names(table, _event()) == ["all", "s1", "mainnet"]
+    assert _names(table, _event(chain_id="0x89", tag="x")) == ["all", "s1"]
+    assert _names(table, _event(stream_id="s2", chain_id="137")) == [
+        "all",
+        "mainnet",
+    ]
+    assert _names(table, _event(stream_id="s2", topics=[TOPIC.upper()])) == [
+        "all",
+        "mainnet",
+        "topic",
+    ]
+    assert len(table.index) == 4
+    # topic0 values come from the fields extracted at ingest
+    event = _event(stream_id="s2", topics=[TOPIC])
+    event.raw = b"not json"
+    assert _names(table, event) == ["all", "mainnet", "topic"]
+
+
+def test_routing_invalid():
+    with pytest.raises(ValueError):
+        RoutingTable([dict(name="r", url="u", match=dict(address="0x"))])
+    with pytest.raises(ValueError):
+        RoutingTable([dict(name="r", url="u"), dict(name="r", url="v")])
+    with pytest.raises(ValueError):
+        RoutingTable([dict(name="r", url="u", match=dict(chainId="x"))])
+    with pytest.raises(ValueError):
+        RoutingTable([dict(name="r", uri="u")])
+
+
+async def test_routing_dispatch():
+    received = []
+
+    def handler(request):
+        received.append((request.url.host, request.content))
+        status_code = 500 if request.url.host == "fail" else 200
+        return httpx.Response(status_code, json=dict(ok=True))
+
+    queue = EventQueue()
+    queue.relay_url = "http://default"
+    router = queue.set_routes(
+        [
+            dict(name="one", url="http://one", match=dict(streamId="s1")),
+            dict(name="fail", url="http://fail", match=dict(tag="t1")),
+        ]
+    )
+    for route in router.routes:
+        route.client = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        )
+
+    event = _event()
+    await queue.append(event)
+    assert sorted(received) == [("fail", event.raw), ("one", event.raw)]
+    assert event.relay["routes"]["one"]["status_code"] == 200
+    assert event.relay["routes"]["fail"]["status_code"] == 500
+
+    one, fail = router.routes
+    assert one.metrics()["requests"] == 1
+    assert one.metrics()["failures"] == 0
+    assert one.metrics()["bytes"] == len(event.raw)
+    assert fail.metrics()["failures"] == 1
+
+    # unchanged routes keep their pools and counters
+    queue.set_routes([one.dict()])
+    assert queue.router.routes == [one]
+    # removed routes close their pools
+    await asyncio.sleep(0)
+    assert fail.retired and fail.client is None
+    assert one.client is not None
+    await queue.aclose()
+
+
+async def test_routing_route_exception():
+    def handler(request):
+        if request.url.host == "boom":
+            raise httpx.InvalidURL("bad url")
+        return httpx.Response(200)
+
+    queue = EventQueue()
+    router = queue.set_routes(
+        [
+            dict(name="ok", url="http://ok"),
+            dict(name="boom", url="http://boom"),
+        ]
+    )
+    for route in router.routes:
+        route.client = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        )
+    event = _event()
+    await queue.append(event)
+    results = event.relay["routes"]
+    assert results["ok"]["status_code"] == 200
+    assert "InvalidURL" in results["boom"]["error"]
+    assert router.routes[1].metrics()["failures"] == 1
+    await queue.aclose()
@@ -1,14 +1,23 @@
 # server tests
 
 import json
+import os
+import socket
 from uuid import UUID, uuid4
 
 import pytest
 from httpx import AsyncClient
 
 from moralis_streams_client import settings
-from moralis_streams_client.app import app, obscure_key
+from moralis_streams_client.app import (
+    EventQueueFactory,
+    app,
+    obscure_key,
+    sse_messages,
+)
+from moralis_streams_client.server import ServerProcess, bind_unix_socket
 from moralis_streams_client.signature import Signature
+from moralis_streams_client.webhook import Webhook, socket_listening
 
 
 @pytest.fixture
@@ -225,3 +234,130 @@ async def test_server_send_relay(get, post, testevent, webhook_process_class):
         assert events[0]["headers"]["x-relay-id"] == event_id
         assert events[0]["headers"]["x-api-key"] == relay_config["key"]
         assert events[0]["body"] == testevent
+
+
+async def test_server_events_paginated(client, signature, get, post):
+    assert await get("events") == []
+    eids = [await post("contract/event", data=dict(n=i)) for i in range(5)]
+    headers = signature.headers(b"")
+    after = None
+    pages = []
+    while True:
+        params = dict(limit=2)
+        if after is not None:
+            params["after"] = after
+        response = await client.get("events", headers=headers, params=params)
+        assert response.status_code == 200
+        pages.append([e["id"] for e in response.json()["result"]])
+        after = response.headers.get("x-cursor")
+        if after is None:
+            break
+    assert pages == [eids[0:2], eids[2:4], eids[4:]]
+
+
+async def test_server_events_ndjson(client, signature, get, post):
+    assert await get("events") == []
+    eids = [await post("contract/event", data=dict(n=i)) for i in range(3)]
+    headers = signature.headers(b"")
+    headers["accept"] = "application/x-ndjson"
+    async with client.stream("GET", "events", headers=headers) as response:
+        assert response.status_code == 200
+        lines = [json.loads(line) async for line in response.aiter_lines()]
+    assert [e["id"] for e in lines] == eids
+
+
+def test_server_bind_unix_socket(tmp_path):
+    path = tmp_path / "webhook.sock"
+    sock = bind_unix_socket(path)
+    sock.listen()
+    assert path.stat().st_mode & 0o777 == 0o600
+    with pytest.raises(RuntimeError):
+        bind_unix_socket(path)
+    sock.close()
+    # a socket file left behind by a dead server is replaced
+    assert path.is_socket()
+    sock = bind_unix_socket(path)
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.listen()
+    client.connect(str(path))
+    client.close()
+    sock.close()
+
+
+def test_server_bind_unix_socket_umask(tmp_path, monkeypatch):
+    # the socket file is created owner-only, not restricted after bind
+    monkeypatch.setattr(os, "chmod", lambda *args: None)
+    umask = os.umask(0o022)
+    try:
+        sock = bind_unix_socket(tmp_path / "webhook.sock")
+        assert os.umask(0o022) == 0o022
+    finally:
+        os.umask(umask)
+    assert (tmp_path / "webhook.sock").stat().st_mode & 0o077 == 0
+    sock.close()
+
+
+async def test_server_webhook_stale_socket(tmp_path):
+    path = tmp_path / "webhook.sock"
+    sock = bind_unix_socket(path)
+    sock.listen()
+    assert socket_listening(path)
+    async with Webhook(uds=str(path)) as webhook:
+        assert webhook._client()._transport._pool._uds == str(path)
+    sock.close()
+    # the socket file remains but nothing accepts connections on it
+    assert path.is_socket()
+    assert not socket_listening(path)
+    async with Webhook(uds=str(path)) as webhook:
+        assert webhook._client()._transport._pool._uds is None
+
+
+def test_server_workers_refuse_dedupe(monkeypatch):
+    monkeypatch.setattr(settings, "DEDUPE", "drop")
+    with pytest.raises(ValueError):
+        ServerProcess(workers=2).share()
+
+
+async def test_server_workers_subscribe(monkeypatch):
+    monkeypatch.setattr(settings, "WORKERS", 2)
+    signature = Signature(key="test")
+    monkeypatch.setattr(app.state, "signature", signature, raising=False)
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get(
+            "/subscribe", headers=signature.headers(b"")
+        )
+    assert response.status_code == 501
+
+
+async def test_server_indented_body_framing(monkeypatch):
+    events = EventQueueFactory.events
+    monkeypatch.setitem(events.config, "buffer_enabled", True)
+    monkeypatch.setitem(events.config, "relay_url", None)
+    signature = Signature(key="test")
+    monkeypatch.setattr(app.state, "signature", signature, raising=False)
+    data = dict(streamId="s", logs=[dict(topic0="0x1")], note="a b")
+    body = json.dumps(data, indent=2).encode().replace(b"\n", b"\r\n")
+    subscription = events.subscribe()
+    messages = sse_messages(events, subscription)
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/contract/event",
+            content=body,
+            headers=dict(
+                signature.headers(data),
+                **{"content-type": "application/json"},
+            ),
+        )
+        assert response.status_code == 200
+        event_id = response.json()["result"]
+        headers = dict(signature.headers(b""), accept="application/x-ndjson")
+        response = await client.get("/events", headers=headers)
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [e["body"] for e in lines if e["id"] == event_id] == [data]
+
+    frame = await messages.__anext__()
+    await messages.aclose()
+    assert frame.startswith(b"data: ") and frame.endswith(b"\n\n")
+    assert frame.count(b"\n") == 2
+    assert json.loads(frame[len(b"data: ") :])["body"] == data
+    await events.lookup(UUID(event_id), delete=True)
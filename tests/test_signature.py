@@ -108,3 +108,15 @@ def test_signature_sample_event(shared_datadir):
     info(f"{sample=}")
     info(f"{local=}")
     info(f"{headers=}")
+
+
+def test_signature_hasher(testkey, testbytes, badbytes):
+    s = Signature(testkey)
+    sig = s.calculate(testbytes)
+    hasher = s.hasher()
+    for offset in range(0, len(testbytes), 7):
+        hasher.update(testbytes[offset : offset + 7])
+    assert hasher.validate(sig) is True
+    hasher = s.hasher()
+    hasher.update(badbytes)
+    assert hasher.validate(sig) is False
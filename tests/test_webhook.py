@@ -73,6 +73,18 @@ async def test_webhook_queue(webhook, dump, event_keys):
         dump(event)
 
 
+async def test_webhook_bulk(webhook):
+    await webhook.clear()
+    ids = await webhook.inject_many([dict(count=i) for i in range(50)])
+    assert len(set(ids)) == 50
+    events = await webhook.events()
+    assert sorted(e["body"]["count"] for e in events) == list(range(50))
+    missing = "00000000-0000-0000-0000-000000000000"
+    ret = await webhook.delete_many(ids[:10] + [missing])
+    assert ret == dict(deleted=ids[:10], missing=[missing])
+    assert len(await webhook.events()) == 40
+
+
 async def test_webhook_tunnel(webhook, webhook_tunnel_url, dump):
     await webhook.clear()
     url = webhook_tunnel_url + "/contract/event"